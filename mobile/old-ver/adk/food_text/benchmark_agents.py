@@ -0,0 +1,123 @@
+"""
+Measure the per-request cost of setting up the food search fan-out.
+
+Compares what ParallelFoodProcessorAgent used to do for every request (build
+one LlmAgent per food with the food, memory and candidates formatted into its
+instruction, then a ParallelAgent around them) with what it does now (copy the
+invocation context with the run's inputs in temp: state for the shared
+template agent). No model is called, so no credentials are needed:
+
+    python -m food_text.benchmark_agents --foods 12 --requests 200
+"""
+
+import argparse
+import json
+import time
+import tracemalloc
+
+from google.adk.agents import LlmAgent, ParallelAgent
+from google.adk.agents.invocation_context import InvocationContext
+from google.adk.sessions import InMemorySessionService, Session
+from google.adk.tools import google_search
+
+from food_text.benchmark_fixtures import sample_meal
+from food_text.subagents.ParallelFoodProcessorAgent import (
+    FOOD_SEARCH_INSTRUCTION,
+    GEMINI_MODEL,
+    ParallelFoodProcessorAgent,
+    search_context,
+    search_state,
+)
+from food_text.tools import food_state_key
+
+MEMORY_CONTEXT = "User memory for personalization: " + json.dumps(
+    [f"Prefers oat milk in coffee, note {i}" for i in range(8)]
+)
+
+
+def construct_agents(foods):
+    """Per-request construction, as the processor did before the templates."""
+    sub_agents = []
+    for food in foods:
+        state = search_state([food], MEMORY_CONTEXT, None)
+        instruction = FOOD_SEARCH_INSTRUCTION
+        for key, value in state.items():
+            instruction = instruction.replace("{" + key + "}", value)
+        sub_agents.append(
+            LlmAgent(
+                name=f"FoodSearchAgent_{food_state_key(food)}",
+                model=GEMINI_MODEL,
+                instruction=instruction,
+                tools=[google_search],
+                output_key=f"search_result_{food_state_key(food)}",
+            )
+        )
+    return ParallelAgent(name="ParallelMealProcessor", sub_agents=sub_agents)
+
+
+def template_contexts(invocation_context, foods):
+    """Per-request work with the shared template agent."""
+    return [
+        search_context(
+            invocation_context,
+            f"ParallelMealProcessor.FoodSearchAgent_{food_state_key(food)}",
+            search_state([food], MEMORY_CONTEXT, None),
+        )
+        for food in foods
+    ]
+
+
+def timed(fn, requests):
+    started = time.perf_counter()
+    for _ in range(requests):
+        fn()
+    return (time.perf_counter() - started) / requests
+
+
+def allocated(fn):
+    """Bytes still held by one call's result, e.g. the agents and their instructions."""
+    tracemalloc.start()
+    result = fn()
+    size, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    del result
+    return size
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--foods", type=int, default=12, help="Foods per request")
+    parser.add_argument("--requests", type=int, default=200, help="Requests to time")
+    args = parser.parse_args()
+
+    foods = sample_meal(args.foods)["foods"]
+    session = Session(
+        id="benchmark",
+        app_name="benchmark",
+        user_id="benchmark",
+        state={"parsed_foods": {"foods": foods, "questions": []}},
+    )
+    invocation_context = InvocationContext(
+        session_service=InMemorySessionService(),
+        invocation_id="benchmark",
+        agent=ParallelFoodProcessorAgent(),
+        session=session,
+    )
+    # Warm up both paths before timing
+    construct_agents(foods)
+    template_contexts(invocation_context, foods)
+    constructed = timed(lambda: construct_agents(foods), args.requests)
+    templated = timed(lambda: template_contexts(invocation_context, foods), args.requests)
+
+    print(f"{args.foods} foods per request, {args.requests} requests")
+    print(f"  per-request agent construction: {constructed * 1000:8.3f} ms/request")
+    print(f"  shared template + state:         {templated * 1000:8.3f} ms/request")
+    print(f"  speedup:                         {constructed / templated:8.1f}x")
+    print(
+        f"  retained per request: {allocated(lambda: construct_agents(foods)) / 1024:.1f} KiB "
+        f"constructed, {allocated(lambda: template_contexts(invocation_context, foods)) / 1024:.1f} KiB templated"
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,35 @@
+"""Sample meals shared by the benchmark scripts."""
+
+SAMPLE_FOODS = [
+    ("scrambled eggs", 2.0, "large egg"),
+    ("whole wheat toast", 2.0, "slice"),
+    ("banana", 1.0, "medium"),
+    ("black coffee", 1.0, "cup"),
+    ("greek yogurt", 170.0, "g"),
+    ("chicken caesar salad", 1.0, "bowl"),
+    ("apple", 1.0, "medium"),
+    ("almonds", 28.0, "g"),
+    ("grilled salmon", 150.0, "g"),
+    ("brown rice", 1.0, "cup"),
+    ("steamed broccoli", 1.0, "cup"),
+    ("dark chocolate", 20.0, "g"),
+]
+
+
+def sample_meal(count):
+    foods = []
+    for i in range(count):
+        name, quantity, unit = SAMPLE_FOODS[i % len(SAMPLE_FOODS)]
+        if i >= len(SAMPLE_FOODS):
+            name = f"{name} ({i // len(SAMPLE_FOODS) + 1})"
+        foods.append(
+            {
+                "name": name,
+                "description": "",
+                "quantity": quantity,
+                "unit": unit,
+                "eaten_at": "2025-09-28T12:00:00",
+                "meal_type": "Lunch",
+            }
+        )
+    return {"foods": foods, "questions": []}
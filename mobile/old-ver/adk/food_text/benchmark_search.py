@@ -0,0 +1,87 @@
+"""
+Compare per-food and batched nutrition search.
+
+Runs ParallelFoodProcessorAgent on the same parsed meal once per batch size
+and reports wall time, model calls and token usage. The nutrition cache and
+local catalog are switched off so every food goes to the model. Needs the
+same Gemini credentials as the agent itself:
+
+    python -m food_text.benchmark_search --sizes 1,3,6,12 --foods 12
+"""
+
+import argparse
+import asyncio
+import os
+import time
+
+from google.adk.runners import InMemoryRunner
+from google.genai import types
+
+from food_text.benchmark_fixtures import sample_meal
+from food_text.subagents.ParallelFoodProcessorAgent import ParallelFoodProcessorAgent
+
+
+async def run_once(batch_size, parsed_foods):
+    os.environ["FOOD_SEARCH_BATCH_SIZE"] = str(batch_size)
+    runner = InMemoryRunner(agent=ParallelFoodProcessorAgent(), app_name="benchmark")
+    session = await runner.session_service.create_session(
+        app_name="benchmark",
+        user_id="benchmark",
+        state={"parsed_foods": parsed_foods},
+    )
+
+    calls = prompt_tokens = output_tokens = 0
+    started = time.perf_counter()
+    async for event in runner.run_async(
+        user_id="benchmark",
+        session_id=session.id,
+        new_message=types.Content(role="user", parts=[types.Part(text="benchmark")]),
+    ):
+        usage = event.usage_metadata
+        if usage is not None:
+            calls += 1
+            prompt_tokens += usage.prompt_token_count or 0
+            output_tokens += usage.candidates_token_count or 0
+    elapsed = time.perf_counter() - started
+
+    session = await runner.session_service.get_session(
+        app_name="benchmark", user_id="benchmark", session_id=session.id
+    )
+    resolved = len(parsed_foods["foods"]) - len(session.state.get("unresolved_foods", []))
+    return {
+        "batch_size": batch_size,
+        "seconds": elapsed,
+        "model_calls": calls,
+        "prompt_tokens": prompt_tokens,
+        "output_tokens": output_tokens,
+        "resolved": resolved,
+    }
+
+
+async def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--sizes", default="1,3,6,12", help="Comma separated batch sizes")
+    parser.add_argument("--foods", type=int, default=12, help="Foods in the sample meal")
+    parser.add_argument("--repeat", type=int, default=1, help="Runs per batch size")
+    args = parser.parse_args()
+
+    # Every food goes to the model; both are read when the processor runs
+    os.environ["NUTRITION_CACHE_ENABLED"] = "false"
+    os.environ["LOCAL_NUTRITION_DB_ENABLED"] = "false"
+
+    parsed_foods = sample_meal(args.foods)
+    print(
+        f"{'batch':>5} {'seconds':>8} {'calls':>6} {'prompt':>8} {'output':>7} {'resolved':>9}"
+    )
+    for size in [int(s) for s in args.sizes.split(",")]:
+        for _ in range(args.repeat):
+            r = await run_once(size, parsed_foods)
+            print(
+                f"{r['batch_size']:>5} {r['seconds']:>8.2f} {r['model_calls']:>6} "
+                f"{r['prompt_tokens']:>8} {r['output_tokens']:>7} "
+                f"{r['resolved']:>5}/{args.foods}"
+            )
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,187 @@
+import hashlib
+import json
+import os
+import re
+import sqlite3
+import threading
+import time
+from typing import Optional
+
+from food_text.models import FoodSearchResult
+
+DEFAULT_CACHE_PATH = os.path.expanduser("~/.cache/food_text/nutrition_cache.sqlite3")
+DEFAULT_TTL_SECONDS = 7 * 24 * 60 * 60
+DEFAULT_MAX_ENTRIES = 10000
+
+# Fields that depend on the request rather than on the food itself.
+# They are dropped before storing and re-stamped from the input food on a hit.
+REQUEST_FIELDS = ("id", "eaten_at", "meal_type")
+
+
+def normalize_text(text) -> str:
+    """Lowercase, strip punctuation and collapse whitespace."""
+    text = re.sub(r"[^\w\s.]", " ", str(text or "").lower())
+    return " ".join(text.split())
+
+
+def cache_key(food: dict, user_memory=None) -> str:
+    """
+    Build a stable key from the normalized name, description, quantity and
+    unit. The search prompt includes the user's memory, so when there is any
+    its hash is part of the key and personalized results are never served to
+    another user (or to the same user with different memories).
+    """
+    try:
+        quantity = float(food.get("quantity", 1.0))
+    except (TypeError, ValueError):
+        quantity = 1.0
+    parts = [
+        normalize_text(food.get("name")),
+        normalize_text(food.get("description")),
+        f"{quantity:g}",
+        normalize_text(food.get("unit", "serving")),
+    ]
+    if user_memory:
+        parts.append(
+            hashlib.sha256(json.dumps(user_memory).encode("utf-8")).hexdigest()
+        )
+    return hashlib.sha256("|".join(parts).encode("utf-8")).hexdigest()
+
+
+class NutritionCache:
+    """
+    Disk-backed cache of FoodSearchResult lists keyed by the parsed food and
+    the user memory its search was personalized with.
+
+    Entries expire after `ttl_seconds`, and the least recently used entries are
+    evicted once more than `max_entries` are stored.
+    """
+
+    def __init__(
+        self,
+        path: str = DEFAULT_CACHE_PATH,
+        ttl_seconds: int = DEFAULT_TTL_SECONDS,
+        max_entries: int = DEFAULT_MAX_ENTRIES,
+    ):
+        self.path = path
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+
+        if path != ":memory:":
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            """CREATE TABLE IF NOT EXISTS nutrition_cache (
+                key TEXT PRIMARY KEY,
+                results TEXT NOT NULL,
+                created_at REAL NOT NULL,
+                last_accessed REAL NOT NULL
+            )"""
+        )
+        self._conn.execute(
+            "CREATE INDEX IF NOT EXISTS nutrition_cache_last_accessed "
+            "ON nutrition_cache (last_accessed)"
+        )
+        self._conn.commit()
+
+    @classmethod
+    def from_env(cls) -> "NutritionCache":
+        return cls(
+            path=os.environ.get("NUTRITION_CACHE_PATH", DEFAULT_CACHE_PATH),
+            ttl_seconds=int(
+                os.environ.get("NUTRITION_CACHE_TTL_SECONDS", DEFAULT_TTL_SECONDS)
+            ),
+            max_entries=int(
+                os.environ.get("NUTRITION_CACHE_MAX_ENTRIES", DEFAULT_MAX_ENTRIES)
+            ),
+        )
+
+    def get(self, food: dict, user_memory=None) -> Optional[list[dict]]:
+        """Return cached FoodSearchResult dicts stamped with this food's id/eaten_at/meal_type."""
+        key = cache_key(food, user_memory)
+        now = time.time()
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT results, created_at FROM nutrition_cache WHERE key = ?",
+                (key,),
+            ).fetchone()
+            if row is None:
+                self.misses += 1
+                return None
+            if now - row[1] > self.ttl_seconds:
+                self._conn.execute("DELETE FROM nutrition_cache WHERE key = ?", (key,))
+                self._conn.commit()
+                self.misses += 1
+                return None
+            self._conn.execute(
+                "UPDATE nutrition_cache SET last_accessed = ? WHERE key = ?",
+                (now, key),
+            )
+            self._conn.commit()
+            self.hits += 1
+
+        results = []
+        for cached in json.loads(row[0]):
+            result = FoodSearchResult(
+                **cached,
+                id=food.get("id"),
+                eaten_at=food.get("eaten_at", ""),
+                meal_type=food.get("meal_type") or "",
+            )
+            results.append(result.model_dump())
+        return results
+
+    def set(self, food: dict, results: list[dict], user_memory=None) -> None:
+        """Store validated search results for this food, evicting LRU entries if full."""
+        stored = []
+        for result in results:
+            dumped = FoodSearchResult(**result).model_dump()
+            stored.append({k: v for k, v in dumped.items() if k not in REQUEST_FIELDS})
+        if not stored:
+            return
+        now = time.time()
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO nutrition_cache (key, results, created_at, last_accessed) "
+                "VALUES (?, ?, ?, ?)",
+                (cache_key(food, user_memory), json.dumps(stored), now, now),
+            )
+            overflow = self._size() - self.max_entries
+            if overflow > 0:
+                self._conn.execute(
+                    "DELETE FROM nutrition_cache WHERE key IN ("
+                    "SELECT key FROM nutrition_cache ORDER BY last_accessed ASC LIMIT ?)",
+                    (overflow,),
+                )
+            self._conn.commit()
+
+    def stats(self) -> dict:
+        with self._lock:
+            size = self._size()
+        lookups = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+            "size": size,
+        }
+
+    def _size(self) -> int:
+        return self._conn.execute("SELECT COUNT(*) FROM nutrition_cache").fetchone()[0]
+
+
+_nutrition_cache: Optional[NutritionCache] = None
+
+
+def get_nutrition_cache() -> Optional[NutritionCache]:
+    """Return the process-wide cache, or None when NUTRITION_CACHE_ENABLED is false."""
+    global _nutrition_cache
+    if os.environ.get("NUTRITION_CACHE_ENABLED", "true").lower() in ("0", "false", "no"):
+        return None
+    if _nutrition_cache is None:
+        _nutrition_cache = NutritionCache.from_env()
+    return _nutrition_cache
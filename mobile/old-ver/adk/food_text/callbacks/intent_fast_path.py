@@ -0,0 +1,94 @@
+import json
+import re
+import threading
+from typing import Optional
+
+from google.adk.agents.callback_context import CallbackContext
+from google.genai import types
+
+# "I had pizza for lunch", "ate an apple", "for breakfast I had oatmeal":
+# a consumption verb is required, a meal name alone is not enough
+NEW_MEAL_PATTERN = re.compile(
+    r"\b(i|we)\s+(just\s+)?(had|ate|eaten|drank|have\s+had)\b"
+    r"|^\s*(just\s+)?(had|ate|drank)\b",
+    re.IGNORECASE,
+)
+# Anything that may edit an existing meal goes to the model
+UPDATE_PATTERN = re.compile(
+    r"\b(actually|instead|change|changed|update|edit|remove|delete|replace|"
+    r"wrong|fix|correct|forgot|add\s+to|not\s+\w+\s+but)\b",
+    re.IGNORECASE,
+)
+# Negations, corrections, partial amounts and questions go to the model too:
+# "I didn't eat the fries", "3 eggs, not 2", "I only had half", "what should I eat?"
+HEDGE_PATTERN = re.compile(
+    r"n't\b|\b(not|never|only|instead|actually|skip|skipped)\b|\?",
+    re.IGNORECASE,
+)
+# /api/resubmit sends "Answer 1: ... Answer 2: ..."
+ANSWER_PATTERN = re.compile(r"^\s*Answer\s+\d+\s*:", re.IGNORECASE)
+
+_lock = threading.Lock()
+_stats = {"requests": 0, "fast_path": 0}
+
+
+def fast_path_stats() -> dict:
+    with _lock:
+        requests = _stats["requests"]
+        return {
+            **_stats,
+            "hit_rate": _stats["fast_path"] / requests if requests else 0.0,
+        }
+
+
+def classify_intent(text: str, has_image: bool, questions_pending: bool) -> Optional[dict]:
+    """Return an Intent dict for inputs whose intent is unambiguous, else None."""
+    if questions_pending or ANSWER_PATTERN.match(text):
+        return {
+            "type": "answer_question",
+            "reasoning": "Reply to pending clarification questions",
+        }
+    if has_image and not text:
+        return {
+            "type": "new_meal",
+            "reasoning": "User provided an image of food for logging in nutrition tracker",
+        }
+    if (
+        text
+        and NEW_MEAL_PATTERN.search(text)
+        and not UPDATE_PATTERN.search(text)
+        and not HEDGE_PATTERN.search(text)
+    ):
+        return {"type": "new_meal", "reasoning": "User describes food they ate"}
+    return None
+
+
+def intent_fast_path(callback_context: CallbackContext) -> Optional[types.Content]:
+    """
+    Classify obvious inputs without calling the model: photo-only uploads,
+    answers to pending questions and plain "I had X" descriptions. The intent
+    is written to state just as the agent's output_key would.
+    """
+    parts = callback_context.user_content.parts if callback_context.user_content else []
+    text = " ".join(p.text for p in parts or [] if p.text).strip()
+    has_image = any(p.inline_data for p in parts or [])
+    parsed_foods = callback_context.state.get("parsed_foods") or {}
+    questions_pending = bool(
+        isinstance(parsed_foods, dict) and parsed_foods.get("questions")
+    )
+
+    intent = classify_intent(text, has_image, questions_pending)
+    with _lock:
+        _stats["requests"] += 1
+        if intent is not None:
+            _stats["fast_path"] += 1
+    stats = fast_path_stats()
+    print(
+        f"Intent fast path: {intent['type'] if intent else 'miss'} "
+        f"(hit rate {stats['fast_path']}/{stats['requests']} = {stats['hit_rate']:.0%})"
+    )
+
+    if intent is None:
+        return None
+    callback_context.state["intent"] = intent
+    return types.Content(role="model", parts=[types.Part(text=json.dumps(intent))])
@@ -0,0 +1,255 @@
+import asyncio
+import os
+import time
+from collections import deque
+from typing import AsyncGenerator, Optional
+
+from google.adk.agents import BaseAgent
+from google.adk.events import Event
+
+DEFAULT_MAX_CONCURRENCY = 8
+DEFAULT_REQUEST_CONCURRENCY = 4
+DEFAULT_TIMEOUT_SECONDS = 45
+# 0 disables hedging; otherwise a second attempt starts once the first has
+# run longer than this percentile of recent search latencies
+DEFAULT_HEDGE_PERCENTILE = 0
+HEDGE_MIN_SAMPLES = 20
+LATENCY_WINDOW = 200
+
+
+class FairSemaphore:
+    """
+    asyncio semaphore that grants slots strictly in arrival order.
+
+    A released slot is handed straight to the oldest waiter, so a request that
+    queued early is never overtaken by one that arrived later. Tracks how long
+    acquirers waited for a slot.
+    """
+
+    def __init__(self, limit: int):
+        self.limit = limit
+        self.in_use = 0
+        self.acquired = 0
+        self.total_wait = 0.0
+        self.max_wait = 0.0
+        self._waiters: deque[asyncio.Future] = deque()
+
+    async def acquire(self) -> float:
+        """Wait for a slot and return the seconds spent waiting."""
+        started = time.monotonic()
+        if self.in_use < self.limit and not self._waiters:
+            self.in_use += 1
+        else:
+            waiter = asyncio.get_running_loop().create_future()
+            self._waiters.append(waiter)
+            try:
+                await waiter
+            except asyncio.CancelledError:
+                if waiter.done() and not waiter.cancelled():
+                    # The slot was handed over just as we were cancelled
+                    self.release()
+                else:
+                    self._waiters.remove(waiter)
+                raise
+        waited = time.monotonic() - started
+        self.acquired += 1
+        self.total_wait += waited
+        self.max_wait = max(self.max_wait, waited)
+        return waited
+
+    def release(self) -> None:
+        while self._waiters:
+            waiter = self._waiters.popleft()
+            if not waiter.done():
+                # Hand the slot over without decrementing in_use
+                waiter.set_result(None)
+                return
+        self.in_use -= 1
+
+    async def __aenter__(self):
+        await self.acquire()
+        return self
+
+    async def __aexit__(self, *exc):
+        self.release()
+
+    def stats(self) -> dict:
+        return {
+            "limit": self.limit,
+            "in_use": self.in_use,
+            "waiting": len(self._waiters),
+            "acquired": self.acquired,
+            "avg_wait_seconds": self.total_wait / self.acquired if self.acquired else 0.0,
+            "max_wait_seconds": self.max_wait,
+        }
+
+
+class LatencyTracker:
+    """Rolling window of completed search latencies, for picking the hedge delay."""
+
+    def __init__(self, window: int = LATENCY_WINDOW):
+        self._samples: deque[float] = deque(maxlen=window)
+
+    def record(self, seconds: float) -> None:
+        self._samples.append(seconds)
+
+    def percentile(self, p: float) -> Optional[float]:
+        if len(self._samples) < HEDGE_MIN_SAMPLES:
+            return None
+        ordered = sorted(self._samples)
+        return ordered[min(len(ordered) - 1, int(len(ordered) * p / 100))]
+
+    def stats(self) -> dict:
+        return {
+            "samples": len(self._samples),
+            "p50_seconds": self.percentile(50),
+            "p95_seconds": self.percentile(95),
+        }
+
+
+search_latency = LatencyTracker()
+
+
+def food_search_timeout() -> float:
+    return float(os.environ.get("FOOD_SEARCH_TIMEOUT_SECONDS", DEFAULT_TIMEOUT_SECONDS))
+
+
+def hedge_delay() -> Optional[float]:
+    """Seconds after which to start a hedged attempt, or None when hedging is off."""
+    percentile = float(
+        os.environ.get("FOOD_SEARCH_HEDGE_PERCENTILE", DEFAULT_HEDGE_PERCENTILE)
+    )
+    if percentile <= 0:
+        return None
+    return search_latency.percentile(percentile)
+
+
+_search_slots: Optional[FairSemaphore] = None
+
+
+def get_search_slots() -> FairSemaphore:
+    """Process-wide cap on concurrent food search agents (FOOD_SEARCH_MAX_CONCURRENCY)."""
+    global _search_slots
+    if _search_slots is None:
+        _search_slots = FairSemaphore(
+            max(1, int(os.environ.get("FOOD_SEARCH_MAX_CONCURRENCY", DEFAULT_MAX_CONCURRENCY)))
+        )
+    return _search_slots
+
+
+def request_search_slots() -> FairSemaphore:
+    """Per-request cap on concurrent food search agents (FOOD_SEARCH_REQUEST_CONCURRENCY)."""
+    return FairSemaphore(
+        max(
+            1,
+            int(
+                os.environ.get(
+                    "FOOD_SEARCH_REQUEST_CONCURRENCY", DEFAULT_REQUEST_CONCURRENCY
+                )
+            ),
+        )
+    )
+
+
+async def _attempt(agent: BaseAgent, ctx, search_slots=None) -> list[Event]:
+    """Run one attempt to completion; hedged attempts bring their own slot."""
+    if search_slots is not None:
+        await search_slots.acquire()
+    try:
+        return [event async for event in agent.run_async(ctx)]
+    finally:
+        if search_slots is not None:
+            search_slots.release()
+
+
+async def _run_with_deadline(agent: BaseAgent, ctx, label: str, search_slots):
+    """
+    Run `agent` for at most FOOD_SEARCH_TIMEOUT_SECONDS, hedging with a
+    second concurrent run once it is slower than the hedge delay. Returns
+    (events, failure) where failure is None, "timeout" or "error".
+    """
+    timeout = food_search_timeout()
+    hedge_after = hedge_delay()
+    started = time.monotonic()
+    attempts = {asyncio.create_task(_attempt(agent, ctx)): started}
+    hedged = False
+    try:
+        while attempts:
+            elapsed = time.monotonic() - started
+            if elapsed >= timeout:
+                print(f"{label} timed out after {timeout:g}s")
+                return [], "timeout"
+            wait = timeout - elapsed
+            if hedge_after is not None and not hedged:
+                wait = min(wait, max(0.0, hedge_after - elapsed))
+
+            done, _ = await asyncio.wait(
+                attempts, timeout=wait, return_when=asyncio.FIRST_COMPLETED
+            )
+            for task in done:
+                attempt_started = attempts.pop(task)
+                try:
+                    events = task.result()
+                except Exception as e:
+                    print(f"{label} failed: {e}")
+                    continue
+                search_latency.record(time.monotonic() - attempt_started)
+                return events, None
+
+            if (
+                attempts
+                and hedge_after is not None
+                and not hedged
+                and time.monotonic() - started >= hedge_after
+            ):
+                hedged = True
+                print(f"{label} slower than {hedge_after:.2f}s, starting a hedged attempt")
+                task = asyncio.create_task(_attempt(agent, ctx, search_slots))
+                attempts[task] = time.monotonic()
+        return [], "error"
+    finally:
+        for task in attempts:
+            task.cancel()
+        await asyncio.gather(*attempts, return_exceptions=True)
+
+
+async def run_throttled(agent: BaseAgent, ctx, label: str, request_slots: FairSemaphore):
+    """
+    Run one search once it holds a slot from the request's own semaphore and
+    then from the process-wide one. Taking the request slot first means a
+    large request only queues for as many process-wide slots as its cap
+    allows, so other requests keep getting served in between.
+
+    Events are buffered until an attempt wins, so a losing, failed or timed
+    out attempt never writes to session state.
+    """
+    search_slots = get_search_slots()
+    async with request_slots:
+        waited = await search_slots.acquire()
+        try:
+            if waited > 0.5:
+                print(f"{label} waited {waited:.2f}s for a search slot")
+            return await _run_with_deadline(agent, ctx, label, search_slots)
+        finally:
+            search_slots.release()
+
+
+async def run_all_throttled(runs) -> AsyncGenerator[tuple, None]:
+    """
+    Run (key, agent, ctx) searches concurrently under one per-request cap and
+    yield (key, events, failure) as each finishes.
+    """
+    request_slots = request_search_slots()
+
+    async def run(key, agent, ctx):
+        events, failure = await run_throttled(agent, ctx, str(key), request_slots)
+        return key, events, failure
+
+    tasks = [asyncio.create_task(run(*r)) for r in runs]
+    try:
+        for next_done in asyncio.as_completed(tasks):
+            yield await next_done
+    finally:
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
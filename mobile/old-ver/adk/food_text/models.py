@@ -56,6 +56,14 @@ class FoodSearchResult(BaseModel):
     others: dict = {}
 
 
+class UnresolvedFood(BaseModel):
+    id: Optional[int] = None
+    name: str
+    eaten_at: str = ""
+    meal_type: Optional[str] = None
+    reason: str  # "timeout", "error", "unparseable" or "invalid_result"
+
+
 class Intent(BaseModel):
     type: str  # "new_meal", "update_meal", "answer_question"
     reasoning: str  # Brief explanation of classification
@@ -64,4 +72,4 @@ class Intent(BaseModel):
 class RequestResponse(BaseModel):
     foods: list[FoodSearchResult]
     request_type: str  # "new" or "update"
-    pass
+    unresolved: list[UnresolvedFood] = []
@@ -0,0 +1,251 @@
+import csv
+import os
+import sqlite3
+import threading
+from typing import Optional
+
+from food_text.cache import normalize_text
+from food_text.models import FoodSearchResult
+
+DEFAULT_CATALOG_PATH = os.path.join(
+    os.path.dirname(__file__), "data", "nutrition_catalog.csv"
+)
+DEFAULT_MIN_SCORE = 0.85
+
+NUTRIENT_COLUMNS = (
+    "calories",
+    "protein_g",
+    "carbs_g",
+    "trans_fat_g",
+    "saturated_fat_g",
+    "unsaturated_fat_g",
+)
+# Catalog columns that are not FoodSearchResult fields end up in "others"
+OTHER_COLUMNS = ("fiber_g", "sugar_g", "sodium_mg")
+
+GRAMS_PER_UNIT = {"g": 1.0, "oz": 28.35, "lb": 453.6, "kg": 1000.0}
+
+UNIT_ALIASES = {
+    "piece": ("piece", "pieces", "whole", "medium", "item", "items", "fruit"),
+    "cup": ("cup", "cups"),
+    "slice": ("slice", "slices", "strip", "strips"),
+    "tbsp": ("tbsp", "tablespoon", "tablespoons"),
+    "tsp": ("tsp", "teaspoon", "teaspoons"),
+    "can": ("can", "cans"),
+    "serving": ("serving", "servings", "portion", "portions"),
+    "g": ("g", "gram", "grams"),
+    "oz": ("oz", "ounce", "ounces"),
+    "lb": ("lb", "lbs", "pound", "pounds"),
+    "kg": ("kg", "kilogram", "kilograms"),
+}
+_UNIT_LOOKUP = {alias: unit for unit, aliases in UNIT_ALIASES.items() for alias in aliases}
+# Description words that say nothing about which food it is
+FILLER_WORDS = {"a", "an", "the", "of", "some", "one", "small", "large", "plain", "fresh"}
+
+
+def normalize_unit(unit) -> str:
+    unit = normalize_text(unit).rstrip(".")
+    return _UNIT_LOOKUP.get(unit, unit)
+
+
+def word_stems(text) -> set[str]:
+    """Normalized words with a plural "s" dropped, so "apples" and "apple" compare equal."""
+    return {
+        word[:-1] if len(word) > 3 and word.endswith("s") else word
+        for word in normalize_text(text).split()
+    }
+
+
+def memory_mentions(user_memory, food: dict) -> bool:
+    """True when a user memory names the food, e.g. "I drink my coffee with oat milk"."""
+    name_stems = {stem for stem in word_stems(food.get("name")) if len(stem) > 2}
+    return any(name_stems & word_stems(memory) for memory in user_memory or [])
+
+
+def trigrams(text: str) -> set[str]:
+    """pg_trgm style trigrams: each word padded with two leading and one trailing space."""
+    grams = set()
+    for word in normalize_text(text).split():
+        padded = f"  {word} "
+        grams.update(padded[i : i + 3] for i in range(len(padded) - 2))
+    return grams
+
+
+class NutritionDatabase:
+    """
+    Local nutrition catalog loaded from a USDA-style CSV into SQLite.
+
+    Names and aliases are indexed by trigram so lookups stay fast and tolerate
+    small spelling differences. Nutrient values in the catalog are per serving.
+    """
+
+    def __init__(
+        self,
+        catalog_path: str = DEFAULT_CATALOG_PATH,
+        min_score: float = DEFAULT_MIN_SCORE,
+    ):
+        self.min_score = min_score
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(":memory:", check_same_thread=False)
+        self._conn.row_factory = sqlite3.Row
+        self._conn.executescript(
+            f"""
+            CREATE TABLE foods (
+                id INTEGER PRIMARY KEY,
+                name TEXT NOT NULL,
+                serving_unit TEXT NOT NULL,
+                serving_grams REAL NOT NULL,
+                {", ".join(f"{c} REAL NOT NULL DEFAULT 0" for c in NUTRIENT_COLUMNS + OTHER_COLUMNS)}
+            );
+            CREATE TABLE food_names (
+                id INTEGER PRIMARY KEY,
+                food_id INTEGER NOT NULL REFERENCES foods (id),
+                name TEXT NOT NULL,
+                trigram_count INTEGER NOT NULL
+            );
+            CREATE TABLE name_trigrams (
+                trigram TEXT NOT NULL,
+                name_id INTEGER NOT NULL REFERENCES food_names (id)
+            );
+            CREATE INDEX name_trigrams_trigram ON name_trigrams (trigram);
+            """
+        )
+        self._load(catalog_path)
+
+    @classmethod
+    def from_env(cls) -> "NutritionDatabase":
+        return cls(
+            catalog_path=os.environ.get(
+                "LOCAL_NUTRITION_CATALOG_PATH", DEFAULT_CATALOG_PATH
+            ),
+            min_score=float(
+                os.environ.get("LOCAL_NUTRITION_MIN_SCORE", DEFAULT_MIN_SCORE)
+            ),
+        )
+
+    def _load(self, catalog_path: str) -> None:
+        columns = ("name", "serving_unit", "serving_grams") + NUTRIENT_COLUMNS + OTHER_COLUMNS
+        with open(catalog_path, newline="", encoding="utf-8") as f:
+            for row in csv.DictReader(f):
+                values = [row["name"], normalize_unit(row["serving_unit"])]
+                values += [float(row.get(c) or 0) for c in columns[2:]]
+                food_id = self._conn.execute(
+                    f"INSERT INTO foods ({', '.join(columns)}) "
+                    f"VALUES ({', '.join('?' for _ in columns)})",
+                    values,
+                ).lastrowid
+                aliases = [a for a in (row.get("aliases") or "").split("|") if a]
+                for name in [row["name"], *aliases]:
+                    name_trigrams = trigrams(name)
+                    name_id = self._conn.execute(
+                        "INSERT INTO food_names (food_id, name, trigram_count) VALUES (?, ?, ?)",
+                        (food_id, normalize_text(name), len(name_trigrams)),
+                    ).lastrowid
+                    self._conn.executemany(
+                        "INSERT INTO name_trigrams (trigram, name_id) VALUES (?, ?)",
+                        [(t, name_id) for t in name_trigrams],
+                    )
+        self._conn.commit()
+
+    def search(self, name: str, limit: int = 5) -> list[dict]:
+        """Return catalog foods ranked by trigram similarity to `name`."""
+        query = trigrams(name)
+        if not query:
+            return []
+        placeholders = ", ".join("?" for _ in query)
+        with self._lock:
+            rows = self._conn.execute(
+                f"""
+                SELECT f.*, n.name AS matched_name,
+                       CAST(COUNT(*) AS REAL) / (n.trigram_count + ? - COUNT(*)) AS score
+                FROM name_trigrams t
+                JOIN food_names n ON n.id = t.name_id
+                JOIN foods f ON f.id = n.food_id
+                WHERE t.trigram IN ({placeholders})
+                GROUP BY n.id
+                ORDER BY score DESC
+                """,
+                (len(query), *query),
+            ).fetchall()
+
+        # Keep the best scoring alias per catalog food
+        matches = {}
+        for row in rows:
+            if row["id"] not in matches:
+                matches[row["id"]] = dict(row)
+            if len(matches) == limit:
+                break
+        return list(matches.values())
+
+    def match(self, food: dict, user_memory=None) -> Optional[list[dict]]:
+        """
+        Resolve a parsed food to FoodSearchResult dicts when the catalog has a
+        high-confidence match in a convertible unit, otherwise return None.
+
+        Only the name is scored, so a food whose description adds anything the
+        catalog entry's names don't cover ("with peanut butter", "fried") goes
+        to the search agent, as does any food the user's memory mentions.
+        """
+        if memory_mentions(user_memory, food):
+            return None
+        candidates = self.search(food.get("name", ""), limit=1)
+        if not candidates or candidates[0]["score"] < self.min_score:
+            return None
+        entry = candidates[0]
+        if not self.describes(entry, food.get("description")):
+            return None
+        factor = self.serving_factor(entry, food.get("quantity", 1.0), food.get("unit"))
+        if factor is None:
+            return None
+
+        result = FoodSearchResult(
+            id=food.get("id"),
+            name=food["name"],
+            eaten_at=food.get("eaten_at", ""),
+            meal_type=food.get("meal_type") or "",
+            serving_size=max(1, round(factor)),
+            others={c: round(entry[c] * factor, 1) for c in OTHER_COLUMNS if entry[c]},
+            **{c: round(entry[c] * factor, 1) for c in NUTRIENT_COLUMNS},
+        )
+        return [result.model_dump()]
+
+    def describes(self, entry: dict, description) -> bool:
+        """True when `description` only repeats words from the entry's names and aliases."""
+        words = word_stems(description) - FILLER_WORDS
+        words = {w for w in words if w not in _UNIT_LOOKUP and not w.replace(".", "").isdigit()}
+        if not words:
+            return True
+        with self._lock:
+            names = self._conn.execute(
+                "SELECT name FROM food_names WHERE food_id = ?", (entry["id"],)
+            ).fetchall()
+        return words <= set().union(*(word_stems(row["name"]) for row in names))
+
+    @staticmethod
+    def serving_factor(entry: dict, quantity, unit) -> Optional[float]:
+        """Number of catalog servings in `quantity` `unit`, or None if not convertible."""
+        try:
+            quantity = float(quantity)
+        except (TypeError, ValueError):
+            return None
+        unit = normalize_unit(unit or "serving")
+        serving_unit = entry["serving_unit"]
+
+        if unit in (serving_unit, "serving"):
+            return quantity
+        if unit in GRAMS_PER_UNIT:
+            return quantity * GRAMS_PER_UNIT[unit] / entry["serving_grams"]
+        return None
+
+
+_nutrition_db: Optional[NutritionDatabase] = None
+
+
+def get_nutrition_db() -> Optional[NutritionDatabase]:
+    """Return the process-wide catalog, or None when LOCAL_NUTRITION_DB_ENABLED is false."""
+    global _nutrition_db
+    if os.environ.get("LOCAL_NUTRITION_DB_ENABLED", "true").lower() in ("0", "false", "no"):
+        return None
+    if _nutrition_db is None:
+        _nutrition_db = NutritionDatabase.from_env()
+    return _nutrition_db
@@ -0,0 +1,91 @@
+import json
+from datetime import datetime
+
+from google.adk.agents import LlmAgent
+from google.adk.agents.readonly_context import ReadonlyContext
+from google.genai import types
+
+from food_text.models import ParsedFoods
+
+GEMINI_MODEL = "gemini-2.5-flash"
+
+
+def can_resume_from_answers(state) -> bool:
+    """
+    True when this turn answers questions about a checkpointed parse, so only
+    its ambiguous foods need parsing again.
+    """
+    intent = state.get("intent") or {}
+    parsed_foods = state.get("parsed_foods") or {}
+    if intent.get("type") != "answer_question" or not isinstance(parsed_foods, dict):
+        return False
+    return bool(parsed_foods.get("questions")) and any(
+        food.get("ambiguous", False) for food in parsed_foods.get("foods", [])
+    )
+
+
+def answer_resolver_instruction(ctx: ReadonlyContext) -> str:
+    parsed_foods = ctx.state.get("parsed_foods") or {}
+    ambiguous_foods = [
+        food for food in parsed_foods.get("foods", []) if food.get("ambiguous", False)
+    ]
+    user_memory = (ctx.state.get("personalization") or {}).get("memory", [])
+    return f"""It is currently {datetime.now().isoformat()}.
+
+The user was asked these clarification questions: {json.dumps(parsed_foods.get("questions", []))}
+
+They were about these ambiguous foods: {json.dumps(ambiguous_foods)}
+
+User memory for personalization: {json.dumps(user_memory)}
+
+The user's message contains their answers, in order ("Answer 1: ... Answer 2: ...").
+Use the answers to resolve ONLY the ambiguous foods listed above. Do not add other foods.
+Return a JSON object conforming to the ParsedFoods schema with the resolved foods in "foods", each with ALL fields: name, description, eaten_at, meal_type, quantity, unit, ambiguous=false.
+Keep each food's eaten_at, meal_type and id (if present) unless an answer changes them.
+Set questions=[] unless an answer leaves a food impossible to resolve; then ask only about that food.
+
+IMPORTANT: Return ONLY the JSON object. Do not wrap in markdown, code blocks, backticks, or any formatting. No ```json or extra text."""
+
+
+def skip_unless_answering(callback_context):
+    """Run only for answers to questions about a checkpointed parse."""
+    if can_resume_from_answers(callback_context.state):
+        return None
+    return types.Content(
+        role="model",
+        parts=[types.Part(text=json.dumps(callback_context.state.get("parsed_foods", {})))],
+    )
+
+
+def combine_resolved_foods(callback_context):
+    """
+    Replace the ambiguous foods in parsed_foods with the resolved ones; the
+    non-ambiguous foods are kept exactly as parsed, so their checkpointed
+    search results are reused.
+    """
+    if not can_resume_from_answers(callback_context.state):
+        return None
+    resolved = callback_context.state.get("resolved_foods") or {}
+    previous = callback_context.state.get("parsed_foods") or {}
+    foods = [f for f in previous.get("foods", []) if not f.get("ambiguous", False)]
+    foods += [{**food, "ambiguous": False} for food in resolved.get("foods", [])]
+    callback_context.state["parsed_foods"] = {
+        "foods": foods,
+        "questions": resolved.get("questions", []),
+    }
+    print(f"Resolved {len(resolved.get('foods', []))} ambiguous foods from answers")
+    return None
+
+
+# Sub-Agent: Resolve ambiguous foods from answers to clarification questions
+answer_resolver_agent = LlmAgent(
+    name="AnswerResolverAgent",
+    model=GEMINI_MODEL,
+    instruction=answer_resolver_instruction,
+    output_schema=ParsedFoods,
+    output_key="resolved_foods",
+    # Only the answers are needed; the rest of the conversation is in the instruction
+    include_contents="none",
+    before_agent_callback=skip_unless_answering,
+    after_agent_callback=combine_resolved_foods,
+)
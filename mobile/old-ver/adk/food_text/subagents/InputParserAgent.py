@@ -1,7 +1,9 @@
+import json
 from datetime import datetime
 from google.adk.agents import LlmAgent
 from google.genai import types
 from food_text.models import ParsedFoods
+from food_text.subagents.AnswerResolverAgent import can_resume_from_answers
 from food_text.tools import (
     lookup_existing_meal,
     process_question_answers,
@@ -13,6 +15,14 @@ GEMINI_MODEL = "gemini-2.5-flash"
 
 def provide_previous_context_for_answers(callback_context):
     """Provide previous context when answering questions"""
+    # Answers to questions about a checkpointed parse skip re-parsing;
+    # AnswerResolverAgent resolves just the ambiguous foods
+    if can_resume_from_answers(callback_context.state):
+        return types.Content(
+            role="model",
+            parts=[types.Part(text=json.dumps(callback_context.state["parsed_foods"]))],
+        )
+
     intent = callback_context.state.get("intent", {})
 
     # Always provide personalization context
@@ -1,4 +1,5 @@
 from google.adk.agents import LlmAgent
+from food_text.callbacks.intent_fast_path import intent_fast_path
 from food_text.models import Intent
 from food_text.tools import pass_to_next_agent
 
@@ -50,4 +51,6 @@ IMPORTANT: Return ONLY the JSON object. No markdown, code blocks, or extra text.
     output_schema=Intent,
     output_key="intent",
     tools=[pass_to_next_agent],
+    # Obvious inputs are classified without a model call
+    before_agent_callback=intent_fast_path,
 )
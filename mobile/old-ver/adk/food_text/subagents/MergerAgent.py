@@ -1,66 +1,119 @@
 import json
-from google.adk.agents import LlmAgent
+from typing import AsyncGenerator
+
+from google.adk.agents import BaseAgent
+from google.adk.events import Event, EventActions
 from google.genai import types
-from food_text.models import RequestResponse
-
-GEMINI_MODEL = "gemini-2.5-flash"
-
-
-def skip_merger_if_questions_pending(callback_context):
-    """Skip merger if questions are pending and provide personalization context"""
-    # Always provide personalization context
-    personalization = callback_context.state.get("personalization", {})
-    user_memory = personalization.get("memory", [])
-    if user_memory:
-        callback_context.state["user_memory"] = user_memory
-
-    if callback_context.state.get("questions_pending", False):
-        # Questions are pending, skip merger execution
-        return types.Content(
-            role="assistant",
-            parts=[
-                types.Part(
-                    text=json.dumps(
-                        {
-                            "questions": callback_context.state.get(
-                                "parsed_foods", {}
-                            ).get("questions", []),
-                            "status": "questions_pending",
-                        }
-                    )
+from pydantic import ValidationError
+
+from food_text.models import FoodSearchResult, RequestResponse, UnresolvedFood
+from food_text.tools import food_state_key, strip_code_blocks
+
+# Carried over from the parsed food when a search result leaves them empty
+PARSED_FOOD_FIELDS = ("id", "eaten_at", "meal_type")
+
+
+def merge_search_results(food: dict, search_result) -> list[dict]:
+    """
+    Validate one food's search results against FoodSearchResult, filling id,
+    eaten_at and meal_type from the parsed food where the search left them out.
+    """
+    if isinstance(search_result, str):
+        try:
+            search_result = json.loads(strip_code_blocks(search_result.strip()))
+        except json.JSONDecodeError:
+            print(f"Unparseable search result for {food.get('name')}: {search_result}")
+            return []
+    items = search_result if isinstance(search_result, list) else [search_result]
+
+    results = []
+    for item in items:
+        if not isinstance(item, dict):
+            continue
+        item = dict(item)
+        for field in PARSED_FOOD_FIELDS:
+            if item.get(field) in (None, "") and food.get(field) is not None:
+                item[field] = food[field]
+        try:
+            results.append(FoodSearchResult(**item).model_dump())
+        except ValidationError as e:
+            print(f"Dropping invalid search result for {food.get('name')}: {e}")
+    return results
+
+
+class NutritionMergerAgent(BaseAgent):
+    """
+    Combines the per-food search results into the RequestResponse JSON.
+
+    This is list concatenation, so it is done in code rather than by a model:
+    each food's search_result_* entry is validated and the results are output
+    in parsed order, without summing anything. Foods the processor could not
+    resolve, or whose results fail validation here, are listed under
+    "unresolved" so the rest of the meal is still returned.
+    """
+
+    def __init__(self):
+        super().__init__(name="NutritionMergerAgent")
+
+    def _final_event(self, invocation_context, output: dict, state_delta: dict) -> Event:
+        return Event(
+            invocation_id=invocation_context.invocation_id,
+            author=self.name,
+            branch=invocation_context.branch,
+            content=types.Content(
+                role="model", parts=[types.Part(text=json.dumps(output))]
+            ),
+            actions=EventActions(state_delta=state_delta),
+        )
+
+    async def _run_async_impl(self, invocation_context) -> AsyncGenerator[Event, None]:
+        state = invocation_context.session.state
+        parsed_foods = state.get("parsed_foods", {}) or {}
+
+        # Questions are pending, so there is nothing to merge yet
+        if state.get("questions_pending", False) or parsed_foods.get("questions"):
+            output = {
+                "questions": parsed_foods.get("questions", []),
+                "status": "questions_pending",
+            }
+            yield self._final_event(invocation_context, output, {})
+            return
+
+        unresolved = list(state.get("unresolved_foods") or [])
+        unresolved_names = {food["name"] for food in unresolved}
+        foods = []
+        for food in parsed_foods.get("foods", []):
+            if food.get("name") in unresolved_names:
+                continue
+            search_result = state.get(f"search_result_{food_state_key(food)}")
+            results = (
+                merge_search_results(food, search_result)
+                if search_result is not None
+                else []
+            )
+            if not results:
+                print(f"No usable search result for {food.get('name')}")
+                unresolved.append(
+                    UnresolvedFood(
+                        id=food.get("id"),
+                        name=food.get("name", ""),
+                        eaten_at=food.get("eaten_at") or "",
+                        meal_type=food.get("meal_type"),
+                        reason="invalid_result",
+                    ).model_dump()
                 )
-            ],
+                continue
+            foods.extend(results)
+
+        intent = state.get("intent", {}) or {}
+        request_type = "update" if intent.get("type") == "update_meal" else "new"
+        response = RequestResponse(
+            foods=foods, request_type=request_type, unresolved=unresolved
+        ).model_dump()
+        yield self._final_event(
+            invocation_context, response, {"final_result": response}
         )
-    return None
 
 
 # Sub-Agent: Nutrition Merger
-merger_agent = LlmAgent(
-    name="NutritionMergerAgent",
-    model=GEMINI_MODEL,
-    instruction="""Consider the user's memory for personalization when merging nutrition data. User memory contains their past preferences and dietary habits that can help ensure the final output aligns with their typical choices and expectations.
-
-CONDITIONAL BEHAVIOR BASED ON INTENT:
-
-If intent.type == "new_meal":
-Output a JSON object conforming to the RequestResponse schema: {"request_type": "new", "foods": list of FoodSearchResult objects}.
-Take the search results from all food searches and combine them into a single list.
-Do NOT sum or aggregate values. Output each individual food item as found.
-Preserve the eaten_at timestamp from the original parsed foods for each item.
-
-If intent.type == "update_meal":
-1. Use the update_existing_meal tool to apply the parsed update operations
-2. Return the updated meal data in RequestResponse format: {"request_type": "update", "foods": list of FoodSearchResult objects with ids}
-3. Preserve original timestamps and metadata where not modified
-
-If intent.type == "answer_question":
-Continue with normal merging behavior using the resolved foods from question answers.
-Output {"request_type": "new", "foods": list of FoodSearchResult objects}.
-
-Output format: {"request_type": "new", "foods": [{"id": null, "name": "McDonald's cheeseburger", "eaten_at": "2025-09-28T12:00:00", "meal_type": "lunch", "serving_size": 1, "calories": 540.0, "protein_g": 25.0, "carbs_g": 45.0, "trans_fat_g": 1.5, "saturated_fat_g": 12.0, "unsaturated_fat_g": 8.0, "others": {"sodium_mg": 1040}}, {"id": null, "name": "apple", "eaten_at": "2025-09-27T15:00:00", "meal_type": "snack", "serving_size": 2, "calories": 160.0, "protein_g": 0.6, "carbs_g": 42.0, "trans_fat_g": 0.0, "saturated_fat_g": 0.1, "unsaturated_fat_g": 0.2, "others": {}}]}.
-
-IMPORTANT: Return ONLY the JSON object. Do not wrap in markdown, code blocks, backticks, or any formatting. No ```json or extra text.""",
-    output_key="final_result",
-    output_schema=RequestResponse,
-    before_agent_callback=skip_merger_if_questions_pending,
-)
+merger_agent = NutritionMergerAgent()
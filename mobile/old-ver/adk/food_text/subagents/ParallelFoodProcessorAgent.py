@@ -1,27 +1,249 @@
 import json
-from google.adk.agents import LlmAgent, ParallelAgent, BaseAgent
-from google.adk.events import Event
-from typing import AsyncGenerator
+import os
+from google.adk.agents import LlmAgent, BaseAgent
+from google.adk.events import Event, EventActions
+from typing import AsyncGenerator, Optional
 from google.genai import types
 from google.adk.tools import google_search
+from pydantic import ValidationError
+from food_text.cache import cache_key, get_nutrition_cache
+from food_text.concurrency import get_search_slots, run_all_throttled, search_latency
+from food_text.nutrition_db import get_nutrition_db
 from food_text.models import *
-from food_text.tools import strip_code_blocks
+from food_text.subagents.MergerAgent import merge_search_results
+from food_text.tools import strip_code_blocks, food_state_key
 
 GEMINI_MODEL = "gemini-2.5-flash"
+LOCAL_CANDIDATE_MIN_SCORE = 0.4
+DEFAULT_BATCH_SIZE = 1
+DEFAULT_PARSE_RETRIES = 1
+
+
+def as_search_results(search_result) -> list[dict]:
+    """Normalize a FoodSearchAgent output (object or array) into validated result dicts."""
+    items = search_result if isinstance(search_result, list) else [search_result]
+    results = []
+    for item in items:
+        try:
+            results.append(FoodSearchResult(**item).model_dump())
+        except (TypeError, ValidationError):
+            return []
+    return results
+
+
+def food_search_batch_size() -> int:
+    """Foods resolved per model call; 1 keeps one FoodSearchAgent per food."""
+    return max(1, int(os.environ.get("FOOD_SEARCH_BATCH_SIZE", DEFAULT_BATCH_SIZE)))
+
+
+def food_search_parse_retries() -> int:
+    """Extra per-food attempts for foods whose search output could not be parsed."""
+    return max(0, int(os.environ.get("FOOD_SEARCH_PARSE_RETRIES", DEFAULT_PARSE_RETRIES)))
+
+
+def food_search_prefetch_enabled() -> bool:
+    """
+    Whether clear foods are searched before clarification questions are
+    returned. Off by default: /run only answers once the invocation ends, so
+    the prefetch delays the questions by up to a search deadline, and it is
+    wasted if the user never answers.
+    """
+    return os.environ.get("FOOD_SEARCH_PREFETCH_ON_QUESTIONS", "false").lower() in ("1", "true", "yes")
+
+
+def unresolved_food(food: dict, reason: str) -> dict:
+    """UnresolvedFood entry for a parsed food the search could not resolve."""
+    return UnresolvedFood(
+        id=food.get("id"),
+        name=food["name"],
+        eaten_at=food.get("eaten_at", ""),
+        meal_type=food.get("meal_type"),
+        reason=reason,
+    ).model_dump()
+
+
+def local_catalog_candidates(nutrition_db, food: dict) -> list[dict]:
+    """Close local catalog entries worth showing the model for this food."""
+    if not nutrition_db:
+        return []
+    return [
+        c
+        for c in nutrition_db.search(food["name"], limit=3)
+        if c["score"] >= LOCAL_CANDIDATE_MIN_SCORE
+    ]
+
+
+def split_batch_results(batch_output, count: int) -> list[Optional[list]]:
+    """
+    Map a batch agent's output back to its `count` input foods, in order.
+    Accepts the requested {"index": [...]} object or a positional list; foods
+    the model left out get None. Results are validated later by the merger,
+    exactly as per-food search output is.
+    """
+    if isinstance(batch_output, str):
+        try:
+            batch_output = json.loads(strip_code_blocks(batch_output.strip()))
+        except json.JSONDecodeError:
+            print(f"Unparseable batch search output: {batch_output}")
+            return [None] * count
+    if isinstance(batch_output, list) and len(batch_output) == count:
+        batch_output = {str(i): item for i, item in enumerate(batch_output)}
+    if not isinstance(batch_output, dict):
+        return [None] * count
+
+    results = []
+    for i in range(count):
+        item = batch_output.get(str(i))
+        if isinstance(item, dict):
+            item = [item]
+        results.append(item if isinstance(item, list) and item else None)
+    return results
+
+
+def final_text(events: list[Event]) -> Optional[str]:
+    """Text of the final response among a search run's events, as output_key would store it."""
+    for event in reversed(events):
+        if event.is_final_response() and event.content and event.content.parts:
+            return "".join(
+                part.text for part in event.content.parts if part.text and not part.thought
+            )
+    return None
+
+
+# The search agents below are built once and shared by every request. The food
+# (or foods), memory and local candidates for a run are not formatted into the
+# instruction; they are placed in that run's session state under temp: keys
+# and filled in by ADK's {state} templating when the request is built.
+FOOD_SEARCH_INSTRUCTION = """You are processing this specific food item: {temp:search_foods}
+
+            {temp:search_memory}
+
+            Consider the user's memory for personalization when selecting nutrition data. User memory contains their past preferences and dietary habits that can help choose the most appropriate nutrition values.
+
+            Output ONLY a JSON array conforming to the RequestResponse schema: a list of FoodSearchResult objects, each with "id" (int or null), "name" string, "eaten_at" string, "meal_type" string or null, "serving_size" int default 1, "calories" float default 0.0, "protein_g" float default 0.0, "carbs_g" float default 0.0, "trans_fat_g" float default 0.0, "saturated_fat_g" float default 0.0, "unsaturated_fat_g" float default 0.0, "others" dict default empty.
+
+            {temp:search_local_context}
+
+            Use google search to verify the nutrition value based on usda and openfoodfoundation.
+            Select the best matching result from the search results.
+            IMPORTANT: Preserve the eaten_at timestamp from the input food data exactly as provided.
+            IMPORTANT: If the input food data has an "id" field, include it in the output FoodSearchResult.
+            Output {"id": null, "name": "McDonald's cheeseburger", "eaten_at": "2025-09-28T19:00:00", "meal_type": "Dinner", "serving_size": 1, "calories": 540.0, "protein_g": 25.0, "carbs_g": 45.0, "trans_fat_g": 1.5, "saturated_fat_g": 12.0, "unsaturated_fat_g": 8.0, "others": {"sodium_mg": 1040}}, ....
+            Handle missing data gracefully.
+            IMPORTANT: Return ONLY the JSON array. Do not wrap in markdown, code blocks, backticks, or any formatting. No ```json or extra text."""
+
+BATCH_SEARCH_INSTRUCTION = """You are processing these food items, keyed by index: {temp:search_foods}
+
+            {temp:search_memory}
+
+            Consider the user's memory for personalization when selecting nutrition data. User memory contains their past preferences and dietary habits that can help choose the most appropriate nutrition values.
+
+            Output ONLY a JSON object mapping every input index to a JSON array of FoodSearchResult objects for that food, each with "id" (int or null), "name" string, "eaten_at" string, "meal_type" string or null, "serving_size" int default 1, "calories" float default 0.0, "protein_g" float default 0.0, "carbs_g" float default 0.0, "trans_fat_g" float default 0.0, "saturated_fat_g" float default 0.0, "unsaturated_fat_g" float default 0.0, "others" dict default empty.
+
+            {temp:search_local_context}
+
+            Use google search to verify the nutrition values based on usda and openfoodfoundation.
+            Select the best matching result for each food. Never merge foods or move values between indexes.
+            IMPORTANT: Preserve each food's eaten_at timestamp exactly as provided.
+            IMPORTANT: If an input food has an "id" field, include it in its output FoodSearchResult.
+            Output {"0": [{"id": null, "name": "McDonald's cheeseburger", "eaten_at": "2025-09-28T19:00:00", "meal_type": "Dinner", "serving_size": 1, "calories": 540.0, "protein_g": 25.0, "carbs_g": 45.0, "trans_fat_g": 1.5, "saturated_fat_g": 12.0, "unsaturated_fat_g": 8.0, "others": {"sodium_mg": 1040}}], "1": [...]}.
+            Handle missing data gracefully.
+            IMPORTANT: Return ONLY the JSON object. Do not wrap in markdown, code blocks, backticks, or any formatting. No ```json or extra text."""
+
+# Sub-agent for searching one food
+food_search_agent = LlmAgent(
+    name="FoodSearchAgent",
+    model=GEMINI_MODEL,
+    instruction=FOOD_SEARCH_INSTRUCTION,
+    tools=[google_search],
+)
+
+# Sub-agent for searching several foods in one call, keyed by input index
+batch_search_agent = LlmAgent(
+    name="FoodSearchBatch",
+    model=GEMINI_MODEL,
+    instruction=BATCH_SEARCH_INSTRUCTION,
+    tools=[google_search],
+)
+
+
+def search_state(foods: list[dict], memory_context: str, nutrition_db) -> dict:
+    """The temp: state one search run reads through its instruction template."""
+    if len(foods) == 1:
+        search_foods = foods[0]
+        # Offer close local catalog entries so the model can skip the web search
+        local_candidates = local_catalog_candidates(nutrition_db, foods[0])
+        local_context = (
+            f"Local nutrition database candidates (values are per serving_unit): {json.dumps(local_candidates)}. "
+            "If one of these is clearly the same food, scale its values to the quantity and skip the search."
+            if local_candidates
+            else ""
+        )
+    else:
+        search_foods = {str(i): food for i, food in enumerate(foods)}
+        local_candidates = {
+            str(i): candidates
+            for i, food in enumerate(foods)
+            if (candidates := local_catalog_candidates(nutrition_db, food))
+        }
+        local_context = (
+            f"Local nutrition database candidates by food index (values are per serving_unit): {json.dumps(local_candidates)}. "
+            "If one of these is clearly the same food, scale its values to the quantity and skip searching for that food."
+            if local_candidates
+            else ""
+        )
+    return {
+        "temp:search_foods": json.dumps(search_foods),
+        "temp:search_memory": memory_context,
+        "temp:search_local_context": local_context,
+    }
+
+
+def search_context(invocation_context, branch: str, state: dict):
+    """
+    Copy of the invocation context for one search run: its own branch, as
+    ParallelAgent would give it, and a session whose state also holds this
+    run's temp: inputs. The copy shares the events list, and nothing a run
+    yields is appended until the processor re-yields it.
+    """
+    session = invocation_context.session
+    session = session.model_copy(update={"state": {**session.state, **state}})
+    if invocation_context.branch:
+        branch = f"{invocation_context.branch}.{branch}"
+    return invocation_context.model_copy(update={"branch": branch, "session": session})
 
 
 class ParallelFoodProcessorAgent(BaseAgent):
     def __init__(self):
         super().__init__(name="ParallelMealProcessorAgent")
 
+    def _search_result_event(self, invocation_context, food_name, results) -> Event:
+        """Event storing one food's search results (or raw search output) in state."""
+        result_text = results if isinstance(results, str) else json.dumps(results)
+        return Event(
+            invocation_id=invocation_context.invocation_id,
+            author=f"FoodSearchAgent_{food_name}",
+            content=types.Content(role="model", parts=[types.Part(text=result_text)]),
+            actions=EventActions(
+                state_delta={f"search_result_{food_name}": result_text}
+            ),
+        )
+
     async def run_async(self, invocation_context) -> AsyncGenerator[Event, None]:
         # Check callback before processing - manually check for questions
         parsed_foods = invocation_context.session.state.get("parsed_foods", {})
+        foods = parsed_foods.get("foods", [])
 
         # Check if there are any questions in the parsed foods
         if parsed_foods.get("questions", []):
             # Set flag in session state to indicate questions are pending
             invocation_context.session.state["questions_pending"] = True
+            # Optionally search the foods that are already clear now, so the
+            # answer turn only has to search the ambiguous ones
+            if food_search_prefetch_enabled():
+                clear_foods = [f for f in foods if not f.get("ambiguous", False)]
+                async for event in self._resolve_foods(invocation_context, clear_foods):
+                    yield event
             # Return the questions as the final response, skipping this agent
             content = types.Content(
                 role="assistant",
@@ -30,67 +252,178 @@ class ParallelFoodProcessorAgent(BaseAgent):
             yield Event(author=self.name, content=content)
             return
 
-        parsed_foods = invocation_context.session.state.get("parsed_foods", {})
-        sub_agents = []
-        foods = parsed_foods.get("foods", [])
+        async for event in self._resolve_foods(invocation_context, foods):
+            yield event
 
+    async def _resolve_foods(self, invocation_context, foods) -> AsyncGenerator[Event, None]:
+        """
+        Resolve search results for `foods` into search_result_* state, then
+        record unresolved_foods and checkpoint the resolved results.
+        """
         # Get user memory for personalization
         personalization = invocation_context.session.state.get("personalization", {})
         user_memory = personalization.get("memory", [])
         memory_context = f"User memory for personalization: {json.dumps(user_memory)}" if user_memory else "No user memory available."
 
+        # Reuse results checkpointed earlier in this session (e.g. before
+        # questions were asked), then serve repeat foods from the nutrition
+        # cache and high-confidence matches from the local catalog, instead
+        # of spinning up an agent
+        checkpoint = invocation_context.session.state.get("search_checkpoint") or {}
+        cache = get_nutrition_cache()
+        nutrition_db = get_nutrition_db()
+        searched_foods = []
+        reused = 0
         for food in foods:
-            food_name = food["name"].replace(" ", "_").replace("-", "_")
-            # Inject food data directly into instruction to avoid context contamination
-            food_data = json.dumps(food)
-
-            # Sub-agent for searching foods in this meal
-            food_search_agent = LlmAgent(
-                name=f"FoodSearchAgent_{food_name}",
-                model=GEMINI_MODEL,
-                instruction=f"""You are processing this specific food item: {food_data}
-
-                {memory_context}
-
-                Consider the user's memory for personalization when selecting nutrition data. User memory contains their past preferences and dietary habits that can help choose the most appropriate nutrition values.
-
-                Output ONLY a JSON array conforming to the RequestResponse schema: a list of FoodSearchResult objects, each with "id" (int or null), "name" string, "eaten_at" string, "meal_type" string or null, "serving_size" int default 1, "calories" float default 0.0, "protein_g" float default 0.0, "carbs_g" float default 0.0, "trans_fat_g" float default 0.0, "saturated_fat_g" float default 0.0, "unsaturated_fat_g" float default 0.0, "others" dict default empty.
-
-                Use google search to verify the nutrition value based on usda and openfoodfoundation.
-                Select the best matching result from the search results.
-                IMPORTANT: Preserve the eaten_at timestamp from the input food data exactly as provided.
-                IMPORTANT: If the input food data has an "id" field, include it in the output FoodSearchResult.
-                Output {{"id": null, "name": "McDonald's cheeseburger", "eaten_at": "2025-09-28T19:00:00", "meal_type": "Dinner", "serving_size": 1, "calories": 540.0, "protein_g": 25.0, "carbs_g": 45.0, "trans_fat_g": 1.5, "saturated_fat_g": 12.0, "unsaturated_fat_g": 8.0, "others": {{"sodium_mg": 1040}}}}, ....
-                Handle missing data gracefully.
-                IMPORTANT: Return ONLY the JSON array. Do not wrap in markdown, code blocks, backticks, or any formatting. No ```json or extra text.""",
-                tools=[google_search],
-                output_key=f"search_result_{food_name}",
-                # Removed before_tool_callback since each agent has its own food data
-            )
-            sub_agents.append(food_search_agent)
-        # Run parallel processing for all meals
-        parallel_agent = ParallelAgent(
-            name="ParallelMealProcessor",
-            sub_agents=sub_agents,
-            description="Runs meal processors concurrently for speed.",
-        )
-        async for event in parallel_agent.run_async(invocation_context):
+            food_name = food_state_key(food)
+            results = checkpoint.get(cache_key(food))
+            if results is not None:
+                reused += 1
+                # Stamp the request fields from this food, as the cache does
+                results = [
+                    {
+                        **result,
+                        "id": food.get("id"),
+                        "eaten_at": food.get("eaten_at", ""),
+                        "meal_type": food.get("meal_type") or "",
+                    }
+                    for result in results
+                ]
+            if results is None and cache:
+                results = cache.get(food, user_memory)
+            if results is None and nutrition_db:
+                results = nutrition_db.match(food, user_memory)
+            if results is not None:
+                yield self._search_result_event(invocation_context, food_name, results)
+                continue
+            searched_foods.append(food)
+        if reused:
+            print(f"Reused checkpointed search results for {reused} foods")
+
+        # One food per run by default; FOOD_SEARCH_BATCH_SIZE > 1 resolves
+        # several foods in one model call
+        batch_size = food_search_batch_size()
+        chunks = [
+            searched_foods[start : start + batch_size]
+            for start in range(0, len(searched_foods), batch_size)
+        ]
+
+        # Foods whose search failed or ran out of time, by name, with the reason
+        failed = {}
+        async for event in self._run_searches(
+            invocation_context, "ParallelMealProcessor", chunks, memory_context, nutrition_db, failed
+        ):
             yield event
-        # Collect results into state for merging
-        meal_nutritions = []
-        for food in parsed_foods.get("foods", []):
-            food_name = food["name"].replace(" ", "_")
-            # Parse the search_result text
-            search_result_text = invocation_context.session.state.get(
-                f"search_result_{food_name}", "{}"
-            )
-            search_result_json = strip_code_blocks(search_result_text)
-            search_result = json.loads(search_result_json)
-            invocation_context.session.state[f"search_result_{food_name}"] = (
-                search_result
-            )
-            nutrition = invocation_context.session.state.get(
-                f"meal_nutrition_{food_name}", {}
+
+        # Retry foods whose output could not be parsed, one run per food
+        unresolved = [unresolved_food(f, failed[f["name"]]) for f in searched_foods if f["name"] in failed]
+        pending = [f for f in searched_foods if f["name"] not in failed]
+        for attempt in range(food_search_parse_retries() + 1):
+            retry_foods = [f for f in pending if not self._resolved(invocation_context, f)]
+            if not retry_foods:
+                break
+            if attempt == food_search_parse_retries():
+                unresolved.extend(unresolved_food(f, "unparseable") for f in retry_foods)
+                break
+            print(f"Retrying unparseable search results for {[f['name'] for f in retry_foods]}")
+            failed = {}
+            async for event in self._run_searches(
+                invocation_context,
+                f"ParallelMealRetry_{attempt + 1}",
+                [[food] for food in retry_foods],
+                memory_context,
+                nutrition_db,
+                failed,
+            ):
+                yield event
+            unresolved.extend(unresolved_food(f, failed[f["name"]]) for f in retry_foods if f["name"] in failed)
+            pending = [f for f in retry_foods if f["name"] not in failed]
+
+        if unresolved:
+            print(f"Unresolved foods: {unresolved}")
+
+        # Checkpoint every resolved food so a later turn can skip it, and
+        # cache the ones that were searched
+        unresolved_names = {food["name"] for food in unresolved}
+        checkpoint = {}
+        for food in foods:
+            if food["name"] in unresolved_names:
+                continue
+            results = self._resolved(invocation_context, food)
+            if results:
+                checkpoint[cache_key(food)] = results
+            if cache and food in searched_foods:
+                results = as_search_results(results)
+                if results:
+                    cache.set(food, results, user_memory)
+        yield Event(
+            invocation_id=invocation_context.invocation_id,
+            author=self.name,
+            actions=EventActions(
+                state_delta={
+                    "unresolved_foods": unresolved,
+                    "search_checkpoint": checkpoint,
+                }
+            ),
+        )
+        if cache:
+            print(f"Nutrition cache stats: {cache.stats()}")
+        if searched_foods:
+            print(f"Food search slot stats: {get_search_slots().stats()}")
+            print(f"Food search latency: {search_latency.stats()}")
+
+    def _resolved(self, invocation_context, food) -> list[dict]:
+        """This food's validated search results from state, or [] if unusable."""
+        search_result = invocation_context.session.state.get(
+            f"search_result_{food_state_key(food)}"
+        )
+        if search_result is None:
+            return []
+        return merge_search_results(food, search_result)
+
+    async def _run_searches(
+        self, invocation_context, round_name, chunks, memory_context, nutrition_db, failed
+    ) -> AsyncGenerator[Event, None]:
+        """
+        Search each chunk of foods concurrently, within the per-request and
+        process-wide caps, using the shared template agents. Yields each
+        finished run's events followed by its foods' search_result_* events,
+        and records foods whose run failed or timed out in `failed`.
+        """
+        runs = []
+        chunk_by_key = {}
+        for index, chunk in enumerate(chunks):
+            if len(chunk) == 1:
+                key, agent = f"FoodSearchAgent_{food_state_key(chunk[0])}", food_search_agent
+            else:
+                key, agent = f"FoodSearchBatch_{index}", batch_search_agent
+            chunk_by_key[key] = chunk
+            ctx = search_context(
+                invocation_context,
+                f"{round_name}.{key}",
+                search_state(chunk, memory_context, nutrition_db),
             )
-            meal_nutritions.append({"meal_name": food_name, "nutrition": nutrition})
-        invocation_context.session.state["meal_nutritions"] = meal_nutritions
+            runs.append((key, agent, ctx))
+
+        async for key, events, failure in run_all_throttled(runs):
+            chunk = chunk_by_key[key]
+            if failure:
+                failed.update((food["name"], failure) for food in chunk)
+                continue
+            for event in events:
+                yield event
+            output = final_text(events)
+            if len(chunk) == 1:
+                if output is not None:
+                    yield self._search_result_event(
+                        invocation_context, food_state_key(chunk[0]), output
+                    )
+                continue
+            # Map the batch's output back to per-food search results
+            for food, results in zip(chunk, split_batch_results(output, len(chunk))):
+                if results is None:
+                    print(f"Batch search returned no result for {food['name']}")
+                    continue
+                yield self._search_result_event(
+                    invocation_context, food_state_key(food), results
+                )
@@ -0,0 +1,43 @@
+"""Shared fixtures for the agent tests. No model is called."""
+
+import asyncio
+
+from google.adk.agents.invocation_context import InvocationContext
+from google.adk.sessions import InMemorySessionService, Session
+
+
+def parsed_food(name, **fields):
+    return {
+        "id": None,
+        "name": name,
+        "description": "",
+        "eaten_at": "2025-09-28T12:00:00",
+        "meal_type": "Lunch",
+        "quantity": 1.0,
+        "unit": "serving",
+        "ambiguous": False,
+        **fields,
+    }
+
+
+def search_result(name, **fields):
+    return {"name": name, "serving_size": 1, "calories": 100.0, **fields}
+
+
+def invocation_context(agent, state) -> InvocationContext:
+    session = Session(id="test", app_name="test", user_id="test", state=state)
+    return InvocationContext(
+        session_service=InMemorySessionService(),
+        invocation_id="test",
+        agent=agent,
+        session=session,
+    )
+
+
+def run_agent(agent, ctx) -> list:
+    """Collect the events of one agent run."""
+
+    async def collect():
+        return [event async for event in agent.run_async(ctx)]
+
+    return asyncio.run(collect())
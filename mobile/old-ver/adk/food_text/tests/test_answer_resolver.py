@@ -0,0 +1,136 @@
+import unittest
+
+from google.adk.agents.callback_context import CallbackContext
+
+from food_text.cache import cache_key
+from food_text.subagents.AnswerResolverAgent import (
+    answer_resolver_agent,
+    can_resume_from_answers,
+    combine_resolved_foods,
+    skip_unless_answering,
+)
+from food_text.tests.helpers import invocation_context, parsed_food
+
+QUESTIONS = ["What kind of rice was it?"]
+
+
+def answering_state(**fields):
+    """State of an answer turn after a parse that asked about its rice."""
+    return {
+        "intent": {"type": "answer_question"},
+        "parsed_foods": {
+            "foods": [
+                parsed_food("grilled chicken"),
+                parsed_food("rice", ambiguous=True),
+            ],
+            "questions": QUESTIONS,
+        },
+        **fields,
+    }
+
+
+def callback_context(state):
+    return CallbackContext(invocation_context(answer_resolver_agent, state))
+
+
+class CanResumeFromAnswersTests(unittest.TestCase):
+    def test_resumable(self):
+        self.assertTrue(can_resume_from_answers(answering_state()))
+
+    def test_not_resumable(self):
+        cases = {
+            "new meal": answering_state(intent={"type": "new_meal"}),
+            "no intent": answering_state(intent=None),
+            "no parse": answering_state(parsed_foods=None),
+            "parse is not a dict": answering_state(parsed_foods="{}"),
+            "no questions": answering_state(
+                parsed_foods={
+                    "foods": [parsed_food("rice", ambiguous=True)],
+                    "questions": [],
+                }
+            ),
+            "no ambiguous foods": answering_state(
+                parsed_foods={"foods": [parsed_food("rice")], "questions": QUESTIONS}
+            ),
+        }
+        for name, state in cases.items():
+            with self.subTest(name):
+                self.assertFalse(can_resume_from_answers(state))
+
+    def test_skip_unless_answering(self):
+        self.assertIsNone(skip_unless_answering(callback_context(answering_state())))
+
+        content = skip_unless_answering(
+            callback_context(answering_state(intent={"type": "new_meal"}))
+        )
+        self.assertIn("grilled chicken", content.parts[0].text)
+
+
+class CombineResolvedFoodsTests(unittest.TestCase):
+    def test_resolved_foods_replace_ambiguous_ones(self):
+        chicken = parsed_food("grilled chicken")
+        state = answering_state(
+            resolved_foods={
+                "foods": [parsed_food("brown rice", description="1 cup")],
+                "questions": [],
+            },
+            search_checkpoint={cache_key(chicken): [{"name": "grilled chicken"}]},
+        )
+        ctx = callback_context(state)
+
+        self.assertIsNone(combine_resolved_foods(ctx))
+
+        combined = ctx.state["parsed_foods"]
+        self.assertEqual(
+            [f["name"] for f in combined["foods"]], ["grilled chicken", "brown rice"]
+        )
+        self.assertFalse(any(f["ambiguous"] for f in combined["foods"]))
+        self.assertEqual(combined["questions"], [])
+        # The clear food is kept exactly as parsed, so its checkpoint still matches
+        self.assertEqual(combined["foods"][0], chicken)
+        self.assertIn(cache_key(combined["foods"][0]), state["search_checkpoint"])
+        self.assertEqual(ctx.state.to_dict()["parsed_foods"], combined)
+
+    def test_resolved_foods_marked_unambiguous(self):
+        ctx = callback_context(
+            answering_state(
+                resolved_foods={
+                    "foods": [parsed_food("brown rice", ambiguous=True)],
+                    "questions": [],
+                }
+            )
+        )
+
+        combine_resolved_foods(ctx)
+
+        self.assertFalse(ctx.state["parsed_foods"]["foods"][1]["ambiguous"])
+
+    def test_follow_up_questions_kept(self):
+        follow_up = ["How much rice?"]
+        ctx = callback_context(
+            answering_state(resolved_foods={"foods": [], "questions": follow_up})
+        )
+
+        combine_resolved_foods(ctx)
+
+        self.assertEqual(
+            ctx.state["parsed_foods"],
+            {"foods": [parsed_food("grilled chicken")], "questions": follow_up},
+        )
+
+    def test_other_turns_left_alone(self):
+        state = answering_state(
+            intent={"type": "new_meal"},
+            resolved_foods={"foods": [parsed_food("brown rice")], "questions": []},
+        )
+        parsed = state["parsed_foods"]
+        ctx = callback_context(state)
+
+        self.assertIsNone(combine_resolved_foods(ctx))
+
+        self.assertIs(ctx.state["parsed_foods"], parsed)
+        self.assertFalse(ctx.state.has_delta())
+
+
+if __name__ == "__main__":
+    unittest.main()
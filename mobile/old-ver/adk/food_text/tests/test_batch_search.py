@@ -0,0 +1,215 @@
+import asyncio
+import json
+import unittest
+from unittest import mock
+
+from google.adk.events import Event
+from google.genai import types
+
+from food_text.subagents.ParallelFoodProcessorAgent import (
+    ParallelFoodProcessorAgent,
+    split_batch_results,
+)
+from food_text.tests.helpers import invocation_context, parsed_food, search_result
+
+
+class SplitBatchResultsTests(unittest.TestCase):
+    def test_index_object(self):
+        output = {
+            "0": [search_result("rice")],
+            "1": [search_result("chicken")],
+        }
+
+        self.assertEqual(
+            split_batch_results(json.dumps(output), 2),
+            [[search_result("rice")], [search_result("chicken")]],
+        )
+
+    def test_code_fenced_output(self):
+        output = "```json\n" + json.dumps({"0": [search_result("rice")]}) + "\n```"
+
+        self.assertEqual(split_batch_results(output, 1), [[search_result("rice")]])
+
+    def test_malformed_json(self):
+        for output in ('{"0": [{"name": "rice"', "not json", ""):
+            with self.subTest(output=output):
+                self.assertEqual(split_batch_results(output, 2), [None, None])
+
+    def test_unexpected_shape(self):
+        for output in ("42", '"rice"', "null", json.dumps([search_result("rice")])):
+            with self.subTest(output=output):
+                # A list only maps positionally when it has one entry per food
+                self.assertEqual(split_batch_results(output, 2), [None, None])
+
+    def test_missing_items(self):
+        output = {"0": [search_result("rice")], "2": [search_result("soup")]}
+
+        self.assertEqual(
+            split_batch_results(output, 3),
+            [[search_result("rice")], None, [search_result("soup")]],
+        )
+
+    def test_empty_or_invalid_items(self):
+        output = {"0": [], "1": None, "2": "rice", "3": [search_result("soup")]}
+
+        self.assertEqual(
+            split_batch_results(output, 4), [None, None, None, [search_result("soup")]]
+        )
+
+    def test_single_object_and_positional_list(self):
+        rice, chicken = search_result("rice"), search_result("chicken")
+
+        self.assertEqual(split_batch_results({"0": rice}, 1), [[rice]])
+        self.assertEqual(split_batch_results([rice, [chicken]], 2), [[rice], [chicken]])
+
+    def test_duplicate_food_names_stay_with_their_index(self):
+        lunch = search_result("rice", eaten_at="2025-09-28T12:00:00", calories=200.0)
+        dinner = search_result("rice", eaten_at="2025-09-28T19:00:00", calories=300.0)
+
+        self.assertEqual(
+            split_batch_results({"1": [dinner], "0": [lunch]}, 2), [[lunch], [dinner]]
+        )
+
+
+def final_event(author, text):
+    return Event(
+        author=author,
+        content=types.Content(role="model", parts=[types.Part(text=text)]),
+    )
+
+
+class BatchChunkingTests(unittest.TestCase):
+    """_run_searches with run_all_throttled replaced by canned outputs per run key."""
+
+    def run_searches(self, chunks, outputs):
+        agent = ParallelFoodProcessorAgent()
+        ctx = invocation_context(agent, {})
+        runs_seen = []
+
+        async def fake_run_all_throttled(runs):
+            for key, _, run_ctx in runs:
+                runs_seen.append((key, run_ctx))
+                output = outputs.get(key)
+                if output is None:
+                    yield key, [], "timeout"
+                else:
+                    yield key, [final_event(key, output)], None
+
+        async def collect():
+            return [
+                event
+                async for event in agent._run_searches(
+                    ctx, "Round", chunks, "No user memory available.", None, failed
+                )
+            ]
+
+        failed = {}
+        with mock.patch(
+            "food_text.subagents.ParallelFoodProcessorAgent.run_all_throttled",
+            fake_run_all_throttled,
+        ):
+            events = asyncio.run(collect())
+        stored = [
+            (key, value)
+            for event in events
+            for key, value in event.actions.state_delta.items()
+        ]
+        return stored, failed, runs_seen
+
+    def test_batch_output_mapped_to_each_food(self):
+        chunks = [[parsed_food("rice"), parsed_food("grilled chicken")]]
+        output = {
+            "0": [search_result("rice")],
+            "1": [search_result("grilled chicken")],
+        }
+
+        stored, failed, runs_seen = self.run_searches(
+            chunks, {"FoodSearchBatch_0": json.dumps(output)}
+        )
+
+        self.assertEqual(
+            stored,
+            [
+                ("search_result_rice", json.dumps([search_result("rice")])),
+                (
+                    "search_result_grilled_chicken",
+                    json.dumps([search_result("grilled chicken")]),
+                ),
+            ],
+        )
+        self.assertEqual(failed, {})
+        key, run_ctx = runs_seen[0]
+        self.assertEqual(run_ctx.branch, "Round.FoodSearchBatch_0")
+        self.assertEqual(
+            json.loads(run_ctx.session.state["temp:search_foods"]),
+            {"0": chunks[0][0], "1": chunks[0][1]},
+        )
+
+    def test_food_missing_from_batch_output_is_not_stored(self):
+        chunks = [[parsed_food("rice"), parsed_food("soup")]]
+        output = {"0": [search_result("rice")]}
+
+        stored, failed, _ = self.run_searches(
+            chunks, {"FoodSearchBatch_0": json.dumps(output)}
+        )
+
+        # Left out of state, so _resolve_foods retries it on its own
+        self.assertEqual([key for key, _ in stored], ["search_result_rice"])
+        self.assertEqual(failed, {})
+
+    def test_malformed_batch_output_stores_nothing(self):
+        chunks = [[parsed_food("rice"), parsed_food("soup")]]
+
+        stored, failed, _ = self.run_searches(
+            chunks, {"FoodSearchBatch_0": '{"0": [{"name": "rice"'}
+        )
+
+        self.assertEqual(stored, [])
+        self.assertEqual(failed, {})
+
+    def test_failed_batch_marks_every_food(self):
+        chunks = [
+            [parsed_food("rice"), parsed_food("soup")],
+            [parsed_food("bread"), parsed_food("tea")],
+        ]
+        output = {"0": [search_result("bread")], "1": [search_result("tea")]}
+
+        stored, failed, _ = self.run_searches(
+            chunks, {"FoodSearchBatch_1": json.dumps(output)}
+        )
+
+        self.assertEqual(
+            [key for key, _ in stored], ["search_result_bread", "search_result_tea"]
+        )
+        self.assertEqual(failed, {"rice": "timeout", "soup": "timeout"})
+
+    def test_duplicate_food_names_in_one_batch(self):
+        chunks = [
+            [
+                parsed_food("rice", eaten_at="2025-09-28T12:00:00"),
+                parsed_food("rice", eaten_at="2025-09-28T19:00:00"),
+            ]
+        ]
+        output = {
+            "0": [search_result("rice", calories=200.0)],
+            "1": [search_result("rice", calories=300.0)],
+        }
+
+        stored, failed, _ = self.run_searches(
+            chunks, {"FoodSearchBatch_0": json.dumps(output)}
+        )
+
+        # Both foods are resolved from their own index; they share one
+        # state key, so the later food's result is what the merger reads
+        self.assertEqual(
+            stored,
+            [
+                ("search_result_rice", json.dumps(output["0"])),
+                ("search_result_rice", json.dumps(output["1"])),
+            ],
+        )
+        self.assertEqual(failed, {})
+
+
+if __name__ == "__main__":
+    unittest.main()
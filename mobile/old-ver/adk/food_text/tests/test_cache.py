@@ -0,0 +1,45 @@
+import unittest
+
+from food_text.cache import NutritionCache
+
+FOOD = {
+    "name": "latte",
+    "description": "",
+    "quantity": 1,
+    "unit": "cup",
+    "eaten_at": "2025-09-28T08:00:00",
+    "meal_type": "Breakfast",
+}
+RESULT = {
+    "name": "latte",
+    "eaten_at": "2025-09-28T08:00:00",
+    "meal_type": "Breakfast",
+    "serving_size": 240,
+    "calories": 130,
+    "protein_g": 8,
+    "carbs_g": 13,
+    "trans_fat_g": 0,
+    "saturated_fat_g": 3,
+    "unsaturated_fat_g": 2,
+}
+
+
+class NutritionCacheTests(unittest.TestCase):
+    def setUp(self):
+        self.cache = NutritionCache(path=":memory:")
+
+    def test_results_are_shared_without_memory(self):
+        self.cache.set(FOOD, [RESULT])
+        self.assertEqual(self.cache.get(FOOD)[0]["calories"], 130)
+
+    def test_personalized_results_stay_with_their_memory(self):
+        memory = ["Always orders lattes with oat milk"]
+        self.cache.set(FOOD, [{**RESULT, "calories": 150}], memory)
+
+        self.assertIsNone(self.cache.get(FOOD))
+        self.assertIsNone(self.cache.get(FOOD, ["Drinks skim milk"]))
+        self.assertEqual(self.cache.get(FOOD, memory)[0]["calories"], 150)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,172 @@
+import asyncio
+import os
+import unittest
+from unittest import mock
+
+from food_text import concurrency
+from food_text.concurrency import (
+    FairSemaphore,
+    LatencyTracker,
+    _run_with_deadline,
+    run_all_throttled,
+)
+
+
+class FakeSearchAgent:
+    """Stands in for a search agent: each run waits its delay, then yields one event."""
+
+    def __init__(self, *delays, error=None):
+        self.delays = list(delays)
+        self.error = error
+        self.started = 0
+        self.cancelled = 0
+
+    async def run_async(self, ctx):
+        attempt = self.started
+        self.started += 1
+        try:
+            await asyncio.sleep(self.delays[min(attempt, len(self.delays) - 1)])
+        except asyncio.CancelledError:
+            self.cancelled += 1
+            raise
+        if self.error:
+            raise self.error
+        yield f"{ctx}:attempt{attempt}"
+
+
+class FairSemaphoreTests(unittest.TestCase):
+    def test_slots_granted_in_arrival_order(self):
+        async def scenario():
+            slots = FairSemaphore(1)
+            order = []
+
+            async def worker(name):
+                async with slots:
+                    order.append(name)
+                    await asyncio.sleep(0)
+
+            await slots.acquire()
+            early = [asyncio.create_task(worker(name)) for name in ("a", "b", "c")]
+            await asyncio.sleep(0)
+            slots.release()
+            # Arrives after the slot was handed to "a", so must queue behind b and c
+            late = asyncio.create_task(worker("late"))
+            await asyncio.gather(*early, late)
+            return order, slots.stats()
+
+        order, stats = asyncio.run(scenario())
+
+        self.assertEqual(order, ["a", "b", "c", "late"])
+        self.assertEqual(stats["in_use"], 0)
+        self.assertEqual(stats["waiting"], 0)
+        self.assertEqual(stats["acquired"], 5)
+
+    def test_cancelled_waiter_is_skipped(self):
+        async def scenario():
+            slots = FairSemaphore(1)
+            await slots.acquire()
+            first = asyncio.create_task(slots.acquire())
+            second = asyncio.create_task(slots.acquire())
+            await asyncio.sleep(0)
+            first.cancel()
+            await asyncio.sleep(0)
+            slots.release()
+            await second
+            return first.cancelled(), slots.stats()
+
+        first_cancelled, stats = asyncio.run(scenario())
+
+        self.assertTrue(first_cancelled)
+        self.assertEqual(stats["in_use"], 1)
+        self.assertEqual(stats["waiting"], 0)
+
+
+class RunWithDeadlineTests(unittest.TestCase):
+    def run_search(self, agent, env):
+        async def scenario():
+            return await _run_with_deadline(agent, "ctx", "search", FairSemaphore(4))
+
+        with mock.patch.dict(os.environ, env), mock.patch.object(
+            concurrency, "search_latency", LatencyTracker()
+        ):
+            return asyncio.run(scenario())
+
+    def test_finishes_within_deadline(self):
+        agent = FakeSearchAgent(0)
+
+        events, failure = self.run_search(agent, {"FOOD_SEARCH_TIMEOUT_SECONDS": "1"})
+
+        self.assertEqual(events, ["ctx:attempt0"])
+        self.assertIsNone(failure)
+
+    def test_deadline_expiry_cancels_the_run(self):
+        agent = FakeSearchAgent(10)
+
+        events, failure = self.run_search(
+            agent, {"FOOD_SEARCH_TIMEOUT_SECONDS": "0.05"}
+        )
+
+        self.assertEqual((events, failure), ([], "timeout"))
+        self.assertEqual(agent.cancelled, 1)
+
+    def test_error_is_reported(self):
+        agent = FakeSearchAgent(0, error=RuntimeError("boom"))
+
+        events, failure = self.run_search(agent, {"FOOD_SEARCH_TIMEOUT_SECONDS": "1"})
+
+        self.assertEqual((events, failure), ([], "error"))
+
+
+class HedgedRunTests(unittest.TestCase):
+    def test_hedged_attempt_wins_and_slow_attempt_is_cancelled(self):
+        # The first attempt stalls; the hedge starts after the p50 of recent
+        # latencies (10ms) and finishes first
+        agent = FakeSearchAgent(10, 0)
+        latency = LatencyTracker()
+        for _ in range(concurrency.HEDGE_MIN_SAMPLES):
+            latency.record(0.01)
+
+        async def scenario():
+            return [
+                result
+                async for result in run_all_throttled([("rice", agent, "ctx")])
+            ]
+
+        env = {
+            "FOOD_SEARCH_TIMEOUT_SECONDS": "5",
+            "FOOD_SEARCH_HEDGE_PERCENTILE": "50",
+        }
+        with mock.patch.dict(os.environ, env), mock.patch.object(
+            concurrency, "search_latency", latency
+        ):
+            results = asyncio.run(scenario())
+
+        self.assertEqual(results, [("rice", ["ctx:attempt1"], None)])
+        self.assertEqual(agent.started, 2)
+        self.assertEqual(agent.cancelled, 1)
+        self.assertEqual(latency.stats()["samples"], concurrency.HEDGE_MIN_SAMPLES + 1)
+
+    def test_no_hedge_without_enough_samples(self):
+        agent = FakeSearchAgent(0.05)
+
+        async def scenario():
+            return [
+                result
+                async for result in run_all_throttled([("rice", agent, "ctx")])
+            ]
+
+        env = {
+            "FOOD_SEARCH_TIMEOUT_SECONDS": "5",
+            "FOOD_SEARCH_HEDGE_PERCENTILE": "50",
+        }
+        with mock.patch.dict(os.environ, env), mock.patch.object(
+            concurrency, "search_latency", LatencyTracker()
+        ):
+            results = asyncio.run(scenario())
+
+        self.assertEqual(results, [("rice", ["ctx:attempt0"], None)])
+        self.assertEqual(agent.started, 1)
+
+
+if __name__ == "__main__":
+    unittest.main()
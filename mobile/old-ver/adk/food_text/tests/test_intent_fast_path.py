@@ -0,0 +1,51 @@
+import unittest
+
+from food_text.callbacks.intent_fast_path import classify_intent
+
+
+class ClassifyIntentTests(unittest.TestCase):
+    def classify(self, text):
+        return classify_intent(text, has_image=False, questions_pending=False)
+
+    def test_plain_meals_are_new_meals(self):
+        for text in [
+            "I had pizza for lunch",
+            "ate an apple",
+            "for breakfast I had oatmeal and coffee",
+            "We just ate 2 tacos at dinner",
+        ]:
+            with self.subTest(text=text):
+                self.assertEqual(self.classify(text)["type"], "new_meal")
+
+    def test_ambiguous_inputs_fall_through_to_model(self):
+        for text in [
+            "I didn't eat the fries at lunch",
+            "I had 3 eggs at breakfast, not 2",
+            "for lunch I only had half of the sandwich",
+            "Oops, that was for lunch not breakfast",
+            "What should I eat for dinner?",
+            "I did not have the dessert",
+            "I ate a burger, actually make it two",
+            "I had toast instead of cereal",
+            "skip the coffee I had",
+            "Did I eat enough protein today?",
+            "chicken salad for lunch",
+            "lunch was a turkey sandwich",
+        ]:
+            with self.subTest(text=text):
+                self.assertIsNone(self.classify(text))
+
+    def test_answers_and_photos(self):
+        self.assertEqual(
+            classify_intent("Answer 1: two slices", False, False)["type"],
+            "answer_question",
+        )
+        self.assertEqual(
+            classify_intent("I didn't, it was small", False, True)["type"],
+            "answer_question",
+        )
+        self.assertEqual(classify_intent("", True, False)["type"], "new_meal")
+
+
+if __name__ == "__main__":
+    unittest.main()
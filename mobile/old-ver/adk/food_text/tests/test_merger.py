@@ -0,0 +1,113 @@
+import json
+import unittest
+
+from food_text.subagents.MergerAgent import NutritionMergerAgent, merge_search_results
+from food_text.tests.helpers import (
+    invocation_context,
+    parsed_food,
+    run_agent,
+    search_result,
+)
+
+
+class NutritionMergerAgentTests(unittest.TestCase):
+    def merge(self, state):
+        agent = NutritionMergerAgent()
+        events = run_agent(agent, invocation_context(agent, state))
+        return json.loads(events[-1].content.parts[0].text), events[-1]
+
+    def test_new_meal_payload(self):
+        output, event = self.merge(
+            {
+                "intent": {"type": "new_meal"},
+                "parsed_foods": {
+                    "foods": [parsed_food("rice"), parsed_food("grilled chicken")],
+                    "questions": [],
+                },
+                "search_result_rice": json.dumps([search_result("rice")]),
+                "search_result_grilled_chicken": [search_result("grilled chicken")],
+            }
+        )
+
+        self.assertEqual(output["request_type"], "new")
+        self.assertEqual(
+            [f["name"] for f in output["foods"]], ["rice", "grilled chicken"]
+        )
+        self.assertEqual(output["foods"][0]["eaten_at"], "2025-09-28T12:00:00")
+        self.assertEqual(output["foods"][0]["meal_type"], "Lunch")
+        self.assertEqual(output["unresolved"], [])
+        self.assertEqual(event.actions.state_delta["final_result"], output)
+
+    def test_update_payload_keeps_food_ids(self):
+        output, _ = self.merge(
+            {
+                "intent": {"type": "update_meal"},
+                "parsed_foods": {"foods": [parsed_food("rice", id=7)], "questions": []},
+                "search_result_rice": f"```json\n{json.dumps([search_result('rice')])}\n```",
+            }
+        )
+
+        self.assertEqual(output["request_type"], "update")
+        self.assertEqual(output["foods"][0]["id"], 7)
+
+    def test_unresolved_foods_are_skipped(self):
+        timed_out = {
+            "id": None,
+            "name": "soup",
+            "eaten_at": "",
+            "meal_type": "Lunch",
+            "reason": "timeout",
+        }
+        output, _ = self.merge(
+            {
+                "parsed_foods": {
+                    "foods": [
+                        parsed_food("rice"),
+                        parsed_food("soup"),
+                        parsed_food("bread"),
+                    ],
+                    "questions": [],
+                },
+                "unresolved_foods": [timed_out],
+                "search_result_rice": [search_result("rice")],
+                "search_result_soup": [search_result("soup")],
+                "search_result_bread": "not json",
+            }
+        )
+
+        self.assertEqual([f["name"] for f in output["foods"]], ["rice"])
+        self.assertEqual(
+            [(f["name"], f["reason"]) for f in output["unresolved"]],
+            [("soup", "timeout"), ("bread", "invalid_result")],
+        )
+
+    def test_questions_pass_through(self):
+        questions = [{"question": "How big was the bowl?", "type": "slider"}]
+        output, event = self.merge(
+            {
+                "questions_pending": True,
+                "parsed_foods": {"foods": [parsed_food("soup")], "questions": questions},
+            }
+        )
+
+        self.assertEqual(output, {"questions": questions, "status": "questions_pending"})
+        self.assertNotIn("final_result", event.actions.state_delta)
+
+
+class MergeSearchResultsTests(unittest.TestCase):
+    def test_invalid_items_are_dropped(self):
+        results = merge_search_results(
+            parsed_food("rice"),
+            [
+                search_result("rice"),
+                {"calories": 10},
+                "rice",
+                search_result("beans", calories="lots"),
+            ],
+        )
+
+        self.assertEqual([r["name"] for r in results], ["rice"])
+
+
+if __name__ == "__main__":
+    unittest.main()
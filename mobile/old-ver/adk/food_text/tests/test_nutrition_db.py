@@ -0,0 +1,41 @@
+import unittest
+
+from food_text.nutrition_db import NutritionDatabase
+
+
+class NutritionDatabaseMatchTests(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls.db = NutritionDatabase()
+
+    def food(self, **fields):
+        return {
+            "name": "apple",
+            "description": "",
+            "quantity": 1,
+            "unit": "piece",
+            "eaten_at": "2025-09-28T12:00:00",
+            "meal_type": "Lunch",
+            **fields,
+        }
+
+    def test_name_match_without_description(self):
+        results = self.db.match(self.food())
+        self.assertEqual(results[0]["calories"], 95)
+
+    def test_description_repeating_catalog_names(self):
+        self.assertIsNotNone(self.db.match(self.food(description="a medium green apple")))
+
+    def test_description_adding_to_the_food_falls_through(self):
+        for description in ["with peanut butter", "caramel apple", "baked with cinnamon"]:
+            with self.subTest(description=description):
+                self.assertIsNone(self.db.match(self.food(description=description)))
+
+    def test_food_named_in_user_memory_falls_through(self):
+        memory = ["My apples are always dipped in honey"]
+        self.assertIsNone(self.db.match(self.food(), memory))
+        self.assertIsNotNone(self.db.match(self.food(), ["Prefers oat milk in coffee"]))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,121 @@
+import asyncio
+import json
+import unittest
+
+from google.adk.agents.readonly_context import ReadonlyContext
+from google.adk.utils.instructions_utils import inject_session_state
+
+from food_text.subagents.ParallelFoodProcessorAgent import (
+    BATCH_SEARCH_INSTRUCTION,
+    FOOD_SEARCH_INSTRUCTION,
+    ParallelFoodProcessorAgent,
+    search_context,
+    search_state,
+)
+from food_text.tests.helpers import invocation_context, parsed_food
+
+
+class FakeCatalog:
+    """Local catalog returning fixed candidates per food name."""
+
+    def __init__(self, candidates):
+        self.candidates = candidates
+
+    def search(self, name, limit=3):
+        return self.candidates.get(name, [])[:limit]
+
+
+def render(template, ctx):
+    """Fill the instruction from session state the way ADK does per request."""
+    return asyncio.run(inject_session_state(template, ReadonlyContext(ctx)))
+
+
+class SearchContextTests(unittest.TestCase):
+    def setUp(self):
+        self.agent = ParallelFoodProcessorAgent()
+        self.ctx = invocation_context(
+            self.agent, {"parsed_foods": {"foods": []}, "intent": {"type": "new_meal"}}
+        )
+
+    def test_each_run_sees_only_its_own_food(self):
+        rice, soup = parsed_food("rice"), parsed_food("miso soup", meal_type="Dinner")
+        rice_ctx = search_context(
+            self.ctx, "Round.rice", search_state([rice], "No user memory available.", None)
+        )
+        soup_ctx = search_context(
+            self.ctx, "Round.soup", search_state([soup], "No user memory available.", None)
+        )
+
+        async def render_both():
+            return await asyncio.gather(
+                *(
+                    inject_session_state(FOOD_SEARCH_INSTRUCTION, ReadonlyContext(ctx))
+                    for ctx in (rice_ctx, soup_ctx)
+                )
+            )
+
+        rice_prompt, soup_prompt = asyncio.run(render_both())
+
+        self.assertIn(f"food item: {json.dumps(rice)}", rice_prompt)
+        self.assertNotIn("miso soup", rice_prompt)
+        self.assertIn(f"food item: {json.dumps(soup)}", soup_prompt)
+        self.assertNotIn('"rice"', soup_prompt)
+        self.assertIn("No user memory available.", rice_prompt)
+
+    def test_run_state_does_not_leak(self):
+        rice_ctx = search_context(
+            self.ctx, "Round.rice", search_state([parsed_food("rice")], "", None)
+        )
+        soup_ctx = search_context(
+            self.ctx, "Round.soup", search_state([parsed_food("soup")], "", None)
+        )
+        rice_ctx.session.state["temp:scratch"] = "rice only"
+
+        self.assertNotIn("temp:search_foods", self.ctx.session.state)
+        self.assertNotIn("temp:scratch", soup_ctx.session.state)
+        self.assertIsNot(rice_ctx.session, self.ctx.session)
+        # The rest of the session state is still visible to each run
+        self.assertEqual(soup_ctx.session.state["intent"], {"type": "new_meal"})
+        self.assertIs(rice_ctx.session.events, self.ctx.session.events)
+
+    def test_branch(self):
+        state = search_state([parsed_food("rice")], "", None)
+
+        self.assertEqual(search_context(self.ctx, "Round.rice", state).branch, "Round.rice")
+
+        self.ctx.branch = "Pipeline"
+        self.assertEqual(
+            search_context(self.ctx, "Round.rice", state).branch, "Pipeline.Round.rice"
+        )
+
+    def test_memory_and_local_candidates_rendered(self):
+        candidate = {"name": "white rice", "score": 0.9, "calories": 130.0}
+        catalog = FakeCatalog(
+            {"rice": [candidate, {"name": "rice cake", "score": 0.1}]}
+        )
+        memory = 'User memory for personalization: ["prefers brown rice"]'
+        ctx = search_context(
+            self.ctx, "Round.rice", search_state([parsed_food("rice")], memory, catalog)
+        )
+
+        prompt = render(FOOD_SEARCH_INSTRUCTION, ctx)
+
+        self.assertIn(memory, prompt)
+        self.assertIn(json.dumps([candidate]), prompt)
+        self.assertNotIn("rice cake", prompt)
+
+    def test_batch_foods_keyed_by_index(self):
+        foods = [parsed_food("rice"), parsed_food("soup")]
+        catalog = FakeCatalog({"soup": [{"name": "miso soup", "score": 0.8}]})
+        ctx = search_context(
+            self.ctx, "Round.FoodSearchBatch_0", search_state(foods, "", catalog)
+        )
+
+        prompt = render(BATCH_SEARCH_INSTRUCTION, ctx)
+
+        self.assertIn(json.dumps({"0": foods[0], "1": foods[1]}), prompt)
+        self.assertIn(json.dumps({"1": [{"name": "miso soup", "score": 0.8}]}), prompt)
+
+
+if __name__ == "__main__":
+    unittest.main()
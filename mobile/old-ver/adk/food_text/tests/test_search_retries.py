@@ -0,0 +1,150 @@
+import asyncio
+import json
+import os
+import unittest
+from unittest import mock
+
+from food_text.subagents.ParallelFoodProcessorAgent import ParallelFoodProcessorAgent
+from food_text.tests.helpers import invocation_context, parsed_food, search_result
+from food_text.tools import food_state_key
+
+PROCESSOR = "food_text.subagents.ParallelFoodProcessorAgent"
+
+
+class ResolveFoodsRetryTests(unittest.TestCase):
+    """
+    _resolve_foods with _run_searches stubbed out. Each round's script maps a
+    food name to "ok", "unparseable" or a failure reason; the stub writes
+    search_result_* straight into session state, as the runner would.
+    """
+
+    def resolve(self, foods, rounds, retries="1"):
+        agent = ParallelFoodProcessorAgent()
+        ctx = invocation_context(agent, {"parsed_foods": {"foods": foods}})
+        calls = []
+
+        async def fake_run_searches(
+            self, invocation_context, round_name, chunks, memory, nutrition_db, failed
+        ):
+            script = rounds[len(calls)]
+            calls.append((round_name, [[f["name"] for f in chunk] for chunk in chunks]))
+            for chunk in chunks:
+                for food in chunk:
+                    outcome = script[food["name"]]
+                    key = f"search_result_{food_state_key(food)}"
+                    if outcome == "ok":
+                        invocation_context.session.state[key] = json.dumps(
+                            [search_result(food["name"])]
+                        )
+                    elif outcome == "unparseable":
+                        invocation_context.session.state[key] = "Sorry, I could not find it"
+                    else:
+                        failed[food["name"]] = outcome
+            return
+            yield
+
+        async def collect():
+            return [event async for event in agent._resolve_foods(ctx, foods)]
+
+        env = {"FOOD_SEARCH_PARSE_RETRIES": retries, "FOOD_SEARCH_BATCH_SIZE": "1"}
+        with mock.patch.dict(os.environ, env), mock.patch.object(
+            ParallelFoodProcessorAgent, "_run_searches", fake_run_searches
+        ), mock.patch(f"{PROCESSOR}.get_nutrition_cache", return_value=None), mock.patch(
+            f"{PROCESSOR}.get_nutrition_db", return_value=None
+        ):
+            events = asyncio.run(collect())
+        return events[-1].actions.state_delta, calls
+
+    def test_unparseable_food_retried_up_to_the_limit(self):
+        foods = [parsed_food("rice"), parsed_food("mystery stew")]
+        rounds = [
+            {"rice": "ok", "mystery stew": "unparseable"},
+            {"mystery stew": "unparseable"},
+        ]
+
+        state_delta, calls = self.resolve(foods, rounds)
+
+        self.assertEqual(
+            calls,
+            [
+                ("ParallelMealProcessor", [["rice"], ["mystery stew"]]),
+                ("ParallelMealRetry_1", [["mystery stew"]]),
+            ],
+        )
+        self.assertEqual(
+            state_delta["unresolved_foods"],
+            [
+                {
+                    "id": None,
+                    "name": "mystery stew",
+                    "eaten_at": "2025-09-28T12:00:00",
+                    "meal_type": "Lunch",
+                    "reason": "unparseable",
+                }
+            ],
+        )
+        self.assertEqual(len(state_delta["search_checkpoint"]), 1)
+
+    def test_retry_limit_from_env(self):
+        foods = [parsed_food("mystery stew")]
+        rounds = [{"mystery stew": "unparseable"}] * 3
+
+        state_delta, calls = self.resolve(foods, rounds, retries="2")
+
+        self.assertEqual(
+            [round_name for round_name, _ in calls],
+            ["ParallelMealProcessor", "ParallelMealRetry_1", "ParallelMealRetry_2"],
+        )
+        self.assertEqual(
+            [f["reason"] for f in state_delta["unresolved_foods"]], ["unparseable"]
+        )
+
+    def test_no_retries(self):
+        foods = [parsed_food("mystery stew")]
+
+        state_delta, calls = self.resolve(
+            foods, [{"mystery stew": "unparseable"}], retries="0"
+        )
+
+        self.assertEqual(len(calls), 1)
+        self.assertEqual(
+            [f["reason"] for f in state_delta["unresolved_foods"]], ["unparseable"]
+        )
+
+    def test_successful_retry_resolves_the_food(self):
+        foods = [parsed_food("mystery stew")]
+        rounds = [{"mystery stew": "unparseable"}, {"mystery stew": "ok"}]
+
+        state_delta, calls = self.resolve(foods, rounds)
+
+        self.assertEqual(len(calls), 2)
+        self.assertEqual(state_delta["unresolved_foods"], [])
+        self.assertEqual(len(state_delta["search_checkpoint"]), 1)
+
+    def test_failed_search_is_not_retried(self):
+        foods = [parsed_food("rice"), parsed_food("soup")]
+        rounds = [{"rice": "timeout", "soup": "error"}]
+
+        state_delta, calls = self.resolve(foods, rounds)
+
+        self.assertEqual(len(calls), 1)
+        self.assertEqual(
+            [(f["name"], f["reason"]) for f in state_delta["unresolved_foods"]],
+            [("rice", "timeout"), ("soup", "error")],
+        )
+        self.assertEqual(state_delta["search_checkpoint"], {})
+
+    def test_retry_that_fails_keeps_its_reason(self):
+        foods = [parsed_food("mystery stew")]
+        rounds = [{"mystery stew": "unparseable"}, {"mystery stew": "timeout"}]
+
+        state_delta, calls = self.resolve(foods, rounds)
+
+        self.assertEqual(len(calls), 2)
+        self.assertEqual(
+            [f["reason"] for f in state_delta["unresolved_foods"]], ["timeout"]
+        )
+
+
+if __name__ == "__main__":
+    unittest.main()
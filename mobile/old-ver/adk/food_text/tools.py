@@ -1,4 +1,5 @@
 from google.adk.models.llm_request import LlmRequest
+import re
 import requests
 from typing import Optional
 from datetime import datetime
@@ -16,6 +17,11 @@ def strip_code_blocks(text: str) -> str:
     return text
 
 
+def food_state_key(food: dict) -> str:
+    """Identifier-safe key for a parsed food, used in agent names and state keys."""
+    return re.sub(r"\W", "_", food["name"])
+
+
 # Helper function to remove condition line from request
 def remove_condition_line(llm_request: LlmRequest):
     if not llm_request.contents or not llm_request.contents[0].parts:
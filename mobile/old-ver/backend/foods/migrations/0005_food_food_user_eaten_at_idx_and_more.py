@@ -0,0 +1,23 @@
+# Generated by Django 5.2.18 on 2026-10-18 14:44
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('foods', '0004_food_eaten_at'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='food',
+            index=models.Index(fields=['user', 'eaten_at'], name='food_user_eaten_at_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='food',
+            index=models.Index(fields=['user', 'meal_type', 'eaten_at'], name='food_user_meal_eaten_at_idx'),
+        ),
+    ]
@@ -0,0 +1,36 @@
+# Generated by Django 5.2.18 on 2026-10-18 14:46
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('foods', '0005_food_food_user_eaten_at_idx_and_more'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DailyNutritionTotals',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('date', models.DateField(help_text="Calendar day in the user's time zone")),
+                ('calories', models.DecimalField(decimal_places=2, default=0, max_digits=12)),
+                ('protein', models.DecimalField(decimal_places=2, default=0, max_digits=12)),
+                ('carbohydrates', models.DecimalField(decimal_places=2, default=0, max_digits=12)),
+                ('trans_fat', models.DecimalField(decimal_places=2, default=0, max_digits=12)),
+                ('saturated_fat', models.DecimalField(decimal_places=2, default=0, max_digits=12)),
+                ('unsaturated_fat', models.DecimalField(decimal_places=2, default=0, max_digits=12)),
+                ('others', models.JSONField(blank=True, default=dict, help_text="Summed numeric micro nutrients, e.g., {'sodium_mg': 2300}")),
+                ('food_count', models.PositiveIntegerField(default=0)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='daily_totals', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'constraints': [models.UniqueConstraint(fields=('user', 'date'), name='daily_totals_user_date_uniq')],
+            },
+        ),
+    ]
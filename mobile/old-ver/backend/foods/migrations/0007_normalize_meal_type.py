@@ -0,0 +1,28 @@
+# Generated by Django 5.2.18 on 2026-10-18 16:20
+
+from django.db import migrations
+
+
+def normalize_meal_types(apps, schema_editor):
+    # Same rule as foods.utils.normalize_meal_type as of this migration
+    Food = apps.get_model('foods', 'Food')
+    meal_types = (
+        Food.objects.exclude(meal_type__isnull=True)
+        .values_list('meal_type', flat=True)
+        .distinct()
+    )
+    for meal_type in list(meal_types):
+        normalized = meal_type.strip().capitalize()
+        if normalized != meal_type:
+            Food.objects.filter(meal_type=meal_type).update(meal_type=normalized)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('foods', '0006_dailynutritiontotals'),
+    ]
+
+    operations = [
+        migrations.RunPython(normalize_meal_types, migrations.RunPython.noop),
+    ]
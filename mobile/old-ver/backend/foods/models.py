@@ -1,4 +1,6 @@
 from django.db import models
+from django.db.models.signals import post_delete, post_save, pre_save
+from django.dispatch import receiver
 
 from users.models import User
 
@@ -25,5 +27,82 @@ class Food(models.Model):
     eaten_at = models.DateTimeField()
     user = models.ForeignKey(User, on_delete=models.CASCADE, related_name="foods")
 
+    class Meta:
+        indexes = [
+            models.Index(fields=["user", "eaten_at"], name="food_user_eaten_at_idx"),
+            models.Index(
+                fields=["user", "meal_type", "eaten_at"],
+                name="food_user_meal_eaten_at_idx",
+            ),
+        ]
+
     def __str__(self):
         return self.name
+
+
+class DailyNutritionTotals(models.Model):
+    """Per-user, per-local-day nutrition totals, kept in sync with Food rows."""
+
+    user = models.ForeignKey(
+        User, on_delete=models.CASCADE, related_name="daily_totals"
+    )
+    date = models.DateField(help_text="Calendar day in the user's time zone")
+    calories = models.DecimalField(max_digits=12, decimal_places=2, default=0)
+    protein = models.DecimalField(max_digits=12, decimal_places=2, default=0)
+    carbohydrates = models.DecimalField(max_digits=12, decimal_places=2, default=0)
+    trans_fat = models.DecimalField(max_digits=12, decimal_places=2, default=0)
+    saturated_fat = models.DecimalField(max_digits=12, decimal_places=2, default=0)
+    unsaturated_fat = models.DecimalField(max_digits=12, decimal_places=2, default=0)
+    others = models.JSONField(
+        default=dict,
+        blank=True,
+        help_text="Summed numeric micro nutrients, e.g., {'sodium_mg': 2300}",
+    )
+    food_count = models.PositiveIntegerField(default=0)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=["user", "date"], name="daily_totals_user_date_uniq"
+            ),
+        ]
+
+    def __str__(self):
+        return f"{self.user} {self.date}"
+
+
+# Single-row saves and deletes keep the daily rollup current. Bulk paths
+# (bulk_create, bulk_update, meal operations) update it explicitly instead.
+@receiver(pre_save, sender=Food)
+def capture_previous_nutrition(sender, instance, **kwargs):
+    from .rollups import nutrition_of, rollup_signals_enabled
+
+    instance._previous_nutrition = None
+    if instance.pk and rollup_signals_enabled():
+        previous = Food.objects.filter(pk=instance.pk).first()
+        if previous is not None:
+            instance._previous_nutrition = nutrition_of(previous)
+
+
+@receiver(post_save, sender=Food)
+def rollup_saved_food(sender, instance, **kwargs):
+    from .rollups import apply_food_changes, rollup_signals_enabled
+
+    if rollup_signals_enabled():
+        previous = getattr(instance, "_previous_nutrition", None)
+        apply_food_changes(added=[instance], removed=[previous] if previous else [])
+
+
+@receiver(post_delete, sender=Food)
+def rollup_deleted_food(sender, instance, **kwargs):
+    from .rollups import apply_food_changes, rollup_signals_enabled
+
+    # Deleting the user cascades to their foods and totals alike; there is
+    # nothing left to roll up
+    origin = kwargs.get("origin")
+    origin_model = getattr(origin, "model", type(origin))
+    if origin_model is not None and issubclass(origin_model, User):
+        return
+    if rollup_signals_enabled():
+        apply_food_changes(removed=[instance])
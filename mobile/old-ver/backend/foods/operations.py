@@ -0,0 +1,131 @@
+from django.db import transaction
+from django.utils import timezone
+
+from .models import Food
+from .rollups import apply_food_changes, nutrition_of, suppress_rollup_signals
+from .serializers import FoodSerializer
+
+# Fields a "change" operation may write; everything else in new_value is ignored
+CHANGEABLE_FIELDS = {
+    field.name for field in Food._meta.concrete_fields
+} - {"id", "user", "created_at", "updated_at"}
+
+
+def apply_meal_operations(user, meal_foods, operations, meal_type=None):
+    """
+    Apply a list of add/change/remove operations to a meal in one transaction.
+
+    "change" and "remove" targets are matched by case-insensitive substring
+    against the meal's foods, which are loaded once. All writes are issued as
+    one delete, one bulk_update and one bulk_create, followed by one daily
+    totals update per affected day. Changed and added foods are validated
+    with FoodSerializer first; an operation that fails validation is reported
+    as "invalid" in the summary and not applied.
+
+    Args:
+        user: Owner of the foods
+        meal_foods: Queryset of the foods in the referenced meal
+        operations: List of {"action", "target", "new_value" | "food_data"} dicts
+        meal_type: Meal type for added foods when the meal has no foods yet
+
+    Returns:
+        tuple: (changed and added Food objects, per-operation summary list)
+    """
+    now = timezone.now()
+    summary = []
+    removed_ids = set()
+    changed_foods = {}
+    previous_nutrition = {}
+    changed_fields = set()
+    new_foods = []
+    add_results = []
+
+    with transaction.atomic():
+        foods = list(meal_foods.select_for_update())
+
+        for index, operation in enumerate(operations):
+            action = operation.get("action")
+            target = operation.get("target") or ""
+            result = {"index": index, "action": action, "target": target}
+            matches = [
+                food
+                for food in foods
+                if target and food.id not in removed_ids
+                and target.lower() in food.name.lower()
+            ]
+
+            if action == "change" and isinstance(operation.get("new_value"), dict):
+                new_value = {
+                    field: value
+                    for field, value in operation["new_value"].items()
+                    if field in CHANGEABLE_FIELDS
+                }
+                serializers = [
+                    FoodSerializer(food, data=new_value, partial=True) for food in matches
+                ]
+                invalid = [
+                    serializer for serializer in serializers if not serializer.is_valid()
+                ]
+                if invalid:
+                    # Nothing is changed unless the new values suit every match
+                    result.update(status="invalid", errors=invalid[0].errors)
+                    summary.append(result)
+                    continue
+                for food, serializer in zip(matches, serializers):
+                    previous_nutrition.setdefault(food.id, nutrition_of(food))
+                    for field, value in serializer.validated_data.items():
+                        setattr(food, field, value)
+                    food.updated_at = now
+                    changed_foods[food.id] = food
+                changed_fields.update(new_value)
+                result.update(status="applied", matched=[f.id for f in matches])
+
+            elif action == "remove":
+                removed_ids.update(food.id for food in matches)
+                result.update(status="applied", matched=[f.id for f in matches])
+
+            elif action == "add" and isinstance(operation.get("food_data"), dict):
+                # Added foods join the meal unless they say otherwise
+                food_data = {**operation["food_data"], "user": user.pk}
+                food_data.setdefault("eaten_at", foods[0].eaten_at if foods else now)
+                food_data.setdefault(
+                    "meal_type", foods[0].meal_type if foods else meal_type
+                )
+                serializer = FoodSerializer(data=food_data)
+                if serializer.is_valid():
+                    new_foods.append(Food(**serializer.validated_data))
+                    add_results.append(result)
+                    result["status"] = "applied"
+                else:
+                    result.update(status="invalid", errors=serializer.errors)
+
+            else:
+                result["status"] = "skipped"
+            summary.append(result)
+
+        removed_nutrition = [
+            previous_nutrition.get(food.id) or nutrition_of(food)
+            for food in foods
+            if food.id in removed_ids
+        ]
+        if removed_ids:
+            with suppress_rollup_signals():
+                Food.objects.filter(user=user, id__in=removed_ids).delete()
+
+        updated_foods = [
+            food for food_id, food in changed_foods.items() if food_id not in removed_ids
+        ]
+        if updated_foods and changed_fields:
+            Food.objects.bulk_update(updated_foods, [*changed_fields, "updated_at"])
+
+        created_foods = Food.objects.bulk_create(new_foods)
+        for result, food in zip(add_results, created_foods):
+            result["created"] = food.id
+
+        apply_food_changes(
+            added=updated_foods + created_foods,
+            removed=removed_nutrition
+            + [previous_nutrition[food.id] for food in updated_foods],
+        )
+
+    return updated_foods + created_foods, summary
@@ -0,0 +1,101 @@
+import base64
+from datetime import datetime
+
+from django.conf import settings
+from django.db.models import Q
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import BasePagination
+from rest_framework.response import Response
+from rest_framework.utils.urls import replace_query_param
+
+
+class EatenAtKeysetPagination(BasePagination):
+    """
+    Opt-in keyset pagination on (eaten_at, id).
+
+    Pagination only kicks in when the request passes `cursor` or `page_size`,
+    so existing clients keep receiving the full list. Each page is fetched with
+    a `(eaten_at, id) < cursor` range and a LIMIT, never an OFFSET, so deep pages
+    cost the same as the first one. `ordering=eaten_at` pages oldest first;
+    the default is newest first.
+    """
+
+    cursor_query_param = "cursor"
+    page_size_query_param = "page_size"
+    ordering_query_param = "ordering"
+    max_page_size = 500
+
+    def paginate_queryset(self, queryset, request, view=None):
+        if (
+            self.cursor_query_param not in request.query_params
+            and self.page_size_query_param not in request.query_params
+        ):
+            return None
+
+        self.request = request
+        self.page_size = self.get_page_size(request)
+        self.descending = request.query_params.get(self.ordering_query_param) != "eaten_at"
+
+        if self.descending:
+            queryset = queryset.order_by("-eaten_at", "-id")
+            op = "lt"
+        else:
+            queryset = queryset.order_by("eaten_at", "id")
+            op = "gt"
+
+        cursor = self.decode_cursor(request)
+        if cursor:
+            eaten_at, pk = cursor
+            queryset = queryset.filter(
+                Q(**{f"eaten_at__{op}": eaten_at})
+                | Q(eaten_at=eaten_at, **{f"id__{op}": pk})
+            )
+
+        rows = list(queryset[: self.page_size + 1])
+        self.has_next = len(rows) > self.page_size
+        self.page = rows[: self.page_size]
+        return self.page
+
+    def get_page_size(self, request):
+        page_size = getattr(settings, "FOODS_PAGE_SIZE", 50)
+        try:
+            page_size = int(request.query_params.get(self.page_size_query_param, page_size))
+        except (TypeError, ValueError):
+            pass
+        return max(1, min(page_size, self.max_page_size))
+
+    def decode_cursor(self, request):
+        encoded = request.query_params.get(self.cursor_query_param)
+        if not encoded:
+            return None
+        try:
+            decoded = base64.urlsafe_b64decode(encoded.encode("ascii")).decode("ascii")
+            eaten_at, pk = decoded.rsplit("|", 1)
+            return datetime.fromisoformat(eaten_at), int(pk)
+        except (TypeError, ValueError, UnicodeError):
+            raise NotFound("Invalid cursor")
+
+    def encode_cursor(self, food):
+        raw = f"{food.eaten_at.isoformat()}|{food.pk}"
+        return base64.urlsafe_b64encode(raw.encode("ascii")).decode("ascii")
+
+    def get_next_link(self):
+        if not self.has_next:
+            return None
+        url = self.request.build_absolute_uri()
+        return replace_query_param(
+            url, self.cursor_query_param, self.encode_cursor(self.page[-1])
+        )
+
+    def get_paginated_response(self, data):
+        return Response({"next": self.get_next_link(), "results": data})
+
+    def get_paginated_response_schema(self, schema):
+        return {
+            "type": "object",
+            "required": ["results"],
+            "properties": {
+                "next": {"type": "string", "nullable": True, "format": "uri"},
+                "results": schema,
+            },
+        }
@@ -0,0 +1,148 @@
+import threading
+from collections import defaultdict, namedtuple
+from contextlib import contextmanager
+from datetime import datetime
+from decimal import Decimal, InvalidOperation
+
+from django.db import transaction
+from django.utils import timezone
+
+from users.models import UserProfile
+from .models import DailyNutritionTotals, Food
+from .utils import resolve_timezone
+
+TOTAL_FIELDS = (
+    "calories",
+    "protein",
+    "carbohydrates",
+    "trans_fat",
+    "saturated_fat",
+    "unsaturated_fat",
+)
+
+# What a food contributed to its day's totals, captured before it changes
+FoodNutrition = namedtuple("FoodNutrition", ["user_id", "eaten_at", "values", "others"])
+
+_state = threading.local()
+
+
+def to_decimal(value):
+    try:
+        return Decimal(str(value or 0))
+    except (InvalidOperation, ValueError):
+        return Decimal(0)
+
+
+def nutrition_of(food):
+    """Snapshot of a food's contribution to the daily totals."""
+    if isinstance(food, FoodNutrition):
+        return food
+    others = {
+        key: to_decimal(value)
+        for key, value in (food.others or {}).items()
+        if isinstance(value, (int, float, Decimal)) and not isinstance(value, bool)
+    }
+    return FoodNutrition(
+        user_id=food.user_id,
+        eaten_at=food.eaten_at,
+        values={field: to_decimal(getattr(food, field)) for field in TOTAL_FIELDS},
+        others=others,
+    )
+
+
+@contextmanager
+def suppress_rollup_signals():
+    """Skip per-row signal rollups while a bulk path applies them itself."""
+    previous = getattr(_state, "suppressed", False)
+    _state.suppressed = True
+    try:
+        yield
+    finally:
+        _state.suppressed = previous
+
+
+def rollup_signals_enabled():
+    return not getattr(_state, "suppressed", False)
+
+
+def apply_food_changes(added=(), removed=()):
+    """
+    Add the nutrition of `added` foods to, and subtract `removed` snapshots from,
+    the affected DailyNutritionTotals rows. Costs one locked read and one write
+    per affected (user, day), however many foods changed.
+    """
+    changes = [(nutrition_of(f), 1) for f in added if f is not None]
+    changes += [(nutrition_of(f), -1) for f in removed if f is not None]
+    if not changes:
+        return
+
+    user_ids = {snapshot.user_id for snapshot, _ in changes}
+    timezones = {
+        user_id: resolve_timezone(name)
+        for user_id, name in UserProfile.objects.filter(user_id__in=user_ids).values_list(
+            "user_id", "timezone"
+        )
+    }
+
+    deltas = defaultdict(
+        lambda: {"values": defaultdict(Decimal), "others": defaultdict(Decimal), "count": 0}
+    )
+    for snapshot, sign in changes:
+        tz = timezones.get(snapshot.user_id) or timezone.get_current_timezone()
+        eaten_at = snapshot.eaten_at
+        if isinstance(eaten_at, str):
+            eaten_at = datetime.fromisoformat(eaten_at)
+        if timezone.is_naive(eaten_at):
+            # Naive values are stored in the server time zone, like Django does on save
+            eaten_at = timezone.make_aware(eaten_at)
+        delta = deltas[(snapshot.user_id, timezone.localtime(eaten_at, tz).date())]
+        delta["count"] += sign
+        for field, value in snapshot.values.items():
+            delta["values"][field] += sign * value
+        for key, value in snapshot.others.items():
+            delta["others"][key] += sign * value
+
+    with transaction.atomic():
+        for (user_id, day), delta in sorted(deltas.items()):
+            if delta["count"] < 0:
+                # Removals only ever shrink an existing row; never create one
+                totals = (
+                    DailyNutritionTotals.objects.select_for_update()
+                    .filter(user_id=user_id, date=day)
+                    .first()
+                )
+                if totals is None:
+                    continue
+            else:
+                totals, _ = DailyNutritionTotals.objects.select_for_update().get_or_create(
+                    user_id=user_id, date=day
+                )
+            for field, value in delta["values"].items():
+                setattr(totals, field, to_decimal(getattr(totals, field)) + value)
+            others = {key: to_decimal(value) for key, value in totals.others.items()}
+            for key, value in delta["others"].items():
+                others[key] = others.get(key, Decimal(0)) + value
+            totals.others = {
+                key: float(round(value, 2)) for key, value in others.items() if value
+            }
+            totals.food_count = max(0, totals.food_count + delta["count"])
+            totals.save()
+
+
+def rebuild_daily_totals(user_ids=None):
+    """Recompute DailyNutritionTotals from scratch for the given users (or everyone)."""
+    foods = Food.objects.all()
+    totals = DailyNutritionTotals.objects.all()
+    if user_ids is not None:
+        foods = foods.filter(user_id__in=user_ids)
+        totals = totals.filter(user_id__in=user_ids)
+
+    with transaction.atomic():
+        totals.delete()
+        batch = []
+        for food in foods.iterator(chunk_size=2000):
+            batch.append(food)
+            if len(batch) == 2000:
+                apply_food_changes(added=batch)
+                batch = []
+        apply_food_changes(added=batch)
@@ -1,7 +1,8 @@
 from datetime import datetime
 
 from rest_framework import serializers
-from .models import Food
+from .models import DailyNutritionTotals, Food
+from .utils import normalize_meal_type
 
 
 class FoodSerializer(serializers.ModelSerializer):
@@ -9,6 +10,25 @@ class FoodSerializer(serializers.ModelSerializer):
         model = Food
         fields = "__all__"
 
+    def validate_meal_type(self, value):
+        return normalize_meal_type(value)
+
+
+class DailyNutritionTotalsSerializer(serializers.ModelSerializer):
+    class Meta:
+        model = DailyNutritionTotals
+        fields = [
+            "date",
+            "calories",
+            "protein",
+            "carbohydrates",
+            "trans_fat",
+            "saturated_fat",
+            "unsaturated_fat",
+            "others",
+            "food_count",
+        ]
+
 
 class AgentFoodResponseSerializer(serializers.ModelSerializer):
     """
@@ -59,6 +79,9 @@ class AgentFoodResponseSerializer(serializers.ModelSerializer):
 
         return data
 
+    def validate_meal_type(self, value):
+        return normalize_meal_type(value)
+
     def create(self, validated_data):
         """Create a Food instance with the user from context"""
         user = self.context.get("user")
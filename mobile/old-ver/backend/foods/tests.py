@@ -1,3 +1,138 @@
+from datetime import datetime
+
+from django.contrib.auth.models import User
 from django.test import TestCase
+from django.utils import timezone
+
+from .models import DailyNutritionTotals, Food
+from .operations import apply_meal_operations
+from .serializers import AgentFoodResponseSerializer, FoodSerializer
+from .utils import meal_queryset
+
+
+def make_food(user, **fields):
+    data = {
+        "name": "apple",
+        "serving_size": 1,
+        "calories": 95,
+        "protein": 0.5,
+        "carbohydrates": 25,
+        "eaten_at": timezone.make_aware(datetime(2025, 9, 28, 12, 0)),
+        "meal_type": "Lunch",
+    }
+    data.update(fields)
+    return Food.objects.create(user=user, **data)
+
+
+class DailyTotalsRollupTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username="eater", password="pw")
+
+    def test_deleting_food_updates_totals(self):
+        food = make_food(self.user)
+        make_food(self.user, name="banana", calories=105)
+        food.delete()
+
+        totals = DailyNutritionTotals.objects.get(user=self.user)
+        self.assertEqual(totals.food_count, 1)
+        self.assertEqual(float(totals.calories), 105)
+
+    def test_deleting_user_with_foods(self):
+        make_food(self.user)
+        make_food(self.user, name="banana", calories=105)
+
+        self.user.delete()
+
+        self.assertFalse(Food.objects.exists())
+        self.assertFalse(DailyNutritionTotals.objects.exists())
+
+
+class MealOperationsTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username="eater", password="pw")
+        self.food = make_food(self.user)
+
+    def test_invalid_add_is_reported_not_inserted(self):
+        operations = [
+            {"action": "add", "food_data": {"name": "broken"}},
+            {
+                "action": "add",
+                "food_data": {
+                    "name": "banana",
+                    "serving_size": 1,
+                    "calories": 105,
+                    "protein": 1.3,
+                    "carbohydrates": 27,
+                },
+            },
+        ]
+
+        foods, summary = apply_meal_operations(
+            self.user, Food.objects.filter(user=self.user), operations
+        )
+
+        self.assertEqual(summary[0]["status"], "invalid")
+        self.assertIn("calories", summary[0]["errors"])
+        self.assertEqual(summary[1]["status"], "applied")
+        self.assertEqual([food.name for food in foods], ["banana"])
+        self.assertEqual(foods[0].meal_type, "Lunch")
+        totals = DailyNutritionTotals.objects.get(user=self.user)
+        self.assertEqual(totals.food_count, 2)
+
+    def test_invalid_change_is_reported_not_applied(self):
+        operations = [
+            {"action": "change", "target": "apple", "new_value": {"calories": "abc"}},
+            {"action": "change", "target": "apple", "new_value": {"calories": 80}},
+        ]
+
+        foods, summary = apply_meal_operations(
+            self.user, Food.objects.filter(user=self.user), operations
+        )
+
+        self.assertEqual(summary[0]["status"], "invalid")
+        self.assertIn("calories", summary[0]["errors"])
+        self.assertEqual(summary[1]["status"], "applied")
+        self.food.refresh_from_db()
+        self.assertEqual(float(self.food.calories), 80)
+        totals = DailyNutritionTotals.objects.get(user=self.user)
+        self.assertEqual(float(totals.calories), 80)
+
+
+class MealTypeTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username="eater", password="pw")
+
+    def test_serializers_store_one_spelling(self):
+        data = {
+            "name": "banana",
+            "serving_size": 1,
+            "calories": 105,
+            "protein": 1.3,
+            "carbohydrates": 27,
+            "eaten_at": "2025-09-28T12:00:00Z",
+            "user": self.user.id,
+        }
+        for meal_type, expected in [
+            ("lunch", "Lunch"),
+            (" LUNCH ", "Lunch"),
+            ("Lunch", "Lunch"),
+            ("late snack", "Late snack"),
+            (None, None),
+        ]:
+            for serializer in (
+                FoodSerializer(data={**data, "meal_type": meal_type}),
+                AgentFoodResponseSerializer(data={**data, "meal_type": meal_type}),
+            ):
+                with self.subTest(meal_type=meal_type, serializer=type(serializer)):
+                    self.assertTrue(serializer.is_valid(), serializer.errors)
+                    self.assertEqual(serializer.validated_data["meal_type"], expected)
+
+    def test_meal_filter_matches_any_spelling_of_the_query(self):
+        lunch = make_food(self.user, meal_type="Lunch")
+        make_food(self.user, name="toast", meal_type="Breakfast")
+        day = timezone.localdate(lunch.eaten_at)
 
-# Create your tests here.
+        for meal_type in ("lunch", "LUNCH", " Lunch"):
+            with self.subTest(meal_type=meal_type):
+                foods = meal_queryset(self.user, day=day, meal_type=meal_type)
+                self.assertEqual(list(foods), [lunch])
@@ -0,0 +1,63 @@
+from datetime import datetime, time, timedelta
+from zoneinfo import ZoneInfo, ZoneInfoNotFoundError
+
+from django.utils import timezone
+
+from .models import Food
+
+
+def resolve_timezone(name):
+    """ZoneInfo for an IANA name, falling back to the server time zone."""
+    try:
+        return ZoneInfo(name)
+    except (TypeError, ValueError, ZoneInfoNotFoundError):
+        return timezone.get_current_timezone()
+
+
+def user_timezone(user):
+    """The user's profile time zone, falling back to the server time zone."""
+    profile = getattr(user, "profile", None)
+    return resolve_timezone(getattr(profile, "timezone", None))
+
+
+def day_bounds(day, tz=None):
+    """Half-open [start, end) timestamp range covering a calendar day in `tz`."""
+    tz = tz or timezone.get_current_timezone()
+    start = timezone.make_aware(datetime.combine(day, time.min), tz)
+    end = timezone.make_aware(datetime.combine(day + timedelta(days=1), time.min), tz)
+    return start, end
+
+
+def normalize_meal_type(meal_type):
+    """
+    Canonical spelling of a meal type ("lunch", " LUNCH" -> "Lunch"). Meal
+    types are stored this way, so meal filters are an exact match that stays
+    on the (user, meal_type, eaten_at) index.
+    """
+    if not meal_type:
+        return meal_type
+    return meal_type.strip().capitalize()
+
+
+def meal_queryset(user, meal_id=None, day=None, meal_type=None):
+    """
+    Foods belonging to a referenced meal, filtered on an eaten_at range so the
+    lookup stays on the (user, eaten_at) index.
+
+    A meal is identified either by one of its foods (`meal_id`), which scopes
+    to that food's day and meal type, or by a `day` and optional `meal_type`.
+    Returns None if `meal_id` doesn't belong to the user.
+    """
+    tz = user_timezone(user)
+    if meal_id is not None:
+        anchor = Food.objects.filter(user=user, id=meal_id).first()
+        if anchor is None:
+            return None
+        day = timezone.localtime(anchor.eaten_at, tz).date()
+        meal_type = anchor.meal_type
+
+    start, end = day_bounds(day or timezone.localdate(timezone=tz), tz)
+    foods = Food.objects.filter(user=user, eaten_at__gte=start, eaten_at__lt=end)
+    if meal_type:
+        foods = foods.filter(meal_type=normalize_meal_type(meal_type))
+    return foods
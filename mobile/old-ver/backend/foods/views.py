@@ -2,17 +2,23 @@ from rest_framework import viewsets, status
 from rest_framework.decorators import action
 from rest_framework.response import Response
 from django.contrib.auth.models import User
-from datetime import datetime, timedelta
-from .models import Food
-from .serializers import FoodSerializer
+from django.utils import timezone
+from datetime import date, datetime, timedelta
+from .models import DailyNutritionTotals, Food
+from .operations import apply_meal_operations
+from .pagination import EatenAtKeysetPagination
+from .rollups import TOTAL_FIELDS
+from .serializers import DailyNutritionTotalsSerializer, FoodSerializer
+from .utils import day_bounds, meal_queryset, normalize_meal_type, user_timezone
 
 
 class FoodViewSet(viewsets.ModelViewSet):
     queryset = Food.objects.none()
     serializer_class = FoodSerializer
+    pagination_class = EatenAtKeysetPagination
 
     def get_queryset(self):
-        return Food.objects.filter(user=self.request.user).order_by("-eaten_at")
+        return Food.objects.filter(user=self.request.user).order_by("-eaten_at", "-id")
 
     @action(detail=False, methods=["get"])
     def lookup(self, request):
@@ -37,10 +43,19 @@ class FoodViewSet(viewsets.ModelViewSet):
                 {"error": "User not found"}, status=status.HTTP_404_NOT_FOUND
             )
 
-        # Parse meal reference for date and meal type
-        target_date = datetime.now().date()
+        # Parse meal reference for date and meal type, in the user's time zone
+        tz = user_timezone(user)
+        now = timezone.now()
+        if context_date:
+            try:
+                now = datetime.fromisoformat(context_date)
+            except ValueError:
+                pass
+        if timezone.is_naive(now):
+            now = timezone.make_aware(now, tz)
+        target_date = timezone.localtime(now, tz).date()
         if "yesterday" in meal_reference.lower():
-            target_date = (datetime.now() - timedelta(days=1)).date()
+            target_date -= timedelta(days=1)
 
         meal_type = None
         if "breakfast" in meal_reference.lower():
@@ -52,11 +67,14 @@ class FoodViewSet(viewsets.ModelViewSet):
         elif "snack" in meal_reference.lower():
             meal_type = "snack"
 
-        # Query foods
-        foods_query = Food.objects.filter(user=user, eaten_at__date=target_date)
+        # Query foods with a half-open range so (user, [meal_type,] eaten_at) indexes apply
+        start, end = day_bounds(target_date, tz)
+        foods_query = Food.objects.filter(
+            user=user, eaten_at__gte=start, eaten_at__lt=end
+        )
 
         if meal_type:
-            foods_query = foods_query.filter(meal_type__icontains=meal_type)
+            foods_query = foods_query.filter(meal_type=normalize_meal_type(meal_type))
 
         foods = foods_query.order_by("-eaten_at")
 
@@ -80,15 +98,80 @@ class FoodViewSet(viewsets.ModelViewSet):
                 }
             )
 
+    @action(detail=False, methods=["get"])
+    def summary(self, request):
+        """
+        Nutrition totals for a day, week or month, read from the daily rollup.
+        Query params: range ("day", "week" or "month"), date (YYYY-MM-DD, defaults to today)
+        """
+        if not request.user.is_authenticated:
+            return Response(status=status.HTTP_401_UNAUTHORIZED)
+
+        range_name = request.GET.get("range", "day")
+        tz = user_timezone(request.user)
+        try:
+            day = (
+                date.fromisoformat(request.GET["date"])
+                if request.GET.get("date")
+                else timezone.localdate(timezone=tz)
+            )
+        except ValueError:
+            return Response(
+                {"error": "date must be an ISO date (YYYY-MM-DD)"},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+
+        if range_name == "day":
+            start = end = day
+        elif range_name == "week":
+            start = day - timedelta(days=day.weekday())
+            end = start + timedelta(days=6)
+        elif range_name == "month":
+            start = day.replace(day=1)
+            end = (start + timedelta(days=32)).replace(day=1) - timedelta(days=1)
+        else:
+            return Response(
+                {"error": "range must be one of day, week, month"},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+
+        days = DailyNutritionTotals.objects.filter(
+            user=request.user, date__range=(start, end)
+        ).order_by("date")
+
+        totals = {field: 0 for field in TOTAL_FIELDS}
+        totals["others"] = {}
+        totals["food_count"] = 0
+        for row in days:
+            for field in TOTAL_FIELDS:
+                totals[field] += getattr(row, field)
+            for key, value in row.others.items():
+                totals["others"][key] = round(totals["others"].get(key, 0) + value, 2)
+            totals["food_count"] += row.food_count
+
+        return Response(
+            {
+                "range": range_name,
+                "start": start.isoformat(),
+                "end": end.isoformat(),
+                "totals": totals,
+                "days": DailyNutritionTotalsSerializer(days, many=True).data,
+            }
+        )
+
     @action(detail=False, methods=["patch"])
     def bulk_update(self, request):
         """
         Apply updates to existing meal.
-        Body: {"meal_id": "...", "operations": [...], "user_id": "..."}
+        Body: {"meal_id": "...", "operations": [...], "user_id": "...",
+               "date": "YYYY-MM-DD", "meal_type": "..."}
+        The meal is identified by one of its food ids (meal_id), or by date
+        (defaults to today) and an optional meal_type.
         """
         meal_id = request.data.get("meal_id")
         operations = request.data.get("operations", [])
         user_id = request.data.get("user_id")
+        meal_type = request.data.get("meal_type")
 
         if not user_id or not operations:
             return Response(
@@ -103,38 +186,32 @@ class FoodViewSet(viewsets.ModelViewSet):
                 {"error": "User not found"}, status=status.HTTP_404_NOT_FOUND
             )
 
-        updated_foods = []
-
-        for operation in operations:
-            action = operation.get("action")
-            target = operation.get("target")
-
-            if action == "change" and "new_value" in operation:
-                # Update existing food
-                foods = Food.objects.filter(user=user, name__icontains=target)
-                for food in foods:
-                    for field, value in operation["new_value"].items():
-                        if hasattr(food, field):
-                            setattr(food, field, value)
-                    food.save()
-                    updated_foods.append(food)
-
-            elif action == "remove":
-                # Delete food
-                Food.objects.filter(user=user, name__icontains=target).delete()
-
-            elif action == "add" and "food_data" in operation:
-                # Add new food
-                food_data = operation["food_data"]
-                food_data["user"] = user
-                food = Food.objects.create(**food_data)
-                updated_foods.append(food)
+        day = None
+        if request.data.get("date"):
+            try:
+                day = date.fromisoformat(request.data["date"])
+            except (TypeError, ValueError):
+                return Response(
+                    {"error": "date must be an ISO date (YYYY-MM-DD)"},
+                    status=status.HTTP_400_BAD_REQUEST,
+                )
+
+        meal_foods = meal_queryset(user, meal_id, day, meal_type)
+        if meal_foods is None:
+            return Response(
+                {"error": "Meal not found"}, status=status.HTTP_404_NOT_FOUND
+            )
+
+        updated_foods, summary = apply_meal_operations(
+            user, meal_foods, operations, meal_type
+        )
 
         serializer = FoodSerializer(updated_foods, many=True)
         return Response(
             {
                 "success": True,
                 "updated_foods": serializer.data,
+                "operations": summary,
                 "message": "Meal updated successfully",
             }
         )
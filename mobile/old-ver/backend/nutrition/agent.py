@@ -1,44 +1,97 @@
-import requests
+import json
+
+from django.db import transaction
+from django.utils import timezone
+from .agent_client import get_agent_client
 from .utils import strip_code_blocks
 from foods.models import Food
+from foods.rollups import apply_food_changes, nutrition_of
 from foods.serializers import FoodSerializer, AgentFoodResponseSerializer
+from users.utils import get_user_memory
+
+
+class AgentError(Exception):
+    """The ADK service answered, but with an error status."""
 
 
-def create_foods_from_data(foods_data, user):
-    """Create Food objects using the AgentFoodResponseSerializer"""
-    created_foods = []
+def bulk_create_foods(foods_data, user):
+    """
+    Validate every agent food item in one pass and insert the valid ones with a
+    single bulk_create inside a transaction.
+
+    Returns:
+        tuple: (created Food objects with IDs, list of {"food", "errors"} for invalid items)
+    """
+    new_foods = []
+    invalid_foods = []
     for food_data in foods_data:
         serializer = AgentFoodResponseSerializer(data=food_data, context={"user": user})
         if serializer.is_valid():
-            food_obj = serializer.save()
-            created_foods.append(food_obj)
-            print(f"Created food entry: {food_obj.name} (ID: {food_obj.id})")
+            new_foods.append(Food(**serializer.validated_data, user=user))
         else:
-            print(f"Invalid food data: {serializer.errors}")
-            print(f"Food data was: {food_data}")
-    return created_foods
+            invalid_foods.append({"food": food_data, "errors": serializer.errors})
 
+    with transaction.atomic():
+        created_foods = Food.objects.bulk_create(new_foods)
+        apply_food_changes(added=created_foods)
+    return created_foods, invalid_foods
 
-def update_existing_foods(foods_data, user):
-    """Update existing Food objects based on agent response data"""
-    updated_foods = []
+
+def bulk_update_foods(foods_data, user):
+    """
+    Apply partial agent updates with one in_bulk query scoped to the user and one
+    bulk_update limited to the fields that actually changed.
+
+    Returns:
+        tuple: (updated Food objects, IDs not found for this user, invalid items)
+    """
+    updates = {}
+    missing_ids = []
     for food_data in foods_data:
-        if "id" in food_data:
-            try:
-                food = Food.objects.get(id=food_data["id"], user=user)
-                serializer = AgentFoodResponseSerializer(
-                    food, data=food_data, partial=True, context={"user": user}
-                )
-                if serializer.is_valid():
-                    food_obj = serializer.save()
-                    updated_foods.append(food_obj)
-                    print(f"Updated food entry: {food_obj.name} (ID: {food_obj.id})")
-                else:
-                    print(f"Invalid update data: {serializer.errors}")
-                    print(f"Food data was: {food_data}")
-            except Food.DoesNotExist:
-                print(f"Food with id {food_data['id']} not found for user {user}")
-    return updated_foods
+        if food_data.get("id") is None:
+            continue
+        try:
+            updates[int(food_data["id"])] = food_data
+        except (TypeError, ValueError):
+            missing_ids.append(food_data["id"])
+
+    foods_by_id = Food.objects.filter(user=user).in_bulk(list(updates))
+
+    updated_foods = []
+    previous_nutrition = []
+    invalid_foods = []
+    changed_fields = set()
+    now = timezone.now()
+    for food_id, food_data in updates.items():
+        food = foods_by_id.get(food_id)
+        if food is None:
+            missing_ids.append(food_id)
+            continue
+        serializer = AgentFoodResponseSerializer(
+            food, data=food_data, partial=True, context={"user": user}
+        )
+        if not serializer.is_valid():
+            invalid_foods.append({"food": food_data, "errors": serializer.errors})
+            continue
+        changed = {
+            field
+            for field, value in serializer.validated_data.items()
+            if getattr(food, field) != value
+        }
+        if not changed:
+            continue
+        previous_nutrition.append(nutrition_of(food))
+        for field in changed:
+            setattr(food, field, serializer.validated_data[field])
+        food.updated_at = now
+        changed_fields |= changed
+        updated_foods.append(food)
+
+    if updated_foods:
+        with transaction.atomic():
+            Food.objects.bulk_update(updated_foods, [*changed_fields, "updated_at"])
+            apply_food_changes(added=updated_foods, removed=previous_nutrition)
+    return updated_foods, missing_ids, invalid_foods
 
 
 def build_agent_payload(user_id, session_id, message_text=None, image_data=None, personalization=None):
@@ -78,43 +131,86 @@ def build_agent_payload(user_id, session_id, message_text=None, image_data=None,
     return payload
 
 
-def send_agent_request(agent_base_url, payload):
-    agent_response = requests.post(f"{agent_base_url}/run", json=payload)
+def send_agent_request(payload):
+    agent_response = get_agent_client().run(payload)
     return agent_response
 
 
-def process_agent_response(content, user, clear_session_callback=None):
-    print(f"Agent response content: {content}")
+def prepare_agent_run(user, session_id, message_text=None, image_data=None):
+    """
+    Create the ADK session and build the /run payload, personalized with the
+    user's memory. Raises AgentError if the session cannot be created.
+    """
+    user_id = str(user.id)
+    session_response = get_agent_client().create_session(user_id, session_id)
+    if session_response.status_code not in [200, 201]:
+        raise AgentError("Failed to create session")
+
+    user_memory = get_user_memory(user, message_text)
+    personalization = {"memory": user_memory} if user_memory else None
+    return build_agent_payload(
+        user_id, session_id, message_text, image_data, personalization
+    )
+
+
+def run_agent(payload):
+    """Call /run and return the content of the final event. Raises AgentError on failure."""
+    agent_response = send_agent_request(payload)
+    if agent_response.status_code != 200:
+        raise AgentError("Agent call failed")
+    return agent_response.json()[-1].get("content", {})
+
+
+def parse_agent_content(content):
+    """
+    Extract (questions, foods, request_type) from the text parts of the agent's
+    final event. request_type comes from the merger's JSON payload, not the
+    event envelope, and defaults to "new".
+    """
     questions = []
     foods = []
-    request_type = content.get("request_type", "new")
-
-    # Check for questions/foods in parts structure
-    if "parts" in content and content["parts"]:
-        for part in content["parts"]:
-            if "text" in part:
-                try:
-                    import json
-
-                    text_content = json.loads(strip_code_blocks(part["text"]))
-                    questions = text_content.get("questions", [])
-                    foods = text_content.get("foods", [])
-
-                    # Check if this part contains questions
-                    if isinstance(text_content, dict) and "questions" in text_content:
-                        questions.extend(text_content["questions"])
-
-                    # Check if this part contains foods (as JSON array)
-                    elif isinstance(text_content, list) and len(text_content) > 0:
-                        # Assume this is a list of foods if it has typical food fields
-                        if all(
-                            isinstance(item, dict) and "name" in item
-                            for item in text_content
-                        ):
-                            foods.extend(text_content)
-
-                except (json.JSONDecodeError, TypeError):
-                    continue
+    request_type = "new"
+
+    for part in content.get("parts") or []:
+        if "text" not in part:
+            continue
+        try:
+            text_content = json.loads(strip_code_blocks(part["text"]))
+        except (json.JSONDecodeError, TypeError):
+            continue
+
+        if isinstance(text_content, dict):
+            questions.extend(text_content.get("questions") or [])
+            foods.extend(text_content.get("foods") or [])
+            request_type = text_content.get("request_type") or request_type
+        # A bare JSON array of foods
+        elif isinstance(text_content, list) and all(
+            isinstance(item, dict) and "name" in item for item in text_content
+        ):
+            foods.extend(text_content)
+
+    return questions, foods, request_type
+
+
+def parse_unresolved_foods(content):
+    """Foods the agent could not find nutrition for, from the merger's output."""
+    for part in content.get("parts") or []:
+        if "text" in part:
+            try:
+                text_content = json.loads(strip_code_blocks(part["text"]))
+            except (json.JSONDecodeError, TypeError):
+                continue
+            if isinstance(text_content, dict) and text_content.get("unresolved"):
+                return text_content["unresolved"]
+    return []
+
+
+def process_agent_response(content, user, clear_session_callback=None):
+    print(f"Agent response content: {content}")
+    questions, foods, request_type = parse_agent_content(content)
+    unresolved_foods = parse_unresolved_foods(content)
+    if unresolved_foods:
+        print(f"Agent could not resolve {len(unresolved_foods)} foods: {unresolved_foods}")
 
     if questions:
         print(f"Questions detected: {questions}")
@@ -123,14 +219,30 @@ def process_agent_response(content, user, clear_session_callback=None):
         print(f"No questions - saving {len(foods)} foods to database")
         try:
             if request_type == "update":
-                update_existing_foods(foods, user)
+                # Foods with an id edit existing rows; only the rest are new
+                updated_foods, missing_ids, invalid_foods = bulk_update_foods(foods, user)
+                new_foods = [f for f in foods if f.get("id") is None]
+            else:
+                updated_foods, missing_ids, invalid_foods = [], [], []
+                new_foods = foods
 
             # Use the serializer to handle field mapping and validation
-            created_foods = create_foods_from_data(foods, user)
-            serialized_foods = FoodSerializer(created_foods, many=True).data
+            created_foods, invalid_new_foods = bulk_create_foods(new_foods, user)
+            invalid_foods += invalid_new_foods
+            serialized_foods = FoodSerializer(
+                updated_foods + created_foods, many=True
+            ).data
 
             response_content = content.copy()
             response_content["response"] = serialized_foods
+            if missing_ids:
+                print(f"Foods with ids {missing_ids} not found for user {user}")
+                response_content["missing_food_ids"] = missing_ids
+            if invalid_foods:
+                print(f"Skipped {len(invalid_foods)} invalid foods: {invalid_foods}")
+                response_content["invalid_foods"] = invalid_foods
+            if unresolved_foods:
+                response_content["unresolved_foods"] = unresolved_foods
 
             if clear_session_callback:
                 clear_session_callback()
@@ -145,4 +257,6 @@ def process_agent_response(content, user, clear_session_callback=None):
         print("No foods or questions detected in agent response")
         if clear_session_callback:
             clear_session_callback()
+        if unresolved_foods:
+            return {**content, "unresolved_foods": unresolved_foods}
         return content
\ No newline at end of file
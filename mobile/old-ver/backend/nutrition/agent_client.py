@@ -0,0 +1,187 @@
+import asyncio
+import threading
+import time
+import weakref
+from collections import defaultdict
+
+import httpx
+import requests
+from django.conf import settings
+from requests.adapters import HTTPAdapter
+
+
+class AgentMetrics:
+    """Per-endpoint call counts, error counts and latency of ADK calls."""
+
+    def __init__(self):
+        self._stats = defaultdict(
+            lambda: {"calls": 0, "errors": 0, "total_ms": 0.0, "max_ms": 0.0, "last_ms": 0.0}
+        )
+        self._lock = threading.Lock()
+
+    def record(self, endpoint, elapsed_ms, failed):
+        with self._lock:
+            stats = self._stats[endpoint]
+            stats["calls"] += 1
+            stats["errors"] += int(failed)
+            stats["total_ms"] += elapsed_ms
+            stats["max_ms"] = max(stats["max_ms"], elapsed_ms)
+            stats["last_ms"] = elapsed_ms
+
+    def snapshot(self):
+        with self._lock:
+            return {
+                endpoint: {
+                    **stats,
+                    "avg_ms": stats["total_ms"] / stats["calls"] if stats["calls"] else 0.0,
+                }
+                for endpoint, stats in self._stats.items()
+            }
+
+
+agent_metrics = AgentMetrics()
+
+
+class AgentClient:
+    """
+    Process-wide HTTP client for the ADK service.
+
+    Reuses keep-alive connections from a bounded pool, applies connect/read
+    timeouts to every call, and records per-endpoint latency.
+    """
+
+    def __init__(self, base_url, connect_timeout, read_timeout, pool_size):
+        self.base_url = base_url.rstrip("/")
+        self.timeout = (connect_timeout, read_timeout)
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=pool_size)
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
+
+    @classmethod
+    def from_settings(cls):
+        return cls(
+            base_url=settings.AGENT_BASE_URL,
+            connect_timeout=settings.AGENT_CONNECT_TIMEOUT,
+            read_timeout=settings.AGENT_READ_TIMEOUT,
+            pool_size=settings.AGENT_POOL_SIZE,
+        )
+
+    def request(self, method, path, endpoint=None, **kwargs):
+        """Send a request to `path` on the ADK service, recording its latency under `endpoint`."""
+        kwargs.setdefault("timeout", self.timeout)
+        start = time.perf_counter()
+        failed = True
+        try:
+            response = self.session.request(method, f"{self.base_url}{path}", **kwargs)
+            failed = response.status_code >= 500
+            return response
+        finally:
+            agent_metrics.record(
+                endpoint or path, (time.perf_counter() - start) * 1000, failed
+            )
+
+    def create_session(self, user_id, session_id, state=None):
+        return self.request(
+            "POST",
+            f"/apps/food_text/users/{user_id}/sessions/{session_id}",
+            endpoint="create_session",
+            json={"state": state or {}},
+        )
+
+    def run(self, payload):
+        return self.request("POST", "/run", endpoint="run", json=payload)
+
+    def run_sse(self, payload):
+        """
+        Start a /run_sse call and return the open response; read it with
+        iter_lines() and close it when done. Latency is time to first byte.
+        """
+        return self.request(
+            "POST",
+            "/run_sse",
+            endpoint="run_sse",
+            # One event per agent step rather than per model token
+            json={**payload, "streaming": False},
+            stream=True,
+        )
+
+    def metrics(self):
+        """Per-endpoint call counts, error counts and latency in milliseconds."""
+        return agent_metrics.snapshot()
+
+
+class AsyncAgentClient:
+    """
+    Non-blocking counterpart of AgentClient for async views, backed by a
+    pooled httpx.AsyncClient. Latency is recorded in the same metrics.
+    """
+
+    def __init__(self, base_url, connect_timeout, read_timeout, pool_size):
+        self.client = httpx.AsyncClient(
+            base_url=base_url.rstrip("/"),
+            timeout=httpx.Timeout(read_timeout, connect=connect_timeout),
+            limits=httpx.Limits(
+                max_connections=pool_size, max_keepalive_connections=pool_size
+            ),
+        )
+
+    @classmethod
+    def from_settings(cls):
+        return cls(
+            base_url=settings.AGENT_BASE_URL,
+            connect_timeout=settings.AGENT_CONNECT_TIMEOUT,
+            read_timeout=settings.AGENT_READ_TIMEOUT,
+            pool_size=settings.AGENT_POOL_SIZE,
+        )
+
+    async def request(self, method, path, endpoint=None, **kwargs):
+        start = time.perf_counter()
+        failed = True
+        try:
+            response = await self.client.request(method, path, **kwargs)
+            failed = response.status_code >= 500
+            return response
+        finally:
+            agent_metrics.record(
+                endpoint or path, (time.perf_counter() - start) * 1000, failed
+            )
+
+    async def create_session(self, user_id, session_id, state=None):
+        return await self.request(
+            "POST",
+            f"/apps/food_text/users/{user_id}/sessions/{session_id}",
+            endpoint="create_session",
+            json={"state": state or {}},
+        )
+
+    async def run(self, payload):
+        return await self.request("POST", "/run", endpoint="run", json=payload)
+
+
+_agent_client = None
+_agent_client_lock = threading.Lock()
+
+
+def get_agent_client():
+    """Return the shared AgentClient, creating it on first use."""
+    global _agent_client
+    if _agent_client is None:
+        with _agent_client_lock:
+            if _agent_client is None:
+                _agent_client = AgentClient.from_settings()
+    return _agent_client
+
+
+# httpx connections belong to the event loop that opened them, so keep one
+# async client per loop (one in total under an ASGI server).
+_async_agent_clients = weakref.WeakKeyDictionary()
+
+
+def get_async_agent_client():
+    """Return the AsyncAgentClient for the running event loop."""
+    loop = asyncio.get_running_loop()
+    client = _async_agent_clients.get(loop)
+    if client is None:
+        client = _async_agent_clients[loop] = AsyncAgentClient.from_settings()
+    return client
@@ -0,0 +1,222 @@
+"""
+Async variants of /api/process and /api/resubmit, and the event stream for
+background analysis jobs.
+
+While a request waits on the ADK service it holds no worker thread, so one
+ASGI worker (uvicorn/daphne, see nutrition_tracker/asgi.py) can keep many
+agent calls in flight. Under WSGI these views still work, but each request
+runs in its own event loop and gains nothing.
+"""
+
+import asyncio
+import json
+import uuid
+
+import httpx
+from asgiref.sync import sync_to_async
+from django.http import JsonResponse
+from django.views.decorators.http import require_GET, require_POST
+from rest_framework import status
+
+from nutrition.agent import AgentError, build_agent_payload, process_agent_response
+from nutrition.agent_client import get_async_agent_client
+from nutrition.images import get_photo_executor, prepare_image_data
+from nutrition.jobs import aget_user_job, astream_job_status
+from nutrition.photo_cache import (
+    find_photo_match,
+    photo_cache_enabled,
+    photo_match_response,
+    remember_photo_analysis,
+)
+from nutrition.streaming import event_stream_response
+from nutrition.utils import transcribe_audio_content
+from users.utils import aget_user_memory
+
+
+def error_response(message, status_code):
+    return JsonResponse({"error": message}, status=status_code)
+
+
+def agent_error_response(error):
+    """Map a failed call to the ADK service to an error response."""
+    print(f"Agent request error: {error}")
+    if isinstance(error, httpx.TimeoutException):
+        return error_response("Agent call timed out", status.HTTP_504_GATEWAY_TIMEOUT)
+    return error_response("Agent unavailable", status.HTTP_502_BAD_GATEWAY)
+
+
+def request_data(request):
+    """Form fields or a JSON body, like DRF's request.data."""
+    if request.content_type == "application/json":
+        try:
+            return json.loads(request.body or b"{}")
+        except json.JSONDecodeError:
+            return {}
+    return request.POST
+
+
+async def authenticated_user(request):
+    user = await request.auser()
+    return user if user.is_authenticated else None
+
+
+async def run_agent_async(payload):
+    """Async version of run_agent. Raises AgentError on failure."""
+    agent_response = await get_async_agent_client().run(payload)
+    if agent_response.status_code != 200:
+        raise AgentError("Agent call failed")
+    return agent_response.json()[-1].get("content", {})
+
+
+@require_POST
+async def process_request_async(request):
+    # Reject anonymous requests before spending a Speech or image call on them
+    user = await authenticated_user(request)
+    if user is None:
+        return error_response("Authentication required", status.HTTP_401_UNAUTHORIZED)
+
+    data = request_data(request)
+    food_description = data.get("food_description")
+    image_data = None
+    photo_hash = None
+    has_text = bool(food_description) or "audio" in request.FILES
+
+    if not food_description and "audio" in request.FILES:
+        # The Speech client blocks, so run it off the event loop
+        food_description = await sync_to_async(
+            transcribe_audio_content, thread_sensitive=False
+        )(request.FILES["audio"])
+
+        if not food_description:
+            return error_response(
+                "Failed to transcribe audio", status.HTTP_400_BAD_REQUEST
+            )
+
+    # Handle photo uploads (can be combined with text)
+    if "photo" in request.FILES:
+        photo = request.FILES["photo"]
+        image_data, photo_hash = await asyncio.wrap_future(
+            get_photo_executor().submit(
+                prepare_image_data, photo.read(), photo.content_type, not has_text
+            )
+        )
+
+    if not food_description and not image_data:
+        return error_response(
+            "food_description, audio file, or photo required",
+            status.HTTP_400_BAD_REQUEST,
+        )
+
+    # Only bare photos are hashed, to be matched against (and remembered for)
+    # earlier photos
+    if photo_hash is not None and photo_cache_enabled(request):
+        match = await sync_to_async(find_photo_match)(user, photo_hash)
+        if match is not None:
+            return JsonResponse(photo_match_response(*match))
+
+    user_id = str(user.id)
+    session_id = str(uuid.uuid4())
+
+    # Store session_id in Django HTTP session for resubmit functionality
+    await request.session.aset("chat_session_id", session_id)
+    await request.session.aset("chat_food_description", food_description or "")
+
+    try:
+        session_response = await get_async_agent_client().create_session(
+            user_id, session_id
+        )
+    except httpx.HTTPError as e:
+        return agent_error_response(e)
+    if session_response.status_code not in [200, 201]:
+        return error_response(
+            "Failed to create session", status.HTTP_500_INTERNAL_SERVER_ERROR
+        )
+
+    # Get user memory for personalization
+    user_memory = await aget_user_memory(user, food_description)
+    personalization = {"memory": user_memory} if user_memory else None
+
+    payload = build_agent_payload(
+        user_id, session_id, food_description, image_data, personalization
+    )
+    try:
+        content = await run_agent_async(payload)
+    except httpx.HTTPError as e:
+        return agent_error_response(e)
+    except AgentError as e:
+        return error_response(str(e), status.HTTP_500_INTERNAL_SERVER_ERROR)
+
+    print("agent response", content)
+    response_content = await sync_to_async(process_agent_response)(content, user)
+    await sync_to_async(remember_photo_analysis)(user, photo_hash, content)
+
+    return JsonResponse(response_content)
+
+
+@require_POST
+async def resubmit_async(request):
+    session_id = await request.session.aget("chat_session_id")
+
+    if not session_id:
+        return error_response(
+            "No active chat session found. Please start a new conversation.",
+            status.HTTP_400_BAD_REQUEST,
+        )
+
+    user = await authenticated_user(request)
+    if user is None:
+        return error_response("Authentication required", status.HTTP_401_UNAUTHORIZED)
+
+    answers = request_data(request).get("answers", [])
+
+    if not answers:
+        return error_response(
+            "Answers are required for resubmission", status.HTTP_400_BAD_REQUEST
+        )
+
+    # Format answers as a message for the agent
+    answer_text = " ".join(
+        [f"Answer {i+1}: {answer}" for i, answer in enumerate(answers)]
+    )
+
+    # Rank memories against the original food description, not the bare answers
+    memory_query = await request.session.aget("chat_food_description") or " ".join(
+        map(str, answers)
+    )
+    user_memory = await aget_user_memory(user, memory_query)
+    personalization = {"memory": user_memory} if user_memory else None
+
+    payload = build_agent_payload(
+        str(user.id), session_id, answer_text, None, personalization
+    )
+    try:
+        content = await run_agent_async(payload)
+    except httpx.HTTPError as e:
+        return agent_error_response(e)
+    except AgentError as e:
+        return error_response(str(e), status.HTTP_500_INTERNAL_SERVER_ERROR)
+
+    def clear_session():
+        # The session was loaded by aget above, so this does not hit the database
+        request.session.pop("chat_session_id", None)
+        request.session.pop("chat_food_description", None)
+
+    response_content = await sync_to_async(process_agent_response)(
+        content, user, clear_session
+    )
+
+    return JsonResponse(response_content)
+
+
+@require_GET
+async def analysis_job_events_async(request, job_id):
+    """Server-sent events for a background analysis job until it finishes."""
+    user = await authenticated_user(request)
+    if user is None:
+        return error_response("Authentication required", status.HTTP_401_UNAUTHORIZED)
+
+    job = await aget_user_job(user, job_id)
+    if job is None:
+        return error_response("Job not found", status.HTTP_404_NOT_FOUND)
+
+    return event_stream_response(astream_job_status(job, request))
@@ -0,0 +1,143 @@
+"""
+Photo preprocessing before photos are inlined in the agent payload.
+
+Phone photos are often 4-12 MB; the model sees them at well under 1024px, so
+they are decoded, downscaled to PHOTO_MAX_DIMENSION and re-encoded as JPEG at
+PHOTO_JPEG_QUALITY. Sync views do this inline; the async views run it on a
+small bounded thread pool to keep the CPU heavy decode off the event loop.
+HEIC photos are decoded when pillow-heif is installed.
+
+While decoded, bare photos also get a 64-bit difference hash (dHash) used to
+recognise repeat photos of the same meal (see nutrition/photo_cache.py).
+"""
+
+import base64
+import io
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from PIL import Image, ImageOps
+
+try:
+    from pillow_heif import register_heif_opener
+except ImportError:
+    register_heif_opener = None
+
+if register_heif_opener is not None:
+    register_heif_opener()
+
+
+class PhotoStats:
+    def __init__(self):
+        self.photos = 0
+        self.bytes_in = 0
+        self.bytes_out = 0
+        self._lock = threading.Lock()
+
+    def record(self, bytes_in, bytes_out):
+        with self._lock:
+            self.photos += 1
+            self.bytes_in += bytes_in
+            self.bytes_out += bytes_out
+
+    def snapshot(self):
+        with self._lock:
+            return {
+                "photos": self.photos,
+                "bytes_in": self.bytes_in,
+                "bytes_out": self.bytes_out,
+                "bytes_saved": self.bytes_in - self.bytes_out,
+            }
+
+
+photo_stats = PhotoStats()
+
+_executor = None
+_executor_lock = threading.Lock()
+
+
+def get_photo_executor():
+    global _executor
+    if _executor is None:
+        with _executor_lock:
+            if _executor is None:
+                _executor = ThreadPoolExecutor(
+                    max_workers=settings.PHOTO_WORKERS, thread_name_prefix="photo"
+                )
+    return _executor
+
+
+def dhash(image, hash_size=8):
+    """
+    Difference hash: shrink to (hash_size + 1) x hash_size grayscale and set a
+    bit wherever a pixel is brighter than its right neighbour. Near-identical
+    photos differ in only a few bits.
+    """
+    small = image.convert("L").resize(
+        (hash_size + 1, hash_size), Image.Resampling.LANCZOS
+    )
+    pixels = list(small.getdata())
+    value = 0
+    for row in range(hash_size):
+        for col in range(hash_size):
+            offset = row * (hash_size + 1) + col
+            value = (value << 1) | (pixels[offset] > pixels[offset + 1])
+    return value
+
+
+def downscale_image(content, mime_type, with_hash=True):
+    """
+    Return (content, mime_type, dhash) for a copy of the image no larger than
+    PHOTO_MAX_DIMENSION, re-encoded as JPEG. The original is returned (with a
+    None hash if it cannot be decoded) when re-encoding would not help. The
+    hash is None as well unless `with_hash`.
+    """
+    max_dimension = settings.PHOTO_MAX_DIMENSION
+    try:
+        with Image.open(io.BytesIO(content)) as image:
+            # Let the JPEG decoder skip detail we are about to throw away
+            image.draft("RGB", (max_dimension, max_dimension))
+            image = ImageOps.exif_transpose(image)
+            image.thumbnail((max_dimension, max_dimension), Image.Resampling.LANCZOS)
+            photo_hash = dhash(image) if with_hash else None
+            if image.mode != "RGB":
+                image = image.convert("RGB")
+
+            output = io.BytesIO()
+            image.save(
+                output, format="JPEG", quality=settings.PHOTO_JPEG_QUALITY, optimize=True
+            )
+    except Exception as e:
+        print(f"Photo preprocessing error: {e}")
+        return content, mime_type, None
+
+    if output.tell() >= len(content):
+        return content, mime_type, photo_hash
+    return output.getvalue(), "image/jpeg", photo_hash
+
+
+def prepare_image_data(content, mime_type, with_hash=True):
+    """
+    Downscale a photo and build the inline image dict for the agent payload.
+    Photos sent with text or audio are never matched, so skip their hash.
+
+    Returns:
+        tuple: (image data dict, dHash of the photo or None)
+    """
+    processed, mime_type, photo_hash = downscale_image(content, mime_type, with_hash)
+    photo_stats.record(len(content), len(processed))
+    print(
+        f"Photo preprocessed: {len(content)} -> {len(processed)} bytes "
+        f"({len(content) - len(processed)} saved)"
+    )
+    image_data = {
+        "mimeType": mime_type,
+        "data": base64.b64encode(processed).decode("utf-8"),
+    }
+    return image_data, photo_hash
+
+
+def image_data_from_upload(photo, with_hash=True):
+    """Read an uploaded photo and preprocess it; see prepare_image_data."""
+    return prepare_image_data(photo.read(), photo.content_type, with_hash)
@@ -0,0 +1,315 @@
+"""
+Background analysis jobs for /api/process.
+
+Jobs are rows in AnalysisJob, so the database is the queue and no broker is
+needed. Web processes drain it with a small thread pool right after a job is
+queued (ANALYSIS_RUN_IN_PROCESS), and a poller wakes them every
+ANALYSIS_QUEUE_POLL_SECONDS for jobs nobody woke them for; a dedicated
+`manage.py run_analysis_worker` process can take over instead. Workers claim jobs with SELECT ... FOR UPDATE
+SKIP LOCKED, so any number of them can share the queue.
+"""
+
+import asyncio
+import base64
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+
+import requests
+from django.conf import settings
+from django.db import close_old_connections, transaction
+from django.db.models import Q
+from django.urls import reverse
+from django.utils import timezone
+
+from nutrition.agent import (
+    AgentError,
+    prepare_agent_run,
+    process_agent_response,
+    run_agent,
+)
+from nutrition.photo_cache import remember_photo_analysis
+from nutrition.streaming import sse_event
+from nutrition.utils import transcribe_audio_content
+from nutrition_tracker.models import AnalysisJob
+
+
+def wants_background_job(request):
+    """True when the client asked for 202 + job id instead of waiting."""
+    if request.query_params.get("async") in ("1", "true"):
+        return True
+    return "respond-async" in request.META.get("HTTP_PREFER", "")
+
+
+def submit_analysis_job(
+    user, session_id, food_description, audio_content, image_data, photo_hash=None
+):
+    """Persist a job and wake a worker once it is committed."""
+    job_input = {"food_description": food_description or ""}
+    if audio_content is not None:
+        job_input["audio"] = base64.b64encode(audio_content).decode("utf-8")
+    if image_data:
+        job_input["image_data"] = image_data
+    if photo_hash is not None:
+        job_input["photo_hash"] = photo_hash
+
+    job = AnalysisJob.objects.create(user=user, session_id=session_id, input=job_input)
+    if settings.ANALYSIS_RUN_IN_PROCESS:
+        transaction.on_commit(wake_workers)
+    return job
+
+
+def get_user_job(user, job_id):
+    return AnalysisJob.objects.filter(user=user, id=job_id).first()
+
+
+async def aget_user_job(user, job_id):
+    """Async version of get_user_job"""
+    return await AnalysisJob.objects.filter(user=user, id=job_id).afirst()
+
+
+def job_status(job, request=None):
+    status_url = reverse("analysis_job", args=[job.id])
+    events_url = reverse("analysis_job_events", args=[job.id])
+    if request is not None:
+        status_url = request.build_absolute_uri(status_url)
+        events_url = request.build_absolute_uri(events_url)
+    return {
+        "job_id": str(job.id),
+        "status": job.status,
+        "status_url": status_url,
+        "events_url": events_url,
+        "result": job.result,
+        "error": job.error or None,
+        "created_at": job.created_at,
+        "started_at": job.started_at,
+        "finished_at": job.finished_at,
+    }
+
+
+async def astream_job_status(job, request):
+    """
+    Server-sent `status` events whenever the job changes, until it finishes.
+    Served by async_views, so a subscriber waiting on a job holds no worker
+    thread.
+    """
+    deadline = time.monotonic() + settings.ANALYSIS_STREAM_TIMEOUT
+    last_status = None
+    while True:
+        if job.status != last_status:
+            last_status = job.status
+            yield sse_event("status", job_status(job, request))
+        if job.is_finished:
+            return
+        if time.monotonic() > deadline:
+            yield sse_event("timeout", {"job_id": str(job.id)})
+            return
+        await asyncio.sleep(settings.ANALYSIS_POLL_INTERVAL)
+        await job.arefresh_from_db()
+
+
+def runnable_jobs(stale_before):
+    return AnalysisJob.objects.filter(
+        Q(status=AnalysisJob.QUEUED)
+        | Q(status=AnalysisJob.RUNNING, started_at__lt=stale_before),
+        attempts__lt=settings.ANALYSIS_MAX_ATTEMPTS,
+    )
+
+
+def stale_before():
+    return timezone.now() - timedelta(seconds=settings.ANALYSIS_JOB_STALE_SECONDS)
+
+
+def claim_next_job():
+    """
+    Mark the oldest runnable job as running and return it, or None.
+
+    Running jobs whose worker has not finished them within
+    ANALYSIS_JOB_STALE_SECONDS are assumed lost and picked up again, up to
+    ANALYSIS_MAX_ATTEMPTS; past that they are marked failed.
+    """
+    cutoff = stale_before()
+    with transaction.atomic():
+        exhausted = AnalysisJob.objects.filter(
+            status=AnalysisJob.RUNNING,
+            started_at__lt=cutoff,
+            attempts__gte=settings.ANALYSIS_MAX_ATTEMPTS,
+        ).update(
+            status=AnalysisJob.FAILED,
+            error=f"Analysis did not finish after {settings.ANALYSIS_MAX_ATTEMPTS} attempts",
+            finished_at=timezone.now(),
+        )
+        if exhausted:
+            print(f"Marked {exhausted} stale analysis jobs as failed")
+
+        job = (
+            runnable_jobs(cutoff)
+            .select_for_update(skip_locked=True)
+            .order_by("created_at")
+            .first()
+        )
+        if job is None:
+            return None
+        job.status = AnalysisJob.RUNNING
+        job.started_at = timezone.now()
+        job.attempts += 1
+        job.save(update_fields=["status", "started_at", "attempts"])
+    return job
+
+
+def run_job(job):
+    """Run one claimed job to completion and record its result or error."""
+    print(f"Running analysis job {job.id} (attempt {job.attempts})")
+    try:
+        job.result = analyze(job)
+        job.status = AnalysisJob.SUCCEEDED
+    except requests.Timeout as e:
+        print(f"Agent request error: {e}")
+        job.status, job.error = AnalysisJob.FAILED, "Agent call timed out"
+    except requests.RequestException as e:
+        print(f"Agent request error: {e}")
+        job.status, job.error = AnalysisJob.FAILED, "Agent unavailable"
+    except AgentError as e:
+        job.status, job.error = AnalysisJob.FAILED, str(e)
+    except Exception as e:
+        print(f"Analysis job {job.id} failed: {e}")
+        job.status, job.error = AnalysisJob.FAILED, "Analysis failed"
+
+    update_fields = ["status", "error", "finished_at"]
+    if job.status == AnalysisJob.SUCCEEDED:
+        update_fields.append("result")
+    else:
+        # The result is saved with the foods, so a failure after that point
+        # (e.g. remembering the photo) still recorded the meal; report it
+        # instead of inviting a retry that would save the foods again
+        saved_result = (
+            AnalysisJob.objects.filter(id=job.id).values_list("result", flat=True).first()
+        )
+        if saved_result is not None:
+            job.result, job.status, job.error = saved_result, AnalysisJob.SUCCEEDED, ""
+    job.finished_at = timezone.now()
+    job.save(update_fields=update_fields)
+
+
+def analyze(job):
+    """
+    The /api/process pipeline for a job's stored input. The result is saved in
+    the same transaction as the foods, so a job's foods are saved at most once.
+    """
+    if job.result is not None:
+        print(f"Analysis job {job.id} already has a result")
+        return job.result
+    food_description = job.input.get("food_description")
+    if not food_description and job.input.get("audio"):
+        food_description = transcribe_audio_content(base64.b64decode(job.input["audio"]))
+        if not food_description:
+            raise AgentError("Failed to transcribe audio")
+
+    payload = prepare_agent_run(
+        job.user, job.session_id, food_description, job.input.get("image_data")
+    )
+    content = run_agent(payload)
+    print("agent response", content)
+    with transaction.atomic():
+        # A job re-claimed as stale may still finish on its first worker too;
+        # whichever saves a result first is the only one to insert foods
+        saved = AnalysisJob.objects.select_for_update().get(id=job.id)
+        if saved.result is not None:
+            print(f"Analysis job {job.id} already has a result, not saving its foods again")
+            return saved.result
+        response_content = process_agent_response(content, job.user)
+        AnalysisJob.objects.filter(id=job.id).update(result=response_content)
+    remember_photo_analysis(job.user, job.input.get("photo_hash"), content)
+    return response_content
+
+
+def drain_queue():
+    """Run jobs until none are left to claim."""
+    try:
+        while True:
+            close_old_connections()
+            job = claim_next_job()
+            if job is None:
+                return
+            run_job(job)
+    finally:
+        close_old_connections()
+
+
+_executor = None
+_active_drainers = 0
+_executor_lock = threading.Lock()
+_poller = None
+
+
+def wake_workers():
+    """
+    Start a drainer on the in-process pool unless all ANALYSIS_WORKERS are
+    already busy; busy drainers pick new jobs up before they exit.
+    """
+    global _executor, _active_drainers
+    start_queue_poller()
+    with _executor_lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(
+                max_workers=settings.ANALYSIS_WORKERS,
+                thread_name_prefix="analysis",
+            )
+        if _active_drainers >= settings.ANALYSIS_WORKERS:
+            return
+        _active_drainers += 1
+    _executor.submit(_run_drainer)
+
+
+def _run_drainer():
+    global _active_drainers
+    while True:
+        try:
+            drain_queue()
+        except Exception as e:
+            print(f"Analysis worker error: {e}")
+        # Re-check under the lock wake_workers uses: a job committed after
+        # drain_queue found the queue empty either shows up here or its
+        # wake_workers call sees this drainer gone and starts another
+        with _executor_lock:
+            try:
+                pending = runnable_jobs(stale_before()).exists()
+            except Exception as e:
+                print(f"Analysis worker error: {e}")
+                pending = False
+            finally:
+                close_old_connections()
+            if not pending:
+                _active_drainers -= 1
+                return
+
+
+def start_queue_poller():
+    """
+    Wake the in-process workers every ANALYSIS_QUEUE_POLL_SECONDS, so jobs left
+    from a restart or ready to retry after going stale don't wait for the next
+    submit. Called from the WSGI/ASGI entry points and on every wake.
+    """
+    global _poller
+    if not settings.ANALYSIS_RUN_IN_PROCESS:
+        return
+    with _executor_lock:
+        if _poller is not None:
+            return
+        _poller = threading.Thread(
+            target=_poll_queue, name="analysis-poller", daemon=True
+        )
+    _poller.start()
+
+
+def _poll_queue():
+    while True:
+        time.sleep(settings.ANALYSIS_QUEUE_POLL_SECONDS)
+        try:
+            if runnable_jobs(stale_before()).exists():
+                wake_workers()
+        except Exception as e:
+            print(f"Analysis poller error: {e}")
+        finally:
+            close_old_connections()
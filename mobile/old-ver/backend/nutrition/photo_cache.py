@@ -0,0 +1,152 @@
+"""
+Reuse of earlier analyses for repeat meal photos.
+
+A photo-only request whose dHash is within PHOTO_MATCH_MAX_DISTANCE bits of a
+photo the user logged before skips the agent: the earlier foods are returned
+for the user to confirm (POST /api/photo-matches/<id>/confirm/) instead of
+being saved. With PHOTO_CACHE_GLOBAL, other users' photos are also searched,
+within the stricter PHOTO_GLOBAL_MATCH_MAX_DISTANCE; a match there is copied
+into the user's own analyses, so users only ever confirm their own.
+"""
+
+from django.conf import settings
+from django.db.models import F, Q
+from django.utils import timezone
+
+from foods.serializers import FoodSerializer
+from nutrition.agent import bulk_create_foods, parse_agent_content
+from nutrition_tracker.models import PhotoAnalysis
+
+BAND_BITS = 16
+BAND_COUNT = 4
+# Set per request, so not part of what a photo says about the meal
+REQUEST_FIELDS = ("id", "eaten_at")
+MAX_CANDIDATES = 50
+
+
+def hash_bands(photo_hash):
+    mask = (1 << BAND_BITS) - 1
+    return [(photo_hash >> (BAND_BITS * i)) & mask for i in range(BAND_COUNT)]
+
+
+def to_signed(photo_hash):
+    """Fit an unsigned 64-bit hash into a BigIntegerField."""
+    return photo_hash - (1 << 64) if photo_hash >= 1 << 63 else photo_hash
+
+
+def to_unsigned(value):
+    return value + (1 << 64) if value < 0 else value
+
+
+def hamming_distance(a, b):
+    return (a ^ b).bit_count()
+
+
+def photo_cache_enabled(request):
+    """The cache can be bypassed per request with ?photo_cache=0, e.g. after a rejected match."""
+    if not settings.PHOTO_CACHE_ENABLED:
+        return False
+    return request.GET.get("photo_cache") not in ("0", "false")
+
+
+def closest_analysis(queryset, photo_hash, max_distance):
+    bands = hash_bands(photo_hash)
+    band_filter = Q()
+    for i, band in enumerate(bands):
+        band_filter |= Q(**{f"band_{i}": band})
+
+    best = None
+    for analysis in queryset.filter(band_filter).order_by("-updated_at")[:MAX_CANDIDATES]:
+        distance = hamming_distance(photo_hash, to_unsigned(analysis.photo_hash))
+        if distance <= max_distance and (best is None or distance < best[1]):
+            best = (analysis, distance)
+    return best
+
+
+def find_photo_match(user, photo_hash):
+    """Return (PhotoAnalysis, Hamming distance) for the closest earlier photo, or None."""
+    match = closest_analysis(
+        PhotoAnalysis.objects.filter(user=user),
+        photo_hash,
+        settings.PHOTO_MATCH_MAX_DISTANCE,
+    )
+    if match is None and settings.PHOTO_CACHE_GLOBAL:
+        match = closest_analysis(
+            PhotoAnalysis.objects.exclude(user=user),
+            photo_hash,
+            settings.PHOTO_GLOBAL_MATCH_MAX_DISTANCE,
+        )
+        if match is not None:
+            analysis, distance = match
+            print(f"Copying analysis {analysis.id} from another user's photo")
+            match = (save_photo_analysis(user, photo_hash, analysis.foods), distance)
+    if match is not None:
+        print(f"Photo cache hit: analysis {match[0].id} at distance {match[1]}")
+    return match
+
+
+def get_confirmable_analysis(user, analysis_id):
+    return PhotoAnalysis.objects.filter(user=user, id=analysis_id).first()
+
+
+def photo_match_response(analysis, distance):
+    """Offer the earlier foods for confirmation in place of an agent response."""
+    return {
+        "request_type": "new",
+        "requires_confirmation": True,
+        "photo_match": {
+            "id": analysis.id,
+            "distance": distance,
+            "times_reused": analysis.times_reused,
+        },
+        "foods": analysis.foods,
+    }
+
+
+def remember_photo_analysis(user, photo_hash, content):
+    """Index the foods the agent found for a photo; no-op for questions or no foods."""
+    if photo_hash is None:
+        return
+    questions, foods, _ = parse_agent_content(content)
+    if questions or not foods:
+        return
+
+    foods = [
+        {k: v for k, v in food.items() if k not in REQUEST_FIELDS} for food in foods
+    ]
+    save_photo_analysis(user, photo_hash, foods)
+
+
+def save_photo_analysis(user, photo_hash, foods):
+    bands = hash_bands(photo_hash)
+    analysis, _ = PhotoAnalysis.objects.update_or_create(
+        user=user,
+        photo_hash=to_signed(photo_hash),
+        defaults={
+            "foods": foods,
+            **{f"band_{i}": band for i, band in enumerate(bands)},
+        },
+    )
+    return analysis
+
+
+def confirm_photo_match(user, analysis, eaten_at=None, meal_type=None):
+    """Save an earlier photo's foods for this user, as process_agent_response would."""
+    eaten_at = eaten_at or timezone.now().isoformat()
+    foods = [
+        {**food, "eaten_at": eaten_at, "meal_type": meal_type or food.get("meal_type")}
+        for food in analysis.foods
+    ]
+    created_foods, invalid_foods = bulk_create_foods(foods, user)
+    PhotoAnalysis.objects.filter(id=analysis.id).update(
+        times_reused=F("times_reused") + 1
+    )
+
+    response_content = {
+        "request_type": "new",
+        "response": FoodSerializer(created_foods, many=True).data,
+    }
+    if invalid_foods:
+        print(f"Skipped {len(invalid_foods)} invalid foods: {invalid_foods}")
+        response_content["invalid_foods"] = invalid_foods
+    return response_content
@@ -0,0 +1,122 @@
+import json
+
+import requests
+from django.http import StreamingHttpResponse
+from rest_framework.renderers import BaseRenderer
+
+from nutrition.agent import process_agent_response
+from nutrition.agent_client import get_agent_client
+from nutrition.photo_cache import remember_photo_analysis
+from nutrition.utils import strip_code_blocks
+
+SEARCH_RESULT_PREFIX = "search_result_"
+
+
+class EventStreamRenderer(BaseRenderer):
+    """
+    Lets DRF views accept `Accept: text/event-stream`. Streaming responses
+    bypass rendering, so this only ever renders error bodies.
+    """
+
+    media_type = "text/event-stream"
+    format = "sse"
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        return sse_event("error", data)
+
+
+def wants_event_stream(request):
+    """True when the client asked for server-sent events."""
+    if request.query_params.get("stream") in ("1", "true"):
+        return True
+    return "text/event-stream" in request.META.get("HTTP_ACCEPT", "")
+
+
+def sse_event(name, data):
+    return f"event: {name}\ndata: {json.dumps(data, default=str)}\n\n".encode("utf-8")
+
+
+def event_stream_response(events):
+    """Stream an iterable of sse_event() chunks to the client unbuffered."""
+    response = StreamingHttpResponse(events, content_type="text/event-stream")
+    response["Cache-Control"] = "no-cache"
+    response["X-Accel-Buffering"] = "no"
+    return response
+
+
+def parse_state_value(value):
+    """Agent outputs land in state as dicts or as (possibly fenced) JSON strings."""
+    if isinstance(value, str):
+        try:
+            return json.loads(strip_code_blocks(value.strip()))
+        except json.JSONDecodeError:
+            return value
+    return value
+
+
+def progress_events(adk_event):
+    """Translate the state changes of one ADK event into client events."""
+    actions = adk_event.get("actions") or {}
+    state_delta = actions.get("stateDelta") or actions.get("state_delta") or {}
+    for key, value in state_delta.items():
+        if key == "intent":
+            yield sse_event("intent", parse_state_value(value))
+        elif key == "parsed_foods":
+            yield sse_event("parsed_foods", parse_state_value(value))
+        elif key.startswith(SEARCH_RESULT_PREFIX):
+            yield sse_event(
+                "search_result",
+                {
+                    "food": key[len(SEARCH_RESULT_PREFIX):],
+                    "results": parse_state_value(value),
+                },
+            )
+
+
+def read_adk_events(response):
+    """Yield ADK events from a /run_sse response as they arrive."""
+    for line in response.iter_lines(decode_unicode=True):
+        if not line or not line.startswith("data:"):
+            continue
+        yield json.loads(line[len("data:"):].strip())
+
+
+def stream_agent_run(payload, user, photo_hash=None):
+    """
+    Run the agent through ADK's /run_sse and relay its progress as server-sent
+    events: intent, parsed_foods, one search_result per food, then `final`
+    with the same body /api/process returns, once the foods are saved.
+    `photo_hash` indexes the result for repeat photos (see photo_cache).
+    """
+    content = None
+    try:
+        response = get_agent_client().run_sse(payload)
+        with response:
+            if response.status_code != 200:
+                yield sse_event("error", {"error": "Agent call failed"})
+                return
+            for adk_event in read_adk_events(response):
+                if "error" in adk_event:
+                    print(f"Agent stream error: {adk_event['error']}")
+                    yield sse_event("error", {"error": "Agent call failed"})
+                    return
+                yield from progress_events(adk_event)
+                if adk_event.get("content"):
+                    content = adk_event["content"]
+    except requests.Timeout as e:
+        print(f"Agent request error: {e}")
+        yield sse_event("error", {"error": "Agent call timed out"})
+        return
+    except requests.RequestException as e:
+        print(f"Agent request error: {e}")
+        yield sse_event("error", {"error": "Agent unavailable"})
+        return
+
+    if content is None:
+        yield sse_event("error", {"error": "Agent returned no response"})
+        return
+
+    print("agent response", content)
+    response_content = process_agent_response(content, user)
+    remember_photo_analysis(user, photo_hash, content)
+    yield sse_event("final", response_content)
@@ -1,3 +1,398 @@
-from django.test import TestCase
+import asyncio
+import json
+from datetime import datetime, timedelta
+from types import SimpleNamespace
+from unittest.mock import patch
 
-# Create your tests here.
+from django.contrib.auth.models import User
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.test import TestCase, override_settings
+from django.utils import timezone
+
+from foods.models import Food
+from nutrition.agent import AgentError, parse_agent_content, process_agent_response
+from nutrition.async_views import run_agent_async
+from nutrition.jobs import analyze, claim_next_job, run_job
+from nutrition.photo_cache import (
+    find_photo_match,
+    get_confirmable_analysis,
+    remember_photo_analysis,
+)
+from nutrition.transcription import transcribe_bytes, transcribe_upload
+from nutrition_tracker.models import AnalysisJob, PhotoAnalysis
+
+
+def agent_content(payload):
+    """An ADK final event's content carrying the merger's JSON output."""
+    return {"role": "model", "parts": [{"text": json.dumps(payload)}]}
+
+
+def search_result(**fields):
+    result = {
+        "id": None,
+        "name": "apple",
+        "eaten_at": "2025-09-28T12:00:00",
+        "meal_type": "Lunch",
+        "serving_size": 1,
+        "calories": 95.0,
+        "protein_g": 0.5,
+        "carbs_g": 25.0,
+        "trans_fat_g": 0.0,
+        "saturated_fat_g": 0.0,
+        "unsaturated_fat_g": 0.0,
+        "others": {},
+    }
+    result.update(fields)
+    return result
+
+
+class ProcessAgentResponseTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username="eater", password="pw")
+        self.food = Food.objects.create(
+            user=self.user,
+            name="apple",
+            serving_size=1,
+            calories=95,
+            protein=0.5,
+            carbohydrates=25,
+            eaten_at=timezone.make_aware(datetime(2025, 9, 28, 12, 0)),
+            meal_type="Lunch",
+        )
+
+    def test_request_type_is_read_from_payload(self):
+        content = agent_content({"foods": [search_result()], "request_type": "update"})
+        questions, foods, request_type = parse_agent_content(content)
+        self.assertEqual(questions, [])
+        self.assertEqual(len(foods), 1)
+        self.assertEqual(request_type, "update")
+
+    def test_update_modifies_rows_without_inserting(self):
+        content = agent_content(
+            {
+                "foods": [search_result(id=self.food.id, name="green apple", calories=80.0)],
+                "request_type": "update",
+            }
+        )
+
+        process_agent_response(content, self.user)
+
+        self.assertEqual(Food.objects.filter(user=self.user).count(), 1)
+        self.food.refresh_from_db()
+        self.assertEqual(self.food.name, "green apple")
+        self.assertEqual(float(self.food.calories), 80.0)
+
+    def test_new_request_inserts_rows(self):
+        content = agent_content(
+            {"foods": [search_result(name="banana", calories=105.0)], "request_type": "new"}
+        )
+
+        process_agent_response(content, self.user)
+
+        self.assertEqual(Food.objects.filter(user=self.user).count(), 2)
+
+
+@override_settings(ANALYSIS_MAX_ATTEMPTS=2, ANALYSIS_JOB_STALE_SECONDS=60)
+class AnalysisJobTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username="eater", password="pw")
+
+    def make_job(self, **fields):
+        return AnalysisJob.objects.create(
+            user=self.user,
+            session_id="session",
+            input={"food_description": "a banana"},
+            **fields,
+        )
+
+    def test_claim_fails_stale_jobs_out_of_attempts(self):
+        long_ago = timezone.now() - timedelta(minutes=5)
+        exhausted = self.make_job(
+            status=AnalysisJob.RUNNING, started_at=long_ago, attempts=2
+        )
+        retried = self.make_job(
+            status=AnalysisJob.RUNNING, started_at=long_ago, attempts=1
+        )
+
+        self.assertEqual(claim_next_job().id, retried.id)
+
+        exhausted.refresh_from_db()
+        self.assertEqual(exhausted.status, AnalysisJob.FAILED)
+        self.assertTrue(exhausted.error)
+        self.assertIsNotNone(exhausted.finished_at)
+        self.assertIsNone(claim_next_job())
+
+    @patch("nutrition.jobs.prepare_agent_run", return_value={})
+    @patch("nutrition.jobs.run_agent")
+    def test_reclaimed_job_saves_foods_once(self, run_agent, prepare_agent_run):
+        run_agent.return_value = agent_content(
+            {"foods": [search_result(name="banana")], "request_type": "new"}
+        )
+        job = self.make_job(status=AnalysisJob.RUNNING, attempts=1)
+        # The stale first attempt and its re-claim both finish
+        first = analyze(job)
+        second = analyze(AnalysisJob.objects.get(id=job.id))
+
+        self.assertEqual(Food.objects.filter(user=self.user).count(), 1)
+        self.assertEqual(first, second)
+
+    @patch("nutrition.jobs.remember_photo_analysis", side_effect=RuntimeError("disk full"))
+    @patch("nutrition.jobs.prepare_agent_run", return_value={})
+    @patch("nutrition.jobs.run_agent")
+    def test_failure_after_saving_foods_keeps_result(
+        self, run_agent, prepare_agent_run, remember_photo_analysis
+    ):
+        run_agent.return_value = agent_content(
+            {"foods": [search_result(name="banana")], "request_type": "new"}
+        )
+        job = self.make_job(status=AnalysisJob.RUNNING, attempts=1)
+
+        run_job(job)
+
+        job.refresh_from_db()
+        self.assertEqual(job.status, AnalysisJob.SUCCEEDED)
+        self.assertIsNotNone(job.result)
+        self.assertEqual(Food.objects.filter(user=self.user).count(), 1)
+
+    @patch("nutrition.jobs.prepare_agent_run", return_value={})
+    @patch("nutrition.jobs.run_agent", side_effect=AgentError("Agent call failed"))
+    def test_failure_before_saving_foods_fails_job(self, run_agent, prepare_agent_run):
+        job = self.make_job(status=AnalysisJob.RUNNING, attempts=1)
+
+        run_job(job)
+
+        job.refresh_from_db()
+        self.assertEqual(job.status, AnalysisJob.FAILED)
+        self.assertEqual(job.error, "Agent call failed")
+        self.assertIsNone(job.result)
+
+
+class AsyncProcessTests(TestCase):
+    @patch("nutrition.async_views.transcribe_audio_content")
+    def test_anonymous_audio_is_not_transcribed(self, transcribe_audio_content):
+        audio = SimpleUploadedFile("meal.webm", b"audio", content_type="audio/webm")
+
+        response = self.client.post("/api/async/process/", {"audio": audio})
+
+        self.assertEqual(response.status_code, 401)
+        transcribe_audio_content.assert_not_called()
+
+    @patch("nutrition.async_views.get_async_agent_client")
+    def test_failed_agent_call_raises(self, get_async_agent_client):
+        async def run(payload):
+            return type("Response", (), {"status_code": 500})()
+
+        get_async_agent_client.return_value.run = run
+        with self.assertRaises(AgentError):
+            asyncio.run(run_agent_async({}))
+
+
+@override_settings(PHOTO_CACHE_GLOBAL=True, PHOTO_GLOBAL_MATCH_MAX_DISTANCE=1)
+class GlobalPhotoCacheTests(TestCase):
+    def setUp(self):
+        self.owner = User.objects.create_user(username="owner", password="pw")
+        self.other = User.objects.create_user(username="other", password="pw")
+        remember_photo_analysis(
+            self.owner, 0b1011, agent_content({"foods": [search_result()]})
+        )
+        self.original = PhotoAnalysis.objects.get(user=self.owner)
+
+    def test_global_match_is_copied_to_the_requesting_user(self):
+        analysis, distance = find_photo_match(self.other, 0b1010)
+
+        self.assertEqual(distance, 1)
+        self.assertEqual(analysis.user, self.other)
+        self.assertNotEqual(analysis.id, self.original.id)
+        self.assertEqual(analysis.foods, self.original.foods)
+        self.assertEqual(get_confirmable_analysis(self.other, analysis.id), analysis)
+
+    def test_other_users_analysis_cannot_be_confirmed(self):
+        self.assertIsNone(get_confirmable_analysis(self.other, self.original.id))
+
+
+class AgentMetricsTests(TestCase):
+    def test_metrics_require_staff(self):
+        self.assertEqual(self.client.get("/api/agent-metrics/").status_code, 403)
+
+        user = User.objects.create_user(username="eater", password="pw")
+        self.client.force_login(user)
+        self.assertEqual(self.client.get("/api/agent-metrics/").status_code, 403)
+
+        user.is_staff = True
+        user.save()
+        self.assertEqual(self.client.get("/api/agent-metrics/").status_code, 200)
+
+
+class AnalysisJobEventsTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username="eater", password="pw")
+        self.job = AnalysisJob.objects.create(
+            user=self.user,
+            session_id="session",
+            input={"food_description": "a banana"},
+            status=AnalysisJob.SUCCEEDED,
+            result={"request_type": "new", "response": []},
+        )
+
+    def test_sync_endpoint_redirects_streams_to_async_events(self):
+        self.client.force_login(self.user)
+
+        response = self.client.get(f"/api/jobs/{self.job.id}/?stream=1")
+
+        self.assertEqual(response.status_code, 302)
+        self.assertEqual(response["Location"], f"/api/async/jobs/{self.job.id}/events/")
+
+    async def test_events_stream_until_finished(self):
+        await self.async_client.aforce_login(self.user)
+
+        response = await self.async_client.get(f"/api/async/jobs/{self.job.id}/events/")
+        chunks = [chunk async for chunk in response.streaming_content]
+
+        self.assertEqual(response["Content-Type"], "text/event-stream")
+        self.assertEqual(len(chunks), 1)
+        self.assertTrue(chunks[0].startswith(b"event: status"))
+        self.assertIn(b'"status": "succeeded"', chunks[0])
+
+
+class ProcessRequestPhotoTests(TestCase):
+    def photo(self):
+        return SimpleUploadedFile("meal.jpg", b"jpeg", content_type="image/jpeg")
+
+    @patch("nutrition.views.image_data_from_upload")
+    def test_anonymous_photo_is_not_decoded(self, image_data_from_upload):
+        response = self.client.post("/api/process/", {"photo": self.photo()})
+
+        self.assertEqual(response.status_code, 401)
+        image_data_from_upload.assert_not_called()
+
+    @patch("nutrition.views.prepare_agent_run", side_effect=AgentError("stop"))
+    @patch("nutrition.views.image_data_from_upload", return_value=({}, None))
+    def test_photo_with_text_is_not_hashed(self, image_data_from_upload, prepare_agent_run):
+        self.client.force_login(User.objects.create_user(username="eater", password="pw"))
+
+        self.client.post(
+            "/api/process/", {"photo": self.photo(), "food_description": "my pasta"}
+        )
+
+        self.assertFalse(image_data_from_upload.call_args.kwargs["with_hash"])
+
+
+
+QUESTIONS_CONTENT = agent_content({"questions": [{"question": "What kind of pasta?"}]})
+
+
+@patch("nutrition.views.run_agent", return_value=QUESTIONS_CONTENT)
+@patch("nutrition.views.get_user_memory", return_value=[])
+class ResubmitMemoryTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username="eater", password="pw")
+        self.client.force_login(self.user)
+
+    def start(self, data):
+        with patch("nutrition.views.prepare_agent_run", return_value={}):
+            self.client.post("/api/process/", data)
+
+    def resubmit(self):
+        return self.client.post(
+            "/api/resubmit/",
+            {"answers": ["penne", "a large bowl"]},
+            content_type="application/json",
+        )
+
+    def test_memory_ranked_against_original_description(self, get_user_memory, run_agent):
+        self.start({"food_description": "pasta with pesto for lunch"})
+
+        response = self.resubmit()
+
+        self.assertEqual(response.status_code, 200)
+        get_user_memory.assert_called_once_with(self.user, "pasta with pesto for lunch")
+        # The agent still gets the numbered answers
+        message = run_agent.call_args.args[0]["new_message"]["parts"][0]["text"]
+        self.assertEqual(message, "Answer 1: penne Answer 2: a large bowl")
+
+    @patch(
+        "nutrition.views.image_data_from_upload",
+        return_value=({"mimeType": "image/jpeg", "data": ""}, None),
+    )
+    def test_photo_only_falls_back_to_answers(
+        self, image_data_from_upload, get_user_memory, run_agent
+    ):
+        photo = SimpleUploadedFile("meal.jpg", b"jpeg", content_type="image/jpeg")
+        self.start({"photo": photo})
+
+        self.resubmit()
+
+        get_user_memory.assert_called_once_with(self.user, "penne a large bowl")
+
+    async def test_async_resubmit_uses_original_description(
+        self, get_user_memory, run_agent
+    ):
+        await self.async_client.aforce_login(self.user)
+        session = await self.async_client.asession()
+        await session.aset("chat_session_id", "session-1")
+        await session.aset("chat_food_description", "pasta with pesto")
+        await session.asave()
+
+        with patch(
+            "nutrition.async_views.aget_user_memory", return_value=[]
+        ) as aget_user_memory, patch(
+            "nutrition.async_views.run_agent_async", return_value=QUESTIONS_CONTENT
+        ):
+            await self.async_client.post(
+                "/api/async/resubmit/",
+                {"answers": ["penne"]},
+                content_type="application/json",
+            )
+
+        aget_user_memory.assert_called_once_with(self.user, "pasta with pesto")
+
+
+@override_settings(TRANSCRIPTION_LONG_RUNNING_BYTES=16)
+@patch("nutrition.transcription.get_storage_client")
+@patch("nutrition.transcription.get_speech_client")
+class LongRunningTranscriptionTests(TestCase):
+    def recognized(self, speech_client, transcript):
+        operation = speech_client.return_value.long_running_recognize.return_value
+        operation.result.return_value = SimpleNamespace(
+            results=[SimpleNamespace(alternatives=[SimpleNamespace(transcript=transcript)])]
+        )
+
+    @override_settings(TRANSCRIPTION_GCS_BUCKET="voice-notes")
+    def test_upload_streamed_to_bucket(self, speech_client, storage_client):
+        self.recognized(speech_client, "two eggs and toast")
+        upload = SimpleUploadedFile("note.m4a", b"x" * 64, content_type="audio/mp4")
+        blob = storage_client.return_value.bucket.return_value.blob.return_value
+        blob.name = "transcriptions/note"
+
+        self.assertEqual(transcribe_upload(upload), "two eggs and toast")
+
+        storage_client.return_value.bucket.assert_called_once_with("voice-notes")
+        # The upload object is handed over as is, so it is read in chunks
+        blob.upload_from_file.assert_called_once_with(upload, content_type="audio/mp4")
+        audio = speech_client.return_value.long_running_recognize.call_args.kwargs["audio"]
+        self.assertEqual(audio.uri, "gs://voice-notes/transcriptions/note")
+        self.assertEqual(audio.content, b"")
+        blob.delete.assert_called_once()
+
+    @override_settings(TRANSCRIPTION_GCS_BUCKET="voice-notes")
+    def test_staged_audio_deleted_when_recognition_fails(
+        self, speech_client, storage_client
+    ):
+        operation = speech_client.return_value.long_running_recognize.return_value
+        operation.result.side_effect = TimeoutError
+        blob = storage_client.return_value.bucket.return_value.blob.return_value
+
+        with self.assertRaises(TimeoutError):
+            transcribe_bytes(b"y" * 64)
+
+        blob.upload_from_file.assert_called_once()
+        blob.delete.assert_called_once()
+
+    def test_inline_without_bucket(self, speech_client, storage_client):
+        self.recognized(speech_client, "a banana")
+
+        self.assertEqual(transcribe_bytes(b"z" * 64), "a banana")
+
+        storage_client.assert_not_called()
+        audio = speech_client.return_value.long_running_recognize.call_args.kwargs["audio"]
+        self.assertEqual(audio.content, b"z" * 64)
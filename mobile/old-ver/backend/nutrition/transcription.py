@@ -0,0 +1,214 @@
+"""
+Speech-to-Text for voice notes.
+
+Audio is fed to streaming recognition in small chunks straight from the
+upload (Django spools large uploads to disk), so a request never holds the
+whole clip in memory. Streaming recognition only accepts about five minutes
+of audio, so uploads above TRANSCRIPTION_LONG_RUNNING_BYTES go through
+long-running recognition instead. That takes the audio from Cloud Storage:
+with TRANSCRIPTION_GCS_BUCKET set, the upload is streamed there in chunks
+and deleted once transcribed. Without a bucket it is sent inline, which
+reads it whole and is capped at about 10 MB by the API.
+
+Transcripts are cached by a hash of the audio and the recognition config, so
+re-sending the same voice note after a failure skips the Speech API.
+"""
+
+import hashlib
+import io
+import threading
+import uuid
+from contextlib import contextmanager
+
+from django.conf import settings
+from django.core.cache import caches
+from google.cloud import speech, storage
+
+# Resumable uploads send the audio in pieces of this size (a multiple of 256 KiB)
+GCS_UPLOAD_CHUNK_BYTES = 1024 * 1024
+
+_speech_client = None
+_storage_client = None
+_client_lock = threading.Lock()
+
+
+def get_speech_client():
+    """Return the shared SpeechClient; its gRPC channel is safe to reuse across threads."""
+    global _speech_client
+    if _speech_client is None:
+        with _client_lock:
+            if _speech_client is None:
+                _speech_client = speech.SpeechClient()
+    return _speech_client
+
+
+def get_storage_client():
+    global _storage_client
+    if _storage_client is None:
+        with _client_lock:
+            if _storage_client is None:
+                _storage_client = storage.Client()
+    return _storage_client
+
+
+def recognition_config():
+    return speech.RecognitionConfig(
+        language_code="en-US",
+        use_enhanced=True,
+    )
+
+
+class TranscriptionCacheStats:
+    def __init__(self):
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+
+    def record(self, hit):
+        with self._lock:
+            if hit:
+                self.hits += 1
+            else:
+                self.misses += 1
+
+    def snapshot(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / lookups if lookups else 0.0,
+            }
+
+
+transcription_cache_stats = TranscriptionCacheStats()
+
+
+def transcription_cache_key(chunks):
+    """sha256 over the recognition config and the audio, read chunk by chunk."""
+    digest = hashlib.sha256(
+        speech.RecognitionConfig.to_json(recognition_config()).encode("utf-8")
+    )
+    for chunk in chunks:
+        digest.update(chunk)
+    return f"transcription:{digest.hexdigest()}"
+
+
+def cached_transcription(key, transcribe):
+    """Return the cached transcript for `key`, or call `transcribe` and cache a non-empty result."""
+    cache = caches["transcriptions"]
+    transcription = cache.get(key)
+    transcription_cache_stats.record(hit=transcription is not None)
+    if transcription is not None:
+        print(f"Transcription cache hit: {key}")
+        return transcription
+
+    transcription = transcribe()
+    if transcription:
+        cache.set(key, transcription)
+    return transcription
+
+
+def rechunk(chunks, size):
+    """Re-slice an iterable of byte strings into pieces of at most `size` bytes."""
+    for chunk in chunks:
+        for start in range(0, len(chunk), size):
+            yield chunk[start : start + size]
+
+
+def byte_chunks(content):
+    size = settings.TRANSCRIPTION_CHUNK_BYTES
+    view = memoryview(content)
+    for start in range(0, len(view), size):
+        yield bytes(view[start : start + size])
+
+
+def transcribe_streaming(chunks):
+    """Transcribe audio arriving as an iterable of byte chunks."""
+    streaming_config = speech.StreamingRecognitionConfig(config=recognition_config())
+    requests = (
+        speech.StreamingRecognizeRequest(audio_content=chunk)
+        for chunk in rechunk(chunks, settings.TRANSCRIPTION_CHUNK_BYTES)
+        if chunk
+    )
+    responses = get_speech_client().streaming_recognize(
+        config=streaming_config,
+        requests=requests,
+        timeout=settings.TRANSCRIPTION_TIMEOUT,
+    )
+
+    transcription = ""
+    for response in responses:
+        for result in response.results:
+            if result.is_final and result.alternatives:
+                transcription += result.alternatives[0].transcript
+    return transcription.strip()
+
+
+@contextmanager
+def long_running_audio(audio_file, content_type=None):
+    """
+    RecognitionAudio for a file-like voice note. With TRANSCRIPTION_GCS_BUCKET
+    set, the file is streamed to a temporary object in
+    GCS_UPLOAD_CHUNK_BYTES pieces, which is deleted on exit.
+    """
+    bucket_name = settings.TRANSCRIPTION_GCS_BUCKET
+    if not bucket_name:
+        yield speech.RecognitionAudio(content=audio_file.read())
+        return
+
+    blob = get_storage_client().bucket(bucket_name).blob(
+        f"transcriptions/{uuid.uuid4().hex}", chunk_size=GCS_UPLOAD_CHUNK_BYTES
+    )
+    blob.upload_from_file(audio_file, content_type=content_type)
+    try:
+        yield speech.RecognitionAudio(uri=f"gs://{bucket_name}/{blob.name}")
+    finally:
+        try:
+            blob.delete()
+        except Exception as e:
+            print(f"Failed to delete staged audio {blob.name}: {e}")
+
+
+def transcribe_long_running(audio):
+    """Transcribe a long voice note's RecognitionAudio with an asynchronous operation."""
+    operation = get_speech_client().long_running_recognize(
+        config=recognition_config(), audio=audio
+    )
+    response = operation.result(timeout=settings.TRANSCRIPTION_LONG_RUNNING_TIMEOUT)
+
+    transcription = ""
+    for result in response.results:
+        if result.alternatives:
+            transcription += result.alternatives[0].transcript
+    return transcription.strip()
+
+
+def transcribe_upload(upload):
+    """
+    Transcribe an UploadedFile, streaming it in chunks unless it is long
+    enough to need long-running recognition. Speech API errors propagate.
+    """
+    key = transcription_cache_key(upload.chunks(settings.TRANSCRIPTION_CHUNK_BYTES))
+
+    def transcribe():
+        if upload.size > settings.TRANSCRIPTION_LONG_RUNNING_BYTES:
+            upload.seek(0)
+            with long_running_audio(upload, upload.content_type) as audio:
+                return transcribe_long_running(audio)
+        return transcribe_streaming(upload.chunks(settings.TRANSCRIPTION_CHUNK_BYTES))
+
+    return cached_transcription(key, transcribe)
+
+
+def transcribe_bytes(content):
+    """Like transcribe_upload, for audio that is already in memory."""
+    key = transcription_cache_key([content])
+
+    def transcribe():
+        if len(content) > settings.TRANSCRIPTION_LONG_RUNNING_BYTES:
+            with long_running_audio(io.BytesIO(content)) as audio:
+                return transcribe_long_running(audio)
+        return transcribe_streaming(byte_chunks(content))
+
+    return cached_transcription(key, transcribe)
@@ -1,33 +1,24 @@
-from google.cloud import speech
 from rest_framework.response import Response
 from rest_framework import status
 
+from nutrition.transcription import transcribe_bytes, transcribe_upload
 
-def transcribe_audio_content(audio_content):
+
+def transcribe_audio_content(audio):
     """
-    Transcribe audio content using Google Cloud Speech-to-Text.
+    Transcribe audio using Google Cloud Speech-to-Text.
 
     Args:
-        audio_content (bytes): The audio file content as bytes
+        audio (bytes | UploadedFile): The audio content, or the upload itself so
+            it can be streamed to the Speech API in chunks
 
     Returns:
         str: The transcribed text, or empty string if transcription fails
     """
     try:
-        client = speech.SpeechClient()
-        audio = speech.RecognitionAudio(content=audio_content)
-        config = speech.RecognitionConfig(
-            language_code="en-US",
-            use_enhanced=True,
-        )
-
-        response = client.recognize(config=config, audio=audio)
-
-        transcription = ""
-        for result in response.results:
-            transcription += result.alternatives[0].transcript
-
-        return transcription.strip()
+        if isinstance(audio, (bytes, bytearray)):
+            return transcribe_bytes(audio)
+        return transcribe_upload(audio)
     except Exception as e:
         print(f"Transcription error: {e}")
         return ""
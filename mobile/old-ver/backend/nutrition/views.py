@@ -1,8 +1,9 @@
-import base64
-import os
-
 import requests
-from rest_framework.decorators import api_view
+from django.http import HttpResponseRedirect
+from django.urls import reverse
+from rest_framework.decorators import api_view, permission_classes, renderer_classes
+from rest_framework.permissions import IsAdminUser
+from rest_framework.settings import api_settings
 from rest_framework.response import Response
 from rest_framework import status
 import uuid
@@ -12,88 +13,140 @@ from nutrition.utils import (
     validate_authentication,
 )
 from nutrition.agent import (
+    AgentError,
     build_agent_payload,
-    send_agent_request,
+    prepare_agent_run,
     process_agent_response,
+    run_agent,
+)
+from nutrition.agent_client import get_agent_client
+from nutrition.jobs import (
+    get_user_job,
+    job_status,
+    submit_analysis_job,
+    wants_background_job,
+)
+from nutrition.images import image_data_from_upload, photo_stats
+from nutrition.transcription import transcription_cache_stats
+from nutrition.photo_cache import (
+    confirm_photo_match,
+    find_photo_match,
+    get_confirmable_analysis,
+    photo_cache_enabled,
+    photo_match_response,
+    remember_photo_analysis,
+)
+from nutrition.streaming import (
+    EventStreamRenderer,
+    event_stream_response,
+    sse_event,
+    stream_agent_run,
+    wants_event_stream,
 )
 from users.utils import get_user_memory
 
 
+def agent_error_response(error):
+    """Map a failed call to the ADK service to an error response."""
+    print(f"Agent request error: {error}")
+    if isinstance(error, requests.Timeout):
+        return create_error_response(
+            "Agent call timed out", status.HTTP_504_GATEWAY_TIMEOUT
+        )
+    return create_error_response("Agent unavailable", status.HTTP_502_BAD_GATEWAY)
+
+
 @api_view(["POST"])
+@renderer_classes(api_settings.DEFAULT_RENDERER_CLASSES + [EventStreamRenderer])
 def process_request(request):
+    # Check authentication before spending a photo decode or Speech call
+    auth_error = validate_authentication(request.user)
+    if auth_error:
+        return auth_error
+
     food_description = request.data.get("food_description")
+    audio_file = None
     image_data = None
+    photo_hash = None
 
     if not food_description and "audio" in request.FILES:
         audio_file = request.FILES["audio"]
-        audio_content = audio_file.read()
-        food_description = transcribe_audio_content(audio_content)
-
-        if not food_description:
-            return create_error_response(
-                "Failed to transcribe audio", status.HTTP_400_BAD_REQUEST
-            )
 
-    # Handle photo uploads (can be combined with text)
+    # Handle photo uploads (can be combined with text). Text or speech can
+    # change what a photo means, so only bare photos are hashed to be matched
+    # against (and remembered for) earlier photos
     if "photo" in request.FILES:
-        photo = request.FILES["photo"]
-        photo_content = photo.read()
-        photo_base64 = base64.b64encode(photo_content).decode("utf-8")
-        image_data = {
-            "mimeType": photo.content_type,
-            "data": photo_base64
-        }
+        # Downscaled and re-encoded so the inline payload stays small
+        image_data, photo_hash = image_data_from_upload(
+            request.FILES["photo"],
+            with_hash=not food_description and audio_file is None,
+        )
 
-    if not food_description and not image_data:
+    if not food_description and audio_file is None and not image_data:
         return create_error_response(
             "food_description, audio file, or photo required",
             status.HTTP_400_BAD_REQUEST,
         )
 
-    # Check authentication
-    auth_error = validate_authentication(request.user)
-    if auth_error:
-        return auth_error
+    if photo_hash is not None and photo_cache_enabled(request):
+        match = find_photo_match(request.user, photo_hash)
+        if match is not None:
+            match_content = photo_match_response(*match)
+            if wants_event_stream(request):
+                return event_stream_response([sse_event("photo_match", match_content)])
+            return Response(match_content)
 
-    user_id = str(request.user.id)
-    agent_base_url = os.environ.get("AGENT_BASE_URL", "http://adk:8080")
     session_id = str(uuid.uuid4())
 
-    # Store session_id in Django HTTP session for resubmit functionality
+    # Store session_id in Django HTTP session for resubmit functionality, with
+    # the description that answers to the agent's questions will be about
     request.session["chat_session_id"] = session_id
+    request.session["chat_food_description"] = food_description or ""
 
-    # Create or update session
-    session_url = (
-        f"{agent_base_url}/apps/food_text/users/{user_id}/sessions/{session_id}"
-    )
-    session_response = requests.post(session_url, json={"state": {}})
-    if session_response.status_code not in [200, 201]:
-        return create_error_response(
-            "Failed to create session", status.HTTP_500_INTERNAL_SERVER_ERROR
+    # Queue the analysis and answer right away; clients poll /api/jobs/<id>/
+    if wants_background_job(request):
+        audio_content = audio_file.read() if audio_file is not None else None
+        job = submit_analysis_job(
+            request.user,
+            session_id,
+            food_description,
+            audio_content,
+            image_data,
+            photo_hash,
+        )
+        return Response(
+            job_status(job, request), status=status.HTTP_202_ACCEPTED
         )
 
-    # Get user memory for personalization
-    user_memory = get_user_memory(request.user)
-    personalization = {"memory": user_memory} if user_memory else None
-
-    # Call the agent
-    payload = build_agent_payload(
-        user_id,
-        session_id,
-        food_description,
-        image_data,
-        personalization,
-    )
-    agent_response = send_agent_request(agent_base_url, payload)
+    if audio_file is not None:
+        food_description = transcribe_audio_content(audio_file)
+        if not food_description:
+            return create_error_response(
+                "Failed to transcribe audio", status.HTTP_400_BAD_REQUEST
+            )
+        request.session["chat_food_description"] = food_description
 
-    if agent_response.status_code != 200:
-        return create_error_response(
-            "Agent call failed", status.HTTP_500_INTERNAL_SERVER_ERROR
+    try:
+        # Create the session and personalize with the user's memory
+        payload = prepare_agent_run(
+            request.user, session_id, food_description, image_data
         )
 
-    content = agent_response.json()[-1].get("content", {})
+        # Relay agent progress as server-sent events instead of waiting for /run
+        if wants_event_stream(request):
+            return event_stream_response(
+                stream_agent_run(payload, request.user, photo_hash)
+            )
+
+        content = run_agent(payload)
+    except requests.RequestException as e:
+        return agent_error_response(e)
+    except AgentError as e:
+        return create_error_response(str(e), status.HTTP_500_INTERNAL_SERVER_ERROR)
+
     print("agent response", content)
     response_content = process_agent_response(content, request.user)
+    remember_photo_analysis(request.user, photo_hash, content)
 
     return Response(response_content)
 
@@ -123,34 +176,93 @@ def resubmit(request):
         )
 
     user_id = str(request.user.id)
-    agent_base_url = os.environ.get("AGENT_BASE_URL", "http://adk:8080")
 
     # Format answers as a message for the agent
     answer_text = " ".join(
         [f"Answer {i+1}: {answer}" for i, answer in enumerate(answers)]
     )
 
-    # Get user memory for personalization
-    user_memory = get_user_memory(request.user)
+    # Get user memory for personalization, ranked against the original food
+    # description rather than the bare answers where there is one
+    memory_query = request.session.get("chat_food_description") or " ".join(
+        map(str, answers)
+    )
+    user_memory = get_user_memory(request.user, memory_query)
     personalization = {"memory": user_memory} if user_memory else None
 
     # Call the agent with the answers using the stored session_id
     payload = build_agent_payload(
         user_id, session_id, answer_text, None, personalization
     )
-    agent_response = send_agent_request(agent_base_url, payload)
-
-    if agent_response.status_code != 200:
-        return create_error_response(
-            "Agent call failed", status.HTTP_500_INTERNAL_SERVER_ERROR
-        )
-
-    content = agent_response.json()[-1].get("content", {})
+    try:
+        content = run_agent(payload)
+    except requests.RequestException as e:
+        return agent_error_response(e)
+    except AgentError as e:
+        return create_error_response(str(e), status.HTTP_500_INTERNAL_SERVER_ERROR)
 
     def clear_session():
-        if "chat_session_id" in request.session:
-            del request.session["chat_session_id"]
+        request.session.pop("chat_session_id", None)
+        request.session.pop("chat_food_description", None)
 
     response_content = process_agent_response(content, request.user, clear_session)
 
     return Response(response_content)
+
+
+@api_view(["POST"])
+def confirm_photo(request, analysis_id):
+    """Save the foods of a photo match offered by /api/process."""
+    auth_error = validate_authentication(request.user)
+    if auth_error:
+        return auth_error
+
+    analysis = get_confirmable_analysis(request.user, analysis_id)
+    if analysis is None:
+        return create_error_response("Photo match not found", status.HTTP_404_NOT_FOUND)
+
+    response_content = confirm_photo_match(
+        request.user,
+        analysis,
+        eaten_at=request.data.get("eaten_at"),
+        meal_type=request.data.get("meal_type"),
+    )
+    return Response(response_content, status=status.HTTP_201_CREATED)
+
+
+@api_view(["GET"])
+@permission_classes([IsAdminUser])
+def agent_metrics(request):
+    """
+    Latency and error counts for calls from this process to the ADK service.
+    Staff only: the numbers describe every user's traffic.
+    """
+    return Response(
+        {
+            "agent": get_agent_client().metrics(),
+            "transcription_cache": transcription_cache_stats.snapshot(),
+            "photos": photo_stats.snapshot(),
+        }
+    )
+
+
+@api_view(["GET"])
+@renderer_classes(api_settings.DEFAULT_RENDERER_CLASSES + [EventStreamRenderer])
+def analysis_job(request, job_id):
+    """
+    Status of a background analysis job. Clients asking for an event stream
+    are redirected to the async events endpoint, which doesn't hold a worker
+    while it waits.
+    """
+    auth_error = validate_authentication(request.user)
+    if auth_error:
+        return auth_error
+
+    job = get_user_job(request.user, job_id)
+    if job is None:
+        return create_error_response("Job not found", status.HTTP_404_NOT_FOUND)
+
+    if wants_event_stream(request):
+        return HttpResponseRedirect(reverse("analysis_job_events", args=[job.id]))
+
+    return Response(job_status(job, request))
@@ -38,7 +38,7 @@ class Command(BaseCommand):
                 trans_fat=round(random.uniform(0, 10), 2),
                 saturated_fat=round(random.uniform(0, 10), 2),
                 unsaturated_fat=round(random.uniform(0, 10), 2),
-                meal_type=random.choice(['breakfast', 'lunch', 'dinner', 'snack', None]),
+                meal_type=random.choice(['Breakfast', 'Lunch', 'Dinner', 'Snack', None]),
                 user=user
             )
             food.save()
@@ -0,0 +1,22 @@
+from django.core.management.base import BaseCommand
+from foods.rollups import rebuild_daily_totals
+
+
+class Command(BaseCommand):
+    help = 'Recomputes the daily nutrition rollup from existing foods'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--user',
+            type=int,
+            action='append',
+            dest='user_ids',
+            help='Only rebuild totals for this user id (can be repeated)'
+        )
+
+    def handle(self, *args, **options):
+        rebuild_daily_totals(options['user_ids'])
+
+        self.stdout.write(
+            self.style.SUCCESS('Successfully rebuilt daily nutrition totals')
+        )
@@ -0,0 +1,40 @@
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from nutrition.jobs import drain_queue
+
+
+class Command(BaseCommand):
+    help = 'Runs queued meal analysis jobs (set ANALYSIS_RUN_IN_PROCESS=false on the web processes)'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--workers',
+            type=int,
+            default=settings.ANALYSIS_WORKERS,
+            help='Number of jobs to run at once'
+        )
+        parser.add_argument(
+            '--once',
+            action='store_true',
+            help='Exit once the queue is empty instead of polling for new jobs'
+        )
+
+    def handle(self, *args, **options):
+        workers = options['workers']
+        self.stdout.write(f'Running analysis jobs with {workers} workers')
+
+        def work():
+            while True:
+                drain_queue()
+                if options['once']:
+                    return
+                time.sleep(settings.ANALYSIS_POLL_INTERVAL)
+
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            for future in [executor.submit(work) for _ in range(workers)]:
+                future.result()
+
+        self.stdout.write(self.style.SUCCESS('Analysis queue is empty'))
@@ -0,0 +1,35 @@
+# Generated by Django 5.2.18 on 2026-10-18 14:56
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('nutrition_tracker', '0003_analysisjob'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='PhotoAnalysis',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('photo_hash', models.BigIntegerField(help_text='dHash stored as a signed 64-bit value')),
+                ('band_0', models.PositiveIntegerField()),
+                ('band_1', models.PositiveIntegerField()),
+                ('band_2', models.PositiveIntegerField()),
+                ('band_3', models.PositiveIntegerField()),
+                ('foods', models.JSONField(help_text='FoodSearchResult list without id and eaten_at')),
+                ('times_reused', models.PositiveIntegerField(default=0)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='photo_analyses', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'indexes': [models.Index(fields=['band_0', 'user'], name='photoanalysis_band_0_idx'), models.Index(fields=['band_1', 'user'], name='photoanalysis_band_1_idx'), models.Index(fields=['band_2', 'user'], name='photoanalysis_band_2_idx'), models.Index(fields=['band_3', 'user'], name='photoanalysis_band_3_idx')],
+            },
+        ),
+    ]
@@ -1,3 +1,87 @@
+import uuid
+
 from django.db import models
 
+from users.models import User
+
+
+class AnalysisJob(models.Model):
+    """A queued /api/process request, run by the analysis workers."""
+
+    QUEUED = "queued"
+    RUNNING = "running"
+    SUCCEEDED = "succeeded"
+    FAILED = "failed"
+    STATUS_CHOICES = [
+        (QUEUED, "Queued"),
+        (RUNNING, "Running"),
+        (SUCCEEDED, "Succeeded"),
+        (FAILED, "Failed"),
+    ]
+
+    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    user = models.ForeignKey(
+        User, on_delete=models.CASCADE, related_name="analysis_jobs"
+    )
+    session_id = models.CharField(max_length=64)
+    status = models.CharField(max_length=16, choices=STATUS_CHOICES, default=QUEUED)
+    input = models.JSONField(
+        help_text="food_description, plus base64 audio and/or photo ({'mimeType', 'data'})"
+    )
+    result = models.JSONField(null=True, blank=True)
+    error = models.TextField(blank=True)
+    attempts = models.PositiveSmallIntegerField(default=0)
+    created_at = models.DateTimeField(auto_now_add=True)
+    started_at = models.DateTimeField(null=True, blank=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        indexes = [
+            models.Index(
+                fields=["status", "created_at"], name="analysisjob_status_idx"
+            ),
+        ]
+
+    def __str__(self):
+        return f"{self.id} ({self.status})"
+
+    @property
+    def is_finished(self):
+        return self.status in (self.SUCCEEDED, self.FAILED)
+
+
+class PhotoAnalysis(models.Model):
+    """
+    Foods the agent found in a meal photo, indexed by the photo's 64-bit dHash
+    so repeat photos of the same meal can skip the agent.
+
+    The hash is also split into four 16-bit bands. Two hashes within Hamming
+    distance 3 always share at least one band, so near-duplicates are found
+    with indexed equality lookups.
+    """
+
+    user = models.ForeignKey(
+        User, on_delete=models.CASCADE, related_name="photo_analyses"
+    )
+    photo_hash = models.BigIntegerField(help_text="dHash stored as a signed 64-bit value")
+    band_0 = models.PositiveIntegerField()
+    band_1 = models.PositiveIntegerField()
+    band_2 = models.PositiveIntegerField()
+    band_3 = models.PositiveIntegerField()
+    foods = models.JSONField(
+        help_text="FoodSearchResult list without id and eaten_at"
+    )
+    times_reused = models.PositiveIntegerField(default=0)
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=["band_0", "user"], name="photoanalysis_band_0_idx"),
+            models.Index(fields=["band_1", "user"], name="photoanalysis_band_1_idx"),
+            models.Index(fields=["band_2", "user"], name="photoanalysis_band_2_idx"),
+            models.Index(fields=["band_3", "user"], name="photoanalysis_band_3_idx"),
+        ]
 
+    def __str__(self):
+        return f"{self.user} {self.photo_hash:#x}"
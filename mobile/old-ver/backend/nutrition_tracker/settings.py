@@ -11,6 +11,7 @@ https://docs.djangoproject.com/en/5.2/ref/settings/
 """
 
 import os
+import tempfile
 from pathlib import Path
 
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
@@ -141,6 +142,97 @@ USE_TZ = True
 
 STATIC_URL = "static/"
 
+# ADK agent service. Calls share one keep-alive connection pool per process.
+AGENT_BASE_URL = os.getenv("AGENT_BASE_URL", "http://adk:8080")
+AGENT_CONNECT_TIMEOUT = float(os.getenv("AGENT_CONNECT_TIMEOUT", "3.05"))
+AGENT_READ_TIMEOUT = float(os.getenv("AGENT_READ_TIMEOUT", "120"))
+AGENT_POOL_SIZE = int(os.getenv("AGENT_POOL_SIZE", "20"))
+
+# Background analysis jobs (/api/process?async=1). Web processes run them on a
+# thread pool unless ANALYSIS_RUN_IN_PROCESS is false and run_analysis_worker does.
+ANALYSIS_RUN_IN_PROCESS = os.getenv("ANALYSIS_RUN_IN_PROCESS", "true").lower() == "true"
+ANALYSIS_WORKERS = int(os.getenv("ANALYSIS_WORKERS", "4"))
+ANALYSIS_MAX_ATTEMPTS = int(os.getenv("ANALYSIS_MAX_ATTEMPTS", "2"))
+ANALYSIS_POLL_INTERVAL = float(os.getenv("ANALYSIS_POLL_INTERVAL", "0.5"))
+# How often in-process workers look for queued jobs nobody woke them for
+ANALYSIS_QUEUE_POLL_SECONDS = float(os.getenv("ANALYSIS_QUEUE_POLL_SECONDS", "5"))
+ANALYSIS_STREAM_TIMEOUT = float(os.getenv("ANALYSIS_STREAM_TIMEOUT", "180"))
+
+# Speech-to-Text. Uploads are streamed in chunks; longer voice notes than
+# streaming recognition accepts (about 5 minutes) use long-running recognition.
+TRANSCRIPTION_CHUNK_BYTES = int(os.getenv("TRANSCRIPTION_CHUNK_BYTES", "16384"))
+TRANSCRIPTION_LONG_RUNNING_BYTES = int(
+    os.getenv("TRANSCRIPTION_LONG_RUNNING_BYTES", str(4 * 1024 * 1024))
+)
+TRANSCRIPTION_TIMEOUT = float(os.getenv("TRANSCRIPTION_TIMEOUT", "60"))
+TRANSCRIPTION_LONG_RUNNING_TIMEOUT = float(
+    os.getenv("TRANSCRIPTION_LONG_RUNNING_TIMEOUT", "600")
+)
+# Bucket long voice notes are streamed to for long-running recognition;
+# unset sends them inline, which holds the whole clip in memory
+TRANSCRIPTION_GCS_BUCKET = os.getenv("TRANSCRIPTION_GCS_BUCKET", "")
+
+# A running analysis job is only taken as lost once it has been running longer
+# than a live one can: a long-running transcription plus the session and /run
+# agent calls, with a minute of margin. Lower values are raised to that.
+ANALYSIS_JOB_STALE_SECONDS = max(
+    int(os.getenv("ANALYSIS_JOB_STALE_SECONDS", "0")),
+    int(
+        TRANSCRIPTION_LONG_RUNNING_TIMEOUT
+        + 2 * (AGENT_CONNECT_TIMEOUT + AGENT_READ_TIMEOUT)
+        + 60
+    ),
+)
+
+# Photos are downscaled and re-encoded before they are inlined in agent calls
+PHOTO_MAX_DIMENSION = int(os.getenv("PHOTO_MAX_DIMENSION", "1024"))
+PHOTO_JPEG_QUALITY = int(os.getenv("PHOTO_JPEG_QUALITY", "80"))
+PHOTO_WORKERS = int(os.getenv("PHOTO_WORKERS", "2"))
+
+# Repeat meal photos within this many dHash bits of an earlier photo reuse its
+# analysis after confirmation; PHOTO_CACHE_GLOBAL also searches other users'.
+PHOTO_CACHE_ENABLED = os.getenv("PHOTO_CACHE_ENABLED", "true").lower() == "true"
+# Both are capped at 3 bits, the most the four-band index in PhotoAnalysis is
+# guaranteed to find.
+PHOTO_MATCH_MAX_DISTANCE = min(int(os.getenv("PHOTO_MATCH_MAX_DISTANCE", "3")), 3)
+PHOTO_CACHE_GLOBAL = os.getenv("PHOTO_CACHE_GLOBAL", "false").lower() == "true"
+PHOTO_GLOBAL_MATCH_MAX_DISTANCE = min(
+    int(os.getenv("PHOTO_GLOBAL_MATCH_MAX_DISTANCE", "1")), 3
+)
+
+# Caches. "transcriptions" maps a hash of the audio and recognition config to
+# its transcript (LocMemCache evicts least recently used entries); "memories"
+# holds each user's memories, invalidated by Memory signals.
+CACHES = {
+    "default": {
+        "BACKEND": "django.core.cache.backends.locmem.LocMemCache",
+    },
+    "transcriptions": {
+        "BACKEND": "django.core.cache.backends.locmem.LocMemCache",
+        "LOCATION": "transcriptions",
+        "TIMEOUT": int(os.getenv("TRANSCRIPTION_CACHE_TTL_SECONDS", str(24 * 60 * 60))),
+        "OPTIONS": {
+            "MAX_ENTRIES": int(os.getenv("TRANSCRIPTION_CACHE_MAX_ENTRIES", "1000")),
+        },
+    },
+    # Per-user memory snapshots. File based so an invalidation in one worker
+    # process is seen by the others on the host.
+    "memories": {
+        "BACKEND": "django.core.cache.backends.filebased.FileBasedCache",
+        "LOCATION": os.getenv(
+            "MEMORY_CACHE_LOCATION",
+            os.path.join(tempfile.gettempdir(), "nutrition_tracker_memories"),
+        ),
+        "TIMEOUT": int(os.getenv("MEMORY_CACHE_TTL_SECONDS", "3600")),
+    },
+}
+
+# Number of user memories, ranked by relevance to the request, sent to the agent
+MEMORY_TOP_K = int(os.getenv("MEMORY_TOP_K", "8"))
+
+# Default page size for /api/foods/ when a client opts into keyset pagination
+FOODS_PAGE_SIZE = int(os.getenv("FOODS_PAGE_SIZE", "50"))
+
 # Default primary key field type
 # https://docs.djangoproject.com/en/5.2/ref/settings/#default-auto-field
 
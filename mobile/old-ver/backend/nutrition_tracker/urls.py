@@ -21,6 +21,7 @@ from rest_framework.routers import DefaultRouter
 from foods import views as foods_views
 from users import views as users_views
 from nutrition import views as nutrition_views
+from nutrition import async_views as nutrition_async_views
 from . import views
 
 router = DefaultRouter()
@@ -34,6 +35,30 @@ urlpatterns = [
     path("api/transcribe/", views.transcribe_audio, name="transcribe"),
     path("api/process/", nutrition_views.process_request, name="analyze_food"),
     path("api/resubmit/", nutrition_views.resubmit, name="resubmit"),
+    path(
+        "api/async/process/",
+        nutrition_async_views.process_request_async,
+        name="analyze_food_async",
+    ),
+    path(
+        "api/async/resubmit/",
+        nutrition_async_views.resubmit_async,
+        name="resubmit_async",
+    ),
+    path(
+        "api/jobs/<uuid:job_id>/", nutrition_views.analysis_job, name="analysis_job"
+    ),
+    path(
+        "api/async/jobs/<uuid:job_id>/events/",
+        nutrition_async_views.analysis_job_events_async,
+        name="analysis_job_events",
+    ),
+    path(
+        "api/photo-matches/<int:analysis_id>/confirm/",
+        nutrition_views.confirm_photo,
+        name="confirm_photo_match",
+    ),
+    path("api/agent-metrics/", nutrition_views.agent_metrics, name="agent_metrics"),
     path("api/login/", users_views.LoginView.as_view(), name="login"),
     path("api/register/", users_views.RegisterView.as_view(), name="register"),
     path("api/logout/", users_views.LogoutView.as_view(), name="logout"),
@@ -1,7 +1,8 @@
 from rest_framework.decorators import api_view
 from rest_framework.response import Response
 from rest_framework import status
-from google.cloud import speech
+from nutrition.transcription import transcribe_upload
+from django.core.cache import caches
 from django.core.management import call_command
 from django.db import connection
 
@@ -14,23 +15,10 @@ def transcribe_audio(request):
         )
 
     audio_file = request.FILES["audio"]
-    audio_content = audio_file.read()
-
-    client = speech.SpeechClient()
-    audio = speech.RecognitionAudio(content=audio_content)
-    config = speech.RecognitionConfig(
-        language_code="en-US",
-        use_enhanced=True,
-    )
 
     try:
-        response = client.recognize(config=config, audio=audio)
-
-        transcription = ""
-        for result in response.results:
-            transcription += result.alternatives[0].transcript
+        transcription = transcribe_upload(audio_file)
 
-        print(f"Results: {len(response.results)}")
         print(f"Transcription: '{transcription}'")
 
         return Response({"transcription": transcription})
@@ -52,6 +40,8 @@ def transcribe_audio(request):
 def reset_database(request):
     try:
         call_command("flush", verbosity=0, interactive=False)
+        # flush bypasses the Memory signals, so drop the cached snapshots too
+        caches["memories"].clear()
 
         return Response(
             {"message": "Database reset successfully"}, status=status.HTTP_200_OK
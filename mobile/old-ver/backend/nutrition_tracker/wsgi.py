@@ -14,3 +14,8 @@ from django.core.wsgi import get_wsgi_application
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'nutrition_tracker.settings')
 
 application = get_wsgi_application()
+
+# Pick up analysis jobs left queued by a previous run
+from nutrition.jobs import start_queue_poller  # noqa: E402
+
+start_queue_poller()
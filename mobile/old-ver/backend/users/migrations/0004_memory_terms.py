@@ -0,0 +1,50 @@
+# Generated by Django 5.2.18 on 2026-10-18 14:57
+
+import re
+from collections import Counter
+
+from django.db import migrations, models
+
+# Copied from users.retrieval as of this migration, so later changes to the
+# tokenizer don't change what this migration does
+STOP_WORDS = {
+    "a", "about", "an", "and", "are", "as", "at", "be", "but", "by", "do",
+    "for", "from", "had", "has", "have", "i", "im", "in", "is", "it", "its",
+    "me", "my", "of", "on", "or", "so", "that", "the", "this", "to", "usually",
+    "was", "with", "you",
+}
+
+
+def term_counts(text):
+    tokens = []
+    for word in re.findall(r"[a-z0-9]+", (text or "").lower().replace("'", "")):
+        if word in STOP_WORDS:
+            continue
+        if len(word) > 3 and word.endswith("s") and not word.endswith("ss"):
+            word = word[:-1]
+        tokens.append(word)
+    return dict(Counter(tokens))
+
+
+def index_existing_memories(apps, schema_editor):
+    Memory = apps.get_model('users', 'Memory')
+    memories = list(Memory.objects.only('id', 'content'))
+    for memory in memories:
+        memory.terms = term_counts(memory.content)
+    Memory.objects.bulk_update(memories, ['terms'], batch_size=500)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('users', '0003_userprofile_timezone'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='memory',
+            name='terms',
+            field=models.JSONField(blank=True, default=dict, editable=False, help_text="Term counts of content used for retrieval, e.g. {'oat': 1, 'milk': 1}"),
+        ),
+        migrations.RunPython(index_existing_memories, migrations.RunPython.noop),
+    ]
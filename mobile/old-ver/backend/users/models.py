@@ -1,6 +1,6 @@
 from django.db import models
 from django.contrib.auth.models import User
-from django.db.models.signals import post_save
+from django.db.models.signals import post_delete, post_save, pre_save
 from django.dispatch import receiver
 
 
@@ -29,6 +29,11 @@ class UserProfile(models.Model):
         blank=True,
         help_text="Goals like {'calories': 2000, 'protein': 150}",
     )
+    timezone = models.CharField(
+        max_length=64,
+        default="UTC",
+        help_text="IANA time zone name used for day boundaries, e.g. 'America/Chicago'",
+    )
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
@@ -39,6 +44,12 @@ class UserProfile(models.Model):
 class Memory(models.Model):
     user = models.ForeignKey(User, on_delete=models.CASCADE)
     content = models.CharField(max_length=200, null=False)
+    terms = models.JSONField(
+        default=dict,
+        blank=True,
+        editable=False,
+        help_text="Term counts of content used for retrieval, e.g. {'oat': 1, 'milk': 1}",
+    )
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
@@ -52,3 +63,18 @@ def create_user_profile(sender, instance, created, **kwargs):
 @receiver(post_save, sender=User)
 def save_user_profile(sender, instance, **kwargs):
     instance.profile.save()
+
+
+@receiver(pre_save, sender=Memory)
+def index_memory_terms(sender, instance, **kwargs):
+    from .retrieval import term_counts
+
+    instance.terms = term_counts(instance.content)
+
+
+@receiver(post_save, sender=Memory)
+@receiver(post_delete, sender=Memory)
+def invalidate_user_memory(sender, instance, **kwargs):
+    from .utils import invalidate_memory_snapshot
+
+    invalidate_memory_snapshot(instance.user_id)
@@ -0,0 +1,72 @@
+"""
+TF-IDF ranking of a user's memories against the current request.
+
+Each Memory stores its term counts (see the pre_save receiver in models.py),
+so ranking needs no extra parsing. IDF is computed over the user's own
+memories, which keeps common words in their notes from dominating.
+"""
+
+import math
+import re
+from collections import Counter
+
+STOP_WORDS = {
+    "a", "about", "an", "and", "are", "as", "at", "be", "but", "by", "do",
+    "for", "from", "had", "has", "have", "i", "im", "in", "is", "it", "its",
+    "me", "my", "of", "on", "or", "so", "that", "the", "this", "to", "usually",
+    "was", "with", "you",
+}
+
+
+def tokenize(text):
+    """Lowercased word tokens without stop words, with a crude plural strip."""
+    tokens = []
+    for word in re.findall(r"[a-z0-9]+", (text or "").lower().replace("'", "")):
+        if word in STOP_WORDS:
+            continue
+        if len(word) > 3 and word.endswith("s") and not word.endswith("ss"):
+            word = word[:-1]
+        tokens.append(word)
+    return tokens
+
+
+def term_counts(text):
+    return dict(Counter(tokenize(text)))
+
+
+def tfidf_vector(counts, idf):
+    vector = {term: count * idf.get(term, 0.0) for term, count in counts.items()}
+    norm = math.sqrt(sum(v * v for v in vector.values()))
+    return {term: v / norm for term, v in vector.items()} if norm else {}
+
+
+def rank_memories(memories, query, k):
+    """
+    Return the contents of the k memories most similar to `query`.
+
+    `memories` are dicts with "content", "terms" and "updated_at". Ties, and
+    memories unrelated to the query, are ordered most recently updated first,
+    so a query with no matching terms still yields the k newest memories.
+    """
+    if len(memories) <= k:
+        return [memory["content"] for memory in memories]
+
+    document_frequency = Counter()
+    for memory in memories:
+        document_frequency.update((memory["terms"] or {}).keys())
+    total = len(memories)
+    idf = {
+        term: math.log((1 + total) / (1 + df)) + 1
+        for term, df in document_frequency.items()
+    }
+
+    query_vector = tfidf_vector(term_counts(query), idf)
+
+    def score(memory):
+        vector = tfidf_vector(memory["terms"] or {}, idf)
+        return sum(weight * vector.get(term, 0.0) for term, weight in query_vector.items())
+
+    ranked = sorted(
+        memories, key=lambda memory: (score(memory), memory["updated_at"]), reverse=True
+    )
+    return [memory["content"] for memory in ranked[:k]]
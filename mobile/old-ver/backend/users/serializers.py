@@ -14,7 +14,7 @@ class UserProfileSerializer(serializers.ModelSerializer):
 
     class Meta:
         model = UserProfile
-        fields = ['user', 'date_of_birth', 'height', 'weight', 'activity_level', 'dietary_goals', 'created_at', 'updated_at']
+        fields = ['user', 'date_of_birth', 'height', 'weight', 'activity_level', 'dietary_goals', 'timezone', 'created_at', 'updated_at']
 
 
 class MemorySerializer(serializers.ModelSerializer):
@@ -22,7 +22,7 @@ class MemorySerializer(serializers.ModelSerializer):
 
     class Meta:
         model = Memory
-        fields = '__all__'
+        exclude = ['terms']
 
 
 class UserRegistrationSerializer(serializers.ModelSerializer):
@@ -1,3 +1,17 @@
-from django.test import TestCase
+from django.core.cache import caches
+from django.test import TransactionTestCase
 
-# Create your tests here.
+from .models import Memory, User
+from .utils import get_memory_snapshot, memory_cache_key
+
+
+class ResetDatabaseTests(TransactionTestCase):
+    def test_reset_drops_cached_memories(self):
+        user = User.objects.create_user(username="eater", password="pw")
+        Memory.objects.create(user=user, content="Prefers oat milk in coffee")
+        self.assertEqual(len(get_memory_snapshot(user)), 1)
+
+        response = self.client.post("/api/reset-db/")
+
+        self.assertEqual(response.status_code, 200)
+        self.assertIsNone(caches["memories"].get(memory_cache_key(user.id)))
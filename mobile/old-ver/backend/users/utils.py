@@ -1,7 +1,64 @@
+from django.conf import settings
+from django.core.cache import caches
+
 from .models import Memory
+from .retrieval import rank_memories
+
+
+def memory_cache_key(user_id):
+    return f"user_memory:{user_id}"
+
+
+def get_memory_snapshot(user):
+    """
+    All of the user's memories as dicts with content, terms and updated_at,
+    cached until a Memory signal in models.py invalidates them
+    """
+    cache = caches["memories"]
+    key = memory_cache_key(user.id)
+    snapshot = cache.get(key)
+    if snapshot is None:
+        snapshot = list(
+            Memory.objects.filter(user=user)
+            .order_by("id")
+            .values("content", "terms", "updated_at")
+        )
+        cache.set(key, snapshot)
+    return snapshot
+
+
+async def aget_memory_snapshot(user):
+    """Async version of get_memory_snapshot"""
+    cache = caches["memories"]
+    key = memory_cache_key(user.id)
+    snapshot = await cache.aget(key)
+    if snapshot is None:
+        memories = (
+            Memory.objects.filter(user=user)
+            .order_by("id")
+            .values("content", "terms", "updated_at")
+        )
+        snapshot = [memory async for memory in memories]
+        await cache.aset(key, snapshot)
+    return snapshot
+
+
+def invalidate_memory_snapshot(user_id):
+    caches["memories"].delete(memory_cache_key(user_id))
+
+
+def get_user_memory(user, query=None, k=None):
+    """
+    Get the user's memories most relevant to `query` (the food description),
+    at most k (MEMORY_TOP_K by default)
+    """
+    return rank_memories(
+        get_memory_snapshot(user), query, k or settings.MEMORY_TOP_K
+    )
 
 
-def get_user_memory(user):
-    """Get all memory records for a user"""
-    memories = Memory.objects.filter(user=user).values_list("content", flat=True)
-    return list(memories)
\ No newline at end of file
+async def aget_user_memory(user, query=None, k=None):
+    """Async version of get_user_memory for async views"""
+    return rank_memories(
+        await aget_memory_snapshot(user), query, k or settings.MEMORY_TOP_K
+    )